@@ -4,9 +4,9 @@ from django.shortcuts import render
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Q
+from django.db.models import Count, Q
 from .models import Notificacion
-from django.core.paginator import Paginator
+from app_registros.conteo import ConteoAproximadoPaginator
 
 
 @login_required
@@ -26,19 +26,19 @@ def lista_notificaciones(request):
     elif leida == 'false':
         notificaciones = notificaciones.filter(leida=False)
     
-    # Paginación
-    paginator = Paginator(notificaciones, 20)
+    # Paginación (conteo estimado si hay muchas)
+    paginator = ConteoAproximadoPaginator(notificaciones, 20)
     page = request.GET.get('page')
     notificaciones_pagina = paginator.get_page(page)
     
-    # Estadísticas
-    total = notificaciones.count()
-    no_leidas = notificaciones.filter(leida=False).count()
+    # Estadísticas (el total es el del paginador, estimado si hay muchas)
+    estadisticas = notificaciones.aggregate(no_leidas=Count('id', filter=Q(leida=False)))
     
     context = {
         'notificaciones': notificaciones_pagina,
-        'total_notificaciones': total,
-        'no_leidas': no_leidas,
+        'total_notificaciones': paginator.count,
+        'total_aproximado': paginator.aproximado,
+        'no_leidas': estadisticas['no_leidas'],
         'tipos': Notificacion.TIPOS,
         'tipo_filtro': tipo,
         'leida_filtro': leida,
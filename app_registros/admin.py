@@ -1,15 +1,22 @@
 from django.contrib import admin
-from .models import Productor, Campo, TipoSenal, MarcaSenal, Solicitud, UserProfile, ChangeLog, ImagenMarcaPredefinida
+from .conteo import ConteoAproximadoPaginator
+from .models import Productor, Campo, TipoSenal, MarcaSenal, Solicitud, UserProfile, ChangeLog, ImagenMarcaPredefinida, TrabajoHash
+
+class ConteoAproximadoAdmin(admin.ModelAdmin):
+    """Listados grandes: conteo estimado y sin el COUNT(*) del total sin filtrar."""
+    paginator = ConteoAproximadoPaginator
+    show_full_result_count = False
+
 
 @admin.register(Productor)
-class ProductorAdmin(admin.ModelAdmin):
+class ProductorAdmin(ConteoAproximadoAdmin):
     list_display = ['nombre_completo', 'dni', 'localidad', 'estado', 'fecha_registro']
     list_filter = ['estado', 'localidad', 'fecha_registro']
     search_fields = ['nombre', 'apellido', 'dni', 'cuit']
     readonly_fields = ['fecha_registro']
 
 @admin.register(Campo)
-class CampoAdmin(admin.ModelAdmin):
+class CampoAdmin(ConteoAproximadoAdmin):
     list_display = ['nombre', 'productor', 'distrito', 'departamento', 'area_hectareas']
     list_filter = ['distrito', 'departamento']
     search_fields = ['nombre', 'productor__nombre', 'productor__apellido']
@@ -20,14 +27,14 @@ class TipoSenalAdmin(admin.ModelAdmin):
     list_filter = ['ubicacion_oreja']
 
 @admin.register(MarcaSenal)
-class MarcaSenalAdmin(admin.ModelAdmin):
+class MarcaSenalAdmin(ConteoAproximadoAdmin):
     list_display = ['numero_orden', 'productor', 'tipo_tramite', 'estado', 'fecha_inscripcion']
     list_filter = ['tipo_tramite', 'estado', 'fecha_inscripcion']
     search_fields = ['numero_orden', 'productor__nombre', 'productor__apellido']
     readonly_fields = ['fecha_creacion', 'ultima_modificacion']
 
 @admin.register(Solicitud)
-class SolicitudAdmin(admin.ModelAdmin):
+class SolicitudAdmin(ConteoAproximadoAdmin):
     list_display = ['id', 'productor', 'tipo_tramite', 'estado', 'fecha_solicitud']
     list_filter = ['tipo_tramite', 'estado', 'fecha_solicitud']
     search_fields = ['productor__nombre', 'productor__apellido']
@@ -39,12 +46,18 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__first_name', 'user__last_name']
 
 @admin.register(ChangeLog)
-class ChangeLogAdmin(admin.ModelAdmin):
+class ChangeLogAdmin(ConteoAproximadoAdmin):
     list_display = ['modelo', 'objeto_id', 'accion', 'user', 'timestamp']
     list_filter = ['modelo', 'accion', 'timestamp']
     search_fields = ['modelo', 'objeto_id', 'user__username']
     readonly_fields = ['timestamp']
 
+@admin.register(TrabajoHash)
+class TrabajoHashAdmin(ConteoAproximadoAdmin):
+    list_display = ['modelo', 'objeto_id', 'intentos', 'disponible_desde', 'fecha_creacion']
+    list_filter = ['modelo']
+    readonly_fields = ['fecha_creacion']
+
 
 
 @admin.register(ImagenMarcaPredefinida)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppRegistrosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_registros'
+
+    def ready(self):
+        # Importar las señales
+        import app_registros.signals
@@ -0,0 +1,119 @@
+"""
+busqueda.py
+-----------
+Búsqueda de productores y marcas por texto.
+
+Cada productor guarda ``texto_busqueda`` (apellido, nombre y campo en
+minúsculas y sin acentos, normalizado en Python al guardar) y, en
+PostgreSQL, ``vector_busqueda`` (tsvector 'spanish' de ese texto). La
+búsqueda combina texto completo, similitud de trigramas (pg_trgm) para
+nombres mal escritos y prefijo de DNI; todo resuelto con índices.
+En otros motores cae a ``contains`` sobre el texto normalizado.
+
+Las marcas guardan en ``texto_busqueda`` la descripción y, en otra línea,
+los nombres de sus imágenes predefinidas; el índice de trigramas resuelve
+``LIKE '%texto%'`` sin recorrer la tabla ni la intermedia del M2M.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+
+CONFIG = 'spanish'
+
+# Orden de los resultados: más relevantes primero (sirve para KeysetPaginator)
+ORDEN_RANGO = ('-rango', 'apellido', 'nombre', 'id')
+
+# Campos de Productor que forman el texto de búsqueda
+CAMPOS_PRODUCTOR = ('apellido', 'nombre', 'campo')
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def texto_productor(productor):
+    return normalizar(' '.join(getattr(productor, campo) or '' for campo in CAMPOS_PRODUCTOR))
+
+
+def _postgres():
+    return connection.vendor == 'postgresql'
+
+
+def actualizar_vectores(queryset):
+    """Recalcula ``vector_busqueda`` de las filas de ``queryset`` (solo PostgreSQL)."""
+    if _postgres():
+        queryset.update(vector_busqueda=SearchVector('texto_busqueda', config=CONFIG))
+
+
+def buscar_productores(queryset, consulta):
+    """
+    Filtra ``queryset`` por ``consulta`` y anota ``rango`` (mayor = más
+    relevante). Ordenar con ORDEN_RANGO.
+    """
+    texto = normalizar(consulta)
+    if not texto:
+        return queryset.annotate(rango=Value(0.0, output_field=FloatField()))
+
+    digitos = re.sub(r'\D', '', consulta)
+    por_dni = Q(dni__startswith=digitos) if digitos else Q(pk__in=[])
+
+    if not _postgres():
+        return queryset.filter(Q(texto_busqueda__contains=texto) | por_dni).annotate(
+            rango=Value(0.0, output_field=FloatField()),
+        )
+
+    consulta_ts = SearchQuery(texto, config=CONFIG, search_type='websearch')
+    rango = SearchRank(F('vector_busqueda'), consulta_ts) + TrigramWordSimilarity(texto, 'texto_busqueda')
+    return queryset.filter(
+        Q(vector_busqueda=consulta_ts) | Q(texto_busqueda__trigram_word_similar=texto) | por_dni
+    ).annotate(
+        # El rango es real (float4); en double precision vuelve exacto desde
+        # el cursor de KeysetPaginator y los empates se comparan bien.
+        rango=Cast(rango, FloatField()),
+    )
+
+
+# ─── Marcas ───
+
+def texto_marca(descripcion, nombres_componentes):
+    """Texto de búsqueda de una marca: descripción, salto de línea y nombres de componentes."""
+    return normalizar(descripcion) + '\n' + normalizar(' '.join(sorted(nombres_componentes)))
+
+
+def componentes_de_texto(texto):
+    """Parte de los nombres de componentes de un ``texto_busqueda`` de marca."""
+    return (texto or '').partition('\n')[2]
+
+
+def actualizar_texto_marcas(pks):
+    """Recalcula ``texto_busqueda`` de las marcas ``pks`` (tras cambiar sus componentes)."""
+    from app_registros.models import MarcaSenal
+    pks = set(pks)
+    if not pks:
+        return
+    Intermedia = MarcaSenal.imagenes_predefinidas.through
+    nombres = defaultdict(list)
+    for marca_id, nombre in Intermedia.objects.filter(marcasenal_id__in=pks).values_list(
+        'marcasenal_id', 'imagenmarcapredefinida__nombre',
+    ):
+        nombres[marca_id].append(nombre)
+    marcas = list(MarcaSenal.objects.filter(pk__in=pks).only('descripcion_marca'))
+    for marca in marcas:
+        marca.texto_busqueda = texto_marca(marca.descripcion_marca, nombres[marca.pk])
+    MarcaSenal.objects.bulk_update(marcas, ['texto_busqueda'])
+
+
+def buscar_marcas(queryset, consulta):
+    """Marcas cuya descripción o algún componente contiene ``consulta``."""
+    return queryset.filter(texto_busqueda__contains=normalizar(consulta))
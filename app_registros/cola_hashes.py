@@ -0,0 +1,146 @@
+"""
+cola_hashes.py
+--------------
+Cola en la BD para calcular los hashes perceptuales fuera del request.
+
+Con ``SIMILITUD_HASH_ASINCRONO`` activo, ``save()`` no decodifica la imagen:
+marca la fila con ``hash_pendiente`` y, después del commit, encola un
+TrabajoHash. El comando ``procesar_hashes`` toma los trabajos y guarda el hash.
+
+El worker es otro proceso: no actualiza un índice propio sino que publica una
+versión nueva por lote (app_registros.versiones) al confirmarse la
+transacción, y los procesos web reconstruyen el suyo en la próxima búsqueda.
+"""
+
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from app_registros import predefinidas
+from app_registros.image_similarity import (
+    columnas_hash, digest_contenido, hash_y_huellas, invalidar_indice,
+)
+
+# Campo de imagen de cada modelo con hash perceptual
+CAMPOS_IMAGEN = {
+    'app_registros.marcasenal': 'imagen_marca',
+    'app_registros.imagenmarcapredefinida': 'imagen',
+}
+MAX_INTENTOS = 5
+
+
+def hash_asincrono():
+    return getattr(settings, 'SIMILITUD_HASH_ASINCRONO', False)
+
+
+def encolar(instancia):
+    """Encola el cálculo del hash de ``instancia`` cuando se confirme la transacción."""
+    from app_registros.models import TrabajoHash
+    modelo, pk = instancia._meta.label_lower, instancia.pk
+    transaction.on_commit(lambda: TrabajoHash.objects.bulk_create(
+        [TrabajoHash(modelo=modelo, objeto_id=pk)], ignore_conflicts=True,
+    ))
+
+
+def encolar_faltantes(lote=1000):
+    """
+    Encola las filas con ``hash_pendiente`` que no tienen trabajo (por
+    ejemplo si el proceso terminó entre el commit y el ``on_commit``).
+    """
+    from app_registros.models import TrabajoHash
+    total = 0
+    for etiqueta in CAMPOS_IMAGEN:
+        modelo = apps.get_model(etiqueta)
+        con_trabajo = TrabajoHash.objects.filter(modelo=etiqueta, objeto_id=OuterRef('pk'))
+        pks = (
+            modelo.objects.filter(hash_pendiente=True).filter(~Exists(con_trabajo))
+            .values_list('pk', flat=True)
+        )
+        trabajos = []
+        for pk in pks.iterator(chunk_size=lote):
+            trabajos.append(TrabajoHash(modelo=etiqueta, objeto_id=pk))
+            if len(trabajos) >= lote:
+                TrabajoHash.objects.bulk_create(trabajos, ignore_conflicts=True)
+                total += len(trabajos)
+                trabajos = []
+        TrabajoHash.objects.bulk_create(trabajos, ignore_conflicts=True)
+        total += len(trabajos)
+    return total
+
+
+def procesar_pendientes(lote=50):
+    """
+    Toma hasta ``lote`` trabajos y calcula sus hashes. Varios workers pueden
+    correr a la vez: cada uno saltea las filas que otro tiene bloqueadas.
+
+    Devuelve ``(procesados, errores)``.
+    """
+    from app_registros.models import TrabajoHash
+    procesados = errores = 0
+    cambiados = set()
+    with transaction.atomic():
+        trabajos = list(
+            TrabajoHash.objects.select_for_update(skip_locked=True)
+            .filter(disponible_desde__lte=timezone.now())
+            .order_by('fecha_creacion')[:lote]
+        )
+        for trabajo in trabajos:
+            if _procesar(trabajo, cambiados):
+                procesados += 1
+            else:
+                errores += 1
+        # Una versión por modelo y lote, publicada después del commit
+        for etiqueta in sorted(cambiados):
+            invalidar_indice(apps.get_model(etiqueta))
+        if 'app_registros.imagenmarcapredefinida' in cambiados:
+            predefinidas.invalidar()
+    return procesados, errores
+
+
+def _procesar(trabajo, cambiados):
+    """Calcula el hash de ``trabajo``; agrega a ``cambiados`` el modelo si guardó uno."""
+    modelo = apps.get_model(trabajo.modelo)
+    campo = CAMPOS_IMAGEN[trabajo.modelo]
+    nombre = modelo.objects.filter(pk=trabajo.objeto_id).values_list(campo, flat=True).first()
+    if not nombre:
+        # La fila se borró o ya no tiene imagen
+        modelo.objects.filter(pk=trabajo.objeto_id).update(hash_pendiente=False)
+        trabajo.delete()
+        return True
+
+    try:
+        with modelo._meta.get_field(campo).storage.open(nombre, 'rb') as f:
+            contenido = f.read()
+        nuevo_hash, huellas = hash_y_huellas(contenido)
+        if not nuevo_hash:
+            raise ValueError('No se pudo decodificar la imagen.')
+    except Exception as e:
+        trabajo.intentos += 1
+        if trabajo.intentos >= MAX_INTENTOS:
+            modelo.objects.filter(pk=trabajo.objeto_id).update(hash_pendiente=False)
+            trabajo.delete()
+        else:
+            trabajo.error = str(e)
+            trabajo.disponible_desde = timezone.now() + timedelta(minutes=2 ** trabajo.intentos)
+            trabajo.save(update_fields=['intentos', 'error', 'disponible_desde'])
+        return False
+
+    valores = {
+        'image_hash': nuevo_hash,
+        'imagen_digest': digest_contenido(contenido),
+        'huellas': huellas,
+        'hash_pendiente': False,
+    }
+    campos = {f.name for f in modelo._meta.concrete_fields}
+    valores.update({k: v for k, v in columnas_hash(nuevo_hash).items() if k in campos})
+
+    # Si mientras tanto se subió otra imagen, este hash ya no sirve: el
+    # trabajo de la imagen nueva se encola al confirmar ese guardado.
+    if modelo.objects.filter(pk=trabajo.objeto_id, **{campo: nombre}).update(**valores):
+        cambiados.add(trabajo.modelo)
+    trabajo.delete()
+    return True
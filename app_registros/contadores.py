@@ -0,0 +1,84 @@
+"""
+contadores.py
+-------------
+Numeraciones correlativas seguras ante pedidos concurrentes.
+
+Cada numeración es una fila de Contador. Se incrementa con un UPDATE
+atómico (``valor = valor + n``) que deja la fila bloqueada hasta el fin de la
+transacción: dos altas simultáneas nunca reciben el mismo número. Si se pide
+dentro de una transacción que después se revierte, el número queda libre.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+NUMERO_ORDEN = 'numero_orden'
+
+
+def reservar(nombre, cantidad=1, inicial=None):
+    """
+    Reserva ``cantidad`` números consecutivos de la numeración ``nombre`` y
+    devuelve el ``range`` reservado. Sirve para importaciones masivas.
+
+    Si el contador todavía no existe se crea partiendo de ``inicial()``
+    (el último número ya usado) o de 0.
+    """
+    from app_registros.models import Contador
+    if cantidad < 1:
+        raise ValueError('La cantidad a reservar debe ser al menos 1.')
+    with transaction.atomic():
+        if not Contador.objects.filter(nombre=nombre).update(valor=F('valor') + cantidad):
+            try:
+                with transaction.atomic():
+                    Contador.objects.create(nombre=nombre, valor=(inicial() if inicial else 0) + cantidad)
+            except IntegrityError:
+                # Otro proceso lo creó primero
+                Contador.objects.filter(nombre=nombre).update(valor=F('valor') + cantidad)
+        ultimo = Contador.objects.filter(nombre=nombre).values_list('valor', flat=True).get()
+    return range(ultimo - cantidad + 1, ultimo + 1)
+
+
+def siguiente(nombre, inicial=None):
+    """Próximo número de la numeración ``nombre``."""
+    return reservar(nombre, 1, inicial)[0]
+
+
+def _ultimo_numero_orden():
+    from app_registros.models import MarcaSenal
+    return MarcaSenal.objects.aggregate(ultimo=Max('numero_orden'))['ultimo'] or 0
+
+
+def siguiente_numero_orden():
+    return siguiente(NUMERO_ORDEN, _ultimo_numero_orden)
+
+
+def reservar_numeros_orden(cantidad):
+    """Bloque de ``numero_orden`` para asignar a mano (p. ej. antes de un bulk_create)."""
+    return reservar(NUMERO_ORDEN, cantidad, _ultimo_numero_orden)
+
+
+# Expedientes: una numeración por año, "EX-AAAA-NNNNN"
+
+def _formato_expediente(año, numero):
+    return f"EX-{año}-{numero:05d}"
+
+
+def _ultimo_expediente(año):
+    from app_registros.models import Solicitud
+    prefijo = _formato_expediente(año, 0)[:-5]
+    numeros = Solicitud.objects.filter(
+        numero_expediente__startswith=prefijo
+    ).values_list('numero_expediente', flat=True)
+    return max((int(n[len(prefijo):]) for n in numeros if n[len(prefijo):].isdigit()), default=0)
+
+
+def reservar_numeros_expediente(cantidad, año=None):
+    """Lista de ``cantidad`` números de expediente consecutivos del año (por defecto el actual)."""
+    año = año or timezone.now().year
+    rango = reservar(f'expediente_{año}', cantidad, lambda: _ultimo_expediente(año))
+    return [_formato_expediente(año, numero) for numero in rango]
+
+
+def siguiente_numero_expediente(año=None):
+    return reservar_numeros_expediente(1, año)[0]
@@ -0,0 +1,121 @@
+"""
+conteo.py
+---------
+Conteos aproximados para listados grandes.
+
+``COUNT(*)`` en PostgreSQL recorre todas las filas que cumplen el filtro.
+Para mostrar "N resultados" o calcular páginas alcanza con la estimación del
+planificador: ``pg_class.reltuples`` si no hay filtro, o las filas que
+estima ``EXPLAIN`` si lo hay. Solo cuando la estimación queda por debajo de
+CONTEO_EXACTO_HASTA se cuenta de verdad. En otros motores siempre se cuenta.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def _umbral():
+    return getattr(settings, 'CONTEO_EXACTO_HASTA', 10000)
+
+
+def estimar(queryset):
+    """Filas estimadas por PostgreSQL para ``queryset``, o None si no hay estimación."""
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+    with conexion.cursor() as cursor:
+        consulta = queryset.query
+        if not consulta.where and not consulta.distinct and not consulta.is_sliced:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [conexion.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            fila = cursor.fetchone()
+            # -1: la tabla nunca se analizó
+            return int(fila[0]) if fila and fila[0] >= 0 else None
+        sql, params = queryset.order_by().query.get_compiler(queryset.db).as_sql()
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def contar(queryset):
+    """
+    ``(cantidad, aproximado)``: la estimación si supera CONTEO_EXACTO_HASTA,
+    si no el ``count()`` exacto.
+    """
+    estimado = estimar(queryset)
+    if estimado is not None and estimado >= _umbral():
+        return estimado, True
+    return queryset.count(), False
+
+
+class PaginaAproximada(Page):
+    """Página de un conteo estimado: ``has_next`` sale de leer una fila de más."""
+
+    def __init__(self, object_list, number, paginator, hay_siguiente):
+        super().__init__(object_list, number, paginator)
+        self.hay_siguiente = hay_siguiente
+
+    def has_next(self):
+        return self.hay_siguiente
+
+
+class ConteoAproximadoPaginator(Paginator):
+    """
+    Paginator que usa ``contar()``: la cantidad de páginas puede ser
+    aproximada en listados grandes (``paginator.aproximado``). En ese caso
+    no se confía en ``num_pages``: cualquier página positiva es válida, la
+    siguiente existe si hay filas después y no se ofrecen las últimas.
+    """
+
+    @cached_property
+    def _conteo(self):
+        if hasattr(self.object_list, 'query'):
+            return contar(self.object_list)
+        return len(self.object_list), False
+
+    @cached_property
+    def count(self):
+        return self._conteo[0]
+
+    @property
+    def aproximado(self):
+        return self._conteo[1]
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.aproximado or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        if not self.aproximado:
+            return super().page(number)
+        number = self.validate_number(number)
+        desde = (number - 1) * self.per_page
+        filas = list(self.object_list[desde:desde + self.per_page + 1])
+        return PaginaAproximada(filas[:self.per_page], number, self, len(filas) > self.per_page)
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        paginas = super().get_elided_page_range(number, on_each_side=on_each_side, on_ends=on_ends)
+        if not self.aproximado:
+            return paginas
+        # Sin las últimas páginas, que salen de la estimación
+        hasta = self.validate_number(number) + on_each_side
+        recortadas = []
+        for pagina in paginas:
+            if pagina != self.ELLIPSIS and pagina > hasta:
+                break
+            recortadas.append(pagina)
+        if recortadas[-1] != self.ELLIPSIS:
+            recortadas.append(self.ELLIPSIS)
+        return recortadas
@@ -259,13 +259,60 @@ from .validators import NumeroOrdenValidator
 
 
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from datetime import date
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
 from .models import MarcaSenal, ImagenMarcaPredefinida, TipoSenal, Campo, Solicitud
+from .predefinidas import imagenes_activas
+
+
+class PredefinidasChoiceIterator(ModelChoiceIterator):
+    """Opciones tomadas de la caché de predefinidas activas (sin consultar la BD)."""
+
+    def __iter__(self):
+        for obj in imagenes_activas():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(imagenes_activas())
+
+    def __bool__(self):
+        return bool(imagenes_activas())
+
+
+class PredefinidasMultipleChoiceField(forms.ModelMultipleChoiceField):
+    iterator = PredefinidasChoiceIterator
+
+
+class AutocompletarSelect(forms.Select):
+    """
+    Select que solo trae de la BD las opciones elegidas; las demás las carga
+    static/js/autocompletar.js desde la URL de ``data-autocompletar`` mientras
+    se escribe. La validación sigue usando el queryset del campo.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        iterador = self.choices
+        opciones = []
+        if getattr(iterador, 'field', None) is None:
+            return super().optgroups(name, value, attrs)
+        if iterador.field.empty_label is not None:
+            opciones.append(('', iterador.field.empty_label))
+        elegidos = [v for v in value if str(v).isdigit()]
+        if elegidos:
+            opciones += [iterador.choice(obj) for obj in iterador.queryset.filter(pk__in=elegidos)]
+        self.choices = opciones
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterador
+
 
 class MarcaSenalForm(forms.ModelForm):
 
     # 🔹 MANY TO MANY
-    imagenes_predefinidas = forms.ModelMultipleChoiceField(
+    imagenes_predefinidas = PredefinidasMultipleChoiceField(
         queryset=ImagenMarcaPredefinida.objects.filter(activa=True),
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'imagen-checkbox'
@@ -366,10 +413,6 @@ class MarcaSenalForm(forms.ModelForm):
         self.fields['tipo_senal'].queryset = TipoSenal.objects.all()
         self.fields['tipo_senal'].empty_label = "Seleccione un tipo de señal"
 
-        self.fields['imagenes_predefinidas'].queryset = (
-            ImagenMarcaPredefinida.objects.filter(activa=True)
-        )
-
         # Filtrar campos por productor
         if 'productor' in self.data:
             try:
@@ -401,8 +444,8 @@ class MarcaSenalForm(forms.ModelForm):
     
     def clean_imagen_marca(self):
         imagen = self.cleaned_data.get('imagen_marca')
-        # Solo validar si es una imagen nueva (no una URL/string de archivo existente)
-        if imagen and hasattr(imagen, 'read'):
+        # Solo validar si es una imagen nueva (no el archivo ya guardado)
+        if imagen and isinstance(imagen, UploadedFile):
             from app_registros.validators import ImagenDuplicadaValidator
             validar = ImagenDuplicadaValidator(
                 excluir_id=self.instance.pk if self.instance.pk else None
@@ -495,9 +538,10 @@ class SolicitudForm(forms.ModelForm):
             'fecha_vencimiento'
         ]
         widgets = {
-            'productor': forms.Select(attrs={
+            'productor': AutocompletarSelect(attrs={
                 'class': 'form-control',
-                'required': 'required'
+                'required': 'required',
+                'data-autocompletar': reverse_lazy('ajax_autocompletar_productores'),
             }),
             'tipo_tramite': forms.Select(attrs={
                 'class': 'form-control',
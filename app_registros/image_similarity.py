@@ -5,34 +5,176 @@ Detecta imágenes duplicadas o similares usando hashing perceptual (pHash).
 No requiere API externa: todo se procesa localmente.
 """
 
+import hashlib
 import imagehash
+import numpy as np
 from PIL import Image
 import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import IntegerField
+from django.db.models.expressions import RawSQL
+
+from app_registros import versiones
 
 # Umbral de distancia de Hamming (0=idénticas, >8=muy diferentes)
 HASH_THRESHOLD = 8
 HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+HASH_PALABRAS = HASH_BITS // 64
 
 
-def calcular_hash(imagen_field):
-    """Recibe un ImageField de Django y devuelve su hash perceptual."""
+def digest_contenido(contenido):
+    """Huella barata (blake2b) de los bytes del archivo, para saber si cambió."""
+    return hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+
+def _archivo_base(imagen_field):
+    # Un FieldFile con un archivo recién subido lo envuelve en ``_file``;
+    # ahí se guarda la huella para que el form y el modelo la compartan.
+    return getattr(imagen_field, "_file", None) or imagen_field
+
+
+def huella_imagen(imagen_field, digest_conocido=None):
+    """
+    Devuelve ``(digest, hash, huellas)`` leyendo el archivo una sola vez.
+
+    Si el digest coincide con ``digest_conocido`` no se decodifica la imagen
+    y el hash vuelve como None. El resultado queda memorizado en el archivo.
+    """
     if not imagen_field:
-        return None
+        return None, None, None
+    base = _archivo_base(imagen_field)
+    memo = getattr(base, "_huella_perceptual", None)
+    if memo is not None:
+        return memo
     try:
         imagen_field.seek(0)
         img_bytes = imagen_field.read()
         imagen_field.seek(0)
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-        return str(imagehash.phash(img, hash_size=HASH_SIZE))
     except Exception:
-        return None
+        return None, None, None
+    digest = digest_contenido(img_bytes)
+    if digest == digest_conocido:
+        return digest, None, None
+    huella = (digest, *hash_y_huellas(img_bytes))
+    try:
+        base._huella_perceptual = huella
+    except AttributeError:
+        pass
+    return huella
+
+
+def calcular_hash(imagen_field):
+    """Recibe un ImageField de Django y devuelve su hash perceptual."""
+    return huella_imagen(imagen_field)[1]
+
+
+def actualizar_hash_imagen(instancia, campo_imagen, update_fields=None):
+    """
+    Recalcula ``image_hash``/``imagen_digest`` de ``instancia`` solo si el
+    archivo de ``campo_imagen`` cambió desde que se cargó de la BD.
+
+    Devuelve los campos modificados, para sumarlos a ``update_fields``.
+    """
+    if update_fields is not None and campo_imagen not in update_fields:
+        return []
+    imagen = getattr(instancia, campo_imagen)
+    if not imagen:
+        return []
+    mismo_archivo = (
+        getattr(imagen, "_committed", True)
+        and imagen.name == getattr(instancia, "_imagen_original", None)
+    )
+    if mismo_archivo and instancia.image_hash:
+        return []
+
+    if getattr(_archivo_base(imagen), "_huella_perceptual", None) is None:
+        from app_registros.cola_hashes import hash_asincrono
+        if hash_asincrono():
+            # Lo calcula el worker después del commit; mientras tanto la
+            # imagen queda fuera del índice.
+            instancia.image_hash = None
+            instancia.imagen_digest = None
+            instancia.huellas = {}
+            instancia.hash_pendiente = True
+            return ["image_hash", "imagen_digest", "huellas", "hash_pendiente"]
+
+    digest, nuevo_hash, huellas = huella_imagen(
+        imagen, digest_conocido=instancia.imagen_digest if instancia.image_hash else None
+    )
+    if not nuevo_hash:
+        # Mismo contenido con otro nombre, o una imagen que no se pudo leer.
+        return []
+    instancia.image_hash = nuevo_hash
+    instancia.imagen_digest = digest
+    instancia.huellas = huellas or {}
+    instancia.hash_pendiente = False
+    return ["image_hash", "imagen_digest", "huellas", "hash_pendiente"]
+
+
+# Bits en que puede diferir el pHash de una decodificación reducida (lado de
+# HASH_SIZE * 4 * 4 px o más) del de la imagen completa.
+DERIVA_DECODIFICACION_REDUCIDA = 4
+
+
+def _lado_decodificacion():
+    # El pHash achica la imagen a HASH_SIZE * 4 px de lado; decodificar a unas
+    # cuatro veces eso (HASH_SIZE * 4 * 4) es mucho más rápido (ver
+    # benchmark_hash_imagenes) pero es una aproximación opcional: el hash
+    # difiere hasta DERIVA_DECODIFICACION_REDUCIDA bits. 0 = tamaño completo.
+    return getattr(settings, "SIMILITUD_LADO_DECODIFICACION", 0)
+
+
+def abrir_para_hash(fuente, lado=None):
+    """
+    Abre la imagen (ruta o archivo) en escala de grises y al menor tamaño que
+    sirve para el pHash: los JPEG se decodifican en modo borrador (libjpeg
+    escala 1/2, 1/4 u 1/8 en el dominio DCT) y el resto se achica con reduce().
+    """
+    lado = _lado_decodificacion() if lado is None else lado
+    img = Image.open(fuente)
+    if lado and img.format == "JPEG":
+        img.draft("L", (lado, lado))
+    if img.mode != "L":
+        img = img.convert("L")
+    factor = min(img.size) // lado if lado else 0
+    if factor > 1:
+        img = img.reduce(factor)
+    return img
+
+
+def _decodificar(fuente, lado=None):
+    """
+    Como abrir_para_hash, pero sin perder el color: devuelve ``(gris, img)``,
+    la imagen en grises para los hashes y la decodificada para el colorHash.
+    Los JPEG se decodifican en YCbCr, cuyo canal Y es exactamente lo que
+    libjpeg entrega en modo "L".
+    """
+    lado = _lado_decodificacion() if lado is None else lado
+    img = Image.open(fuente)
+    if lado and img.format == "JPEG":
+        img.draft("YCbCr", (lado, lado))
+    if img.mode == "YCbCr":
+        gris = img.getchannel(0)
+    elif img.mode != "L":
+        gris = img.convert("L")
+    else:
+        gris = img
+    factor = min(gris.size) // lado if lado else 0
+    if factor > 1:
+        gris = gris.reduce(factor)
+    return gris, img
 
 
 def calcular_hash_desde_path(path):
     """Calcula el hash desde una ruta de archivo en disco."""
     try:
-        img = Image.open(path).convert("RGB")
-        return str(imagehash.phash(img, hash_size=HASH_SIZE))
+        return str(imagehash.phash(abrir_para_hash(path), hash_size=HASH_SIZE))
     except Exception:
         return None
 
@@ -40,17 +182,216 @@ def calcular_hash_desde_path(path):
 def calcular_hash_desde_bytes(img_bytes):
     """Calcula el hash desde bytes crudos. Usado en las vistas AJAX."""
     try:
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-        return str(imagehash.phash(img, hash_size=HASH_SIZE))
+        return str(imagehash.phash(abrir_para_hash(io.BytesIO(img_bytes)), hash_size=HASH_SIZE))
     except Exception:
         return None
 
 
-def distancia(hash_a: str, hash_b: str) -> int:
+# ─────────────────────────────────────────────────────────────────────────────
+# HUELLAS ADICIONALES (motor en cascada)
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Umbrales de cada etapa, en bits sobre hashes de 64 bits. La última etapa
+# es el pHash con HASH_THRESHOLD, igual que la búsqueda simple.
+UMBRAL_AHASH = 6
+UMBRAL_DHASH = 12
+UMBRAL_WHASH = 12
+MAX_CANDIDATOS_CASCADA = 500
+PESOS_PUNTAJE = {"phash": 0.4, "dhash": 0.2, "whash": 0.2, "ahash": 0.1, "colorhash": 0.1}
+
+# Rotaciones y espejados de la imagen consultada; la primera es la original.
+VARIANTES = (
+    ("original", None),
+    ("rotada 90°", Image.Transpose.ROTATE_90),
+    ("rotada 180°", Image.Transpose.ROTATE_180),
+    ("rotada 270°", Image.Transpose.ROTATE_270),
+    ("espejada horizontal", Image.Transpose.FLIP_LEFT_RIGHT),
+    ("espejada vertical", Image.Transpose.FLIP_TOP_BOTTOM),
+    ("transpuesta", Image.Transpose.TRANSPOSE),
+    ("transversa", Image.Transpose.TRANSVERSE),
+)
+
+
+# Huellas que salen de la imagen en grises, en el orden de la cascada.
+_HASHES_GRISES = {
+    "ahash": lambda img: str(imagehash.average_hash(img)),
+    "dhash": lambda img: str(imagehash.dhash(img)),
+    "whash": lambda img: str(imagehash.whash(img, image_scale=64)),
+    "phash": lambda img: str(imagehash.phash(img, hash_size=HASH_SIZE)),
+}
+
+
+def _colorhash(img):
+    if img.mode not in ("RGB", "YCbCr"):
+        img = img.convert("RGB")
+    factor = min(img.size) // 64
+    if factor > 1:
+        img = img.reduce(factor)
+    return str(imagehash.colorhash(img.convert("RGB"), binbits=3))
+
+
+def hash_y_huellas(img_bytes):
+    """
+    pHash y huellas adicionales que se guardan junto a él (JSON ``huellas``:
+    aHash, dHash, wHash y colorHash) con una sola decodificación. Devuelve
+    ``(None, {})`` si la imagen no se pudo leer.
+    """
     try:
-        return imagehash.hex_to_hash(hash_a) - imagehash.hex_to_hash(hash_b)
+        gris, img = _decodificar(io.BytesIO(img_bytes))
+        huellas = {tipo: calcular(gris) for tipo, calcular in _HASHES_GRISES.items()}
+        huellas["colorhash"] = _colorhash(img)
     except Exception:
+        return None, {}
+    return huellas.pop("phash"), huellas
+
+
+class VarianteConsulta:
+    """
+    Una rotación/espejado (VARIANTES) de la imagen a buscar. El aHash, que es
+    el prefiltro de la cascada, y el colorHash, que no cambia al rotar, se
+    calculan al crearla; los demás hashes, recién cuando algún candidato
+    llega a esa etapa.
+    """
+
+    def __init__(self, nombre, gris, colorhash):
+        self.nombre = nombre
+        self._gris = gris
+        self._huellas = {"ahash": _HASHES_GRISES["ahash"](gris), "colorhash": colorhash}
+
+    def get(self, tipo):
+        if tipo not in self._huellas:
+            calcular = _HASHES_GRISES.get(tipo)
+            if calcular is None:
+                return None
+            self._huellas[tipo] = calcular(self._gris)
+        return self._huellas[tipo]
+
+
+# Lado al que se achica la imagen antes de rotarla: todos los hashes la
+# reducen a lo sumo a HASH_SIZE * 4 px (pHash y wHash).
+LADO_VARIANTES = HASH_SIZE * 4
+
+
+def huellas_consulta(img_bytes):
+    """
+    Una VarianteConsulta por cada rotación/espejado de VARIANTES. Se decodifica
+    una sola vez; la original usa la imagen completa (su pHash es el mismo que
+    el guardado) y las demás rotan una copia de LADO_VARIANTES px de lado.
+    Devuelve [] si falla.
+    """
+    try:
+        gris, img = _decodificar(io.BytesIO(img_bytes))
+        color = _colorhash(img)
+    except Exception:
+        return []
+    chica = gris.resize((LADO_VARIANTES, LADO_VARIANTES), Image.Resampling.LANCZOS)
+    return [
+        VarianteConsulta(nombre, chica.transpose(transformacion) if transformacion else gris, color)
+        for nombre, transformacion in VARIANTES
+    ]
+
+
+def _distancia_bits(hash_a, hash_b):
+    """Distancia de Hamming entre dos hashes hex del mismo largo (None si no se puede)."""
+    if not hash_a or not hash_b or len(hash_a) != len(hash_b):
+        return None
+    try:
+        return (int(hash_a, 16) ^ int(hash_b, 16)).bit_count()
+    except ValueError:
+        return None
+
+
+def puntaje_combinado(distancias, largos):
+    """
+    Promedio ponderado (PESOS_PUNTAJE) de las distancias normalizadas por el
+    largo en bits de cada huella: 0 es idéntica, 1 totalmente distinta.
+    """
+    total = peso_total = 0.0
+    for tipo, dist in distancias.items():
+        peso = PESOS_PUNTAJE.get(tipo)
+        if peso is None or dist is None or not largos.get(tipo):
+            continue
+        total += peso * dist / largos[tipo]
+        peso_total += peso
+    return round(total / peso_total, 4) if peso_total else 1.0
+
+
+def hash_a_entero(hash_hex, bits=HASH_BITS):
+    """Convierte el hash hexadecimal guardado en la BD a un entero de ``bits`` bits."""
+    if not hash_hex:
+        return None
+    try:
+        valor = int(hash_hex, 16)
+    except (TypeError, ValueError):
+        return None
+    if len(hash_hex) * 4 != bits:
+        return None
+    return valor
+
+
+def hash_a_palabras(hash_hex, bits=HASH_BITS):
+    """Empaqueta el hash en ``bits // 64`` enteros uint64 (el primero es el más significativo)."""
+    if hash_a_entero(hash_hex, bits) is None:
+        return None
+    return np.frombuffer(bytes.fromhex(hash_hex), dtype=">u8").astype(np.uint64)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(matriz):
+        return np.bitwise_count(matriz).sum(axis=-1, dtype=np.int64)
+else:
+    # NumPy < 2.0: se cuentan los bits por byte con una tabla precalculada.
+    _BITS_POR_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(matriz):
+        bytes_ = np.ascontiguousarray(matriz).view(np.uint8)
+        return _BITS_POR_BYTE[bytes_].sum(axis=-1, dtype=np.int64)
+
+
+def limites_segmentos(bits=HASH_BITS, umbral=HASH_THRESHOLD):
+    """Devuelve ``[(desplazamiento, mascara), ...]`` de los ``umbral + 1`` segmentos del hash."""
+    cantidad = umbral + 1
+    base, resto = divmod(bits, cantidad)
+    limites = []
+    desplazamiento = 0
+    for i in range(cantidad):
+        ancho = base + (1 if i < resto else 0)
+        limites.append((desplazamiento, (1 << ancho) - 1))
+        desplazamiento += ancho
+    return limites
+
+
+_LIMITES_HASH = limites_segmentos()
+
+
+def columnas_hash(hash_hex):
+    """
+    Valores de las columnas enteras de MarcaSenal derivadas del hash:
+    las palabras de 64 bits con signo (``image_hash_0..3``) y las claves de
+    segmento (``image_hash_segmentos``) que usa el prefiltro en PostgreSQL.
+    """
+    columnas = {f"image_hash_{i}": None for i in range(HASH_PALABRAS)}
+    columnas["image_hash_segmentos"] = None
+    valor = hash_a_entero(hash_hex)
+    if valor is None:
+        return columnas
+    for i, palabra in enumerate(hash_a_palabras(hash_hex).view(np.int64)):
+        columnas[f"image_hash_{i}"] = int(palabra)
+    # Cada clave lleva el número de segmento en los bits altos para que
+    # segmentos distintos con el mismo valor no coincidan entre sí.
+    columnas["image_hash_segmentos"] = [
+        (i << 32) | ((valor >> desp) & mascara)
+        for i, (desp, mascara) in enumerate(_LIMITES_HASH)
+    ]
+    return columnas
+
+
+def distancia(hash_a: str, hash_b: str) -> int:
+    a = hash_a_entero(hash_a)
+    b = hash_a_entero(hash_b)
+    if a is None or b is None:
         return 999
+    return (a ^ b).bit_count()
 
 
 def son_similares(hash_a: str, hash_b: str, threshold: int = HASH_THRESHOLD) -> bool:
@@ -59,54 +400,676 @@ def son_similares(hash_a: str, hash_b: str, threshold: int = HASH_THRESHOLD) ->
     return distancia(hash_a, hash_b) <= threshold
 
 
-def buscar_duplicados_marca(hash_nuevo: str, excluir_id: int = None) -> list:
-    """Busca en MarcaSenal imágenes visualmente similares."""
+# ─────────────────────────────────────────────────────────────────────────────
+# ÍNDICE DE HAMMING (multi-index hashing)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class IndiceHamming:
+    """
+    Índice en memoria para buscar hashes a distancia de Hamming <= umbral.
+
+    Cada hash se parte en ``umbral + 1`` segmentos disjuntos. Si dos hashes
+    difieren en a lo sumo ``umbral`` bits, por el principio del palomar al
+    menos un segmento coincide exacto: basta con juntar los candidatos de
+    cada tabla de segmentos y verificar solo esos con XOR + popcount.
+
+    Los hashes se guardan como filas de ``bits // 64`` palabras uint64 en una
+    matriz compacta. Las filas cargadas de una vez quedan en arreglos
+    ordenados por segmento (búsqueda binaria); las que se agregan después van
+    a diccionarios chicos y las borradas se marcan, hasta que se compacta.
+    """
+
+    def __init__(self, bits=HASH_BITS, umbral=HASH_THRESHOLD):
+        self.bits = bits
+        self.umbral = umbral
+        self._segmentos = limites_segmentos(bits, umbral)
+        palabras = bits // 64
+        self._matriz = np.zeros((0, palabras), dtype=np.uint64)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._vivas = np.zeros(0, dtype=bool)
+        self._n = 0
+        self._filas = {}
+        self._borradas = 0
+        # Por segmento: (claves ordenadas, filas) de las filas compactadas ...
+        self._ordenados = [(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64))
+                           for _ in self._segmentos]
+        # ... y {clave: [filas]} de las agregadas desde la última compactación.
+        self._tablas = [{} for _ in self._segmentos]
+        self._agregadas = 0
+
+    def __len__(self):
+        return len(self._filas)
+
+    def __contains__(self, pk):
+        return pk in self._filas
+
+    def _claves(self, valor):
+        return [(valor >> desp) & mascara for desp, mascara in self._segmentos]
+
+    def _claves_matriz(self, matriz, desp, mascara):
+        """Extrae un segmento de todas las filas (la palabra 0 es la más significativa)."""
+        ultima = matriz.shape[1] - 1
+        palabra, corrimiento = divmod(desp, 64)
+        claves = matriz[:, ultima - palabra] >> np.uint64(corrimiento)
+        if corrimiento and corrimiento + mascara.bit_length() > 64:
+            claves = claves | (matriz[:, ultima - palabra - 1] << np.uint64(64 - corrimiento))
+        return claves & np.uint64(mascara)
+
+    def _agregar_fila(self, pk, palabras):
+        fila = self._n
+        if fila == len(self._matriz):
+            capacidad = max(1024, 2 * len(self._matriz))
+            self._matriz = np.resize(self._matriz, (capacidad, self._matriz.shape[1]))
+            self._ids = np.resize(self._ids, capacidad)
+            self._vivas = np.resize(self._vivas, capacidad)
+        self._matriz[fila] = palabras
+        self._ids[fila] = pk
+        self._vivas[fila] = True
+        self._filas[pk] = fila
+        self._n += 1
+        return fila
+
+    def agregar(self, pk, hash_hex):
+        """Agrega (o reemplaza) el hash de ``pk``. Hashes inválidos lo quitan del índice."""
+        self.quitar(pk)
+        valor = hash_a_entero(hash_hex, self.bits)
+        if valor is None:
+            return
+        fila = self._agregar_fila(pk, hash_a_palabras(hash_hex, self.bits))
+        for tabla, clave in zip(self._tablas, self._claves(valor)):
+            tabla.setdefault(clave, []).append(fila)
+        self._agregadas += 1
+        if self._agregadas > max(1024, self._n // 4):
+            self.compactar()
+
+    def cargar(self, pares):
+        """Agrega de una vez muchos ``(pk, hash_hex)`` y deja el índice compactado."""
+        nuevos = {}
+        for pk, hash_hex in pares:
+            if not hash_hex or len(hash_hex) * 4 != self.bits:
+                continue
+            try:
+                nuevos[pk] = bytes.fromhex(hash_hex)
+            except ValueError:
+                continue
+        for pk in nuevos:
+            if pk in self._filas:
+                self.quitar(pk)
+        if nuevos:
+            palabras = self.bits // 64
+            matriz = np.frombuffer(b"".join(nuevos.values()), dtype=">u8").reshape(-1, palabras)
+            self._matriz = np.concatenate([self._matriz[:self._n], matriz.astype(np.uint64)])
+            self._ids = np.concatenate([self._ids[:self._n], np.fromiter(nuevos, dtype=np.int64)])
+            self._vivas = np.concatenate([self._vivas[:self._n], np.ones(len(nuevos), dtype=bool)])
+            self._n = len(self._ids)
+        self.compactar()
+
+    def quitar(self, pk):
+        fila = self._filas.pop(pk, None)
+        if fila is None:
+            return
+        self._vivas[fila] = False
+        self._borradas += 1
+        if self._borradas > max(1024, self._n // 4):
+            self.compactar()
+
+    def compactar(self):
+        """Descarta las filas borradas y vuelve a ordenar todas las tablas de segmentos."""
+        vivas = self._vivas[:self._n]
+        self._matriz = self._matriz[:self._n][vivas]
+        self._ids = self._ids[:self._n][vivas]
+        self._n = len(self._ids)
+        self._vivas = np.ones(self._n, dtype=bool)
+        self._filas = dict(zip(self._ids.tolist(), range(self._n)))
+        self._ordenados = []
+        for desp, mascara in self._segmentos:
+            claves = self._claves_matriz(self._matriz, desp, mascara)
+            orden = np.argsort(claves, kind="stable")
+            self._ordenados.append((claves[orden], orden))
+        self._tablas = [{} for _ in self._segmentos]
+        self._borradas = 0
+        self._agregadas = 0
+
+    def _distancias(self, filas, palabras):
+        return _popcount(np.bitwise_xor(self._matriz[filas], palabras))
+
+    def buscar(self, hash_hex, umbral=None):
+        """Devuelve ``[(pk, distancia), ...]`` ordenado por distancia."""
+        umbral = self.umbral if umbral is None else umbral
+        if umbral > self.umbral:
+            # El palomar solo garantiza el umbral con que se armó el índice.
+            return self.buscar_lote([hash_hex], umbral=umbral)[0]
+        valor = hash_a_entero(hash_hex, self.bits)
+        if valor is None or not self._filas:
+            return []
+
+        partes = []
+        for (claves, filas), tabla, clave in zip(self._ordenados, self._tablas, self._claves(valor)):
+            desde = np.searchsorted(claves, np.uint64(clave), side="left")
+            hasta = np.searchsorted(claves, np.uint64(clave), side="right")
+            if hasta > desde:
+                partes.append(filas[desde:hasta])
+            agregadas = tabla.get(clave)
+            if agregadas:
+                partes.append(np.array(agregadas, dtype=np.int64))
+        if not partes:
+            return []
+        candidatas = np.unique(np.concatenate(partes))
+        candidatas = candidatas[self._vivas[candidatas]]
+        dist = self._distancias(candidatas, hash_a_palabras(hash_hex, self.bits))
+        cerca = dist <= umbral
+        candidatas, dist = candidatas[cerca], dist[cerca]
+        orden = np.argsort(dist, kind="stable")
+        return [(int(self._ids[f]), int(d)) for f, d in zip(candidatas[orden], dist[orden])]
+
+    def buscar_lote(self, hashes_hex, umbral=None, k=None, filas_por_bloque=65536):
+        """
+        Busca varios hashes de una vez.
+
+        Devuelve una lista (una por consulta) de ``[(pk, distancia), ...]``
+        ordenada por distancia, con a lo sumo ``k`` elementos y sin pasar el
+        umbral si se indica. Las consultas con hash inválido devuelven ``[]``.
+
+        Con un umbral que el índice garantiza se usan los segmentos. Si no, se
+        recorre la matriz por bloques de filas con XOR + popcount vectorizado y
+        de cada bloque solo se guardan los aciertos (o las ``k`` mejores de
+        cada consulta), así la memoria no crece con consultas x filas.
+        """
+        umbral = self.umbral if umbral is None and k is None else umbral
+        if umbral is not None and umbral <= self.umbral:
+            return [self.buscar(hash_hex, umbral)[:k] for hash_hex in hashes_hex]
+
+        n = self._n
+        resultados = [[] for _ in hashes_hex]
+        consultas = []
+        posiciones = []
+        for i, hash_hex in enumerate(hashes_hex):
+            palabras = hash_a_palabras(hash_hex, self.bits)
+            if palabras is not None:
+                consultas.append(palabras)
+                posiciones.append(i)
+        if not consultas or not self._filas:
+            return resultados
+
+        consultas = np.stack(consultas)
+        limite = self.bits if umbral is None else umbral
+        # Distancia de las filas borradas o fuera del umbral: nunca se devuelven.
+        fuera = self.bits + 1
+        bloque = max(1, filas_por_bloque // len(consultas))
+        aciertos = []  # (consulta, fila, distancia)
+        mejores_filas = np.empty((len(consultas), 0), dtype=np.int64)
+        mejores_dist = np.empty((len(consultas), 0), dtype=np.int64)
+        for inicio in range(0, n, bloque):
+            fin = min(inicio + bloque, n)
+            dist = _popcount(np.bitwise_xor(consultas[:, None, :], self._matriz[None, inicio:fin, :]))
+            dist[(dist > limite) | ~self._vivas[None, inicio:fin]] = fuera
+            if k is None:
+                consulta, fila = np.nonzero(dist <= limite)
+                aciertos.append((consulta, fila + inicio, dist[consulta, fila]))
+                continue
+            # Las k mejores hasta ahora, por consulta
+            filas = np.broadcast_to(np.arange(inicio, fin, dtype=np.int64), dist.shape)
+            mejores_filas = np.concatenate([mejores_filas, filas], axis=1)
+            mejores_dist = np.concatenate([mejores_dist, dist], axis=1)
+            if mejores_dist.shape[1] > k:
+                elegidas = np.argpartition(mejores_dist, k - 1, axis=1)[:, :k]
+                mejores_filas = np.take_along_axis(mejores_filas, elegidas, axis=1)
+                mejores_dist = np.take_along_axis(mejores_dist, elegidas, axis=1)
+        if k is not None:
+            consulta = np.repeat(np.arange(len(consultas)), mejores_dist.shape[1])
+            aciertos.append((consulta, mejores_filas.ravel(), mejores_dist.ravel()))
+
+        consulta, filas, dist = (np.concatenate(partes) for partes in zip(*aciertos))
+        validos = dist <= limite
+        consulta, filas, dist = consulta[validos], filas[validos], dist[validos]
+        orden = np.lexsort((filas, dist, consulta))
+        consulta, filas, dist = consulta[orden], filas[orden], dist[orden]
+        cortes = np.searchsorted(consulta, np.arange(1, len(consultas)))
+        for pos, f, d in zip(posiciones, np.split(filas, cortes), np.split(dist, cortes)):
+            resultados[pos] = list(zip(self._ids[f].tolist(), d.tolist()))
+        return resultados
+
+
+# Un índice por modelo, tipo de huella y proceso. La versión compartida en la
+# BD (app_registros.versiones) avisa a los demás procesos que tienen que
+# reconstruir el suyo.
+_indices = {}
+_indices_lock = threading.Lock()
+
+# Tipos de índice: (bits, umbral). "phash" usa image_hash; el resto, el JSON huellas.
+_TIPOS_INDICE = {
+    "phash": (HASH_BITS, HASH_THRESHOLD),
+    "ahash": (64, UMBRAL_AHASH),
+}
+
+
+def _clave_version(modelo):
+    return f"indice:{modelo._meta.model_name}"
+
+
+def _version_global(modelo):
+    return versiones.actual(_clave_version(modelo))
+
+
+def _hash_de_tipo(instancia, tipo):
+    if tipo == "phash":
+        return instancia.image_hash
+    return (getattr(instancia, "huellas", None) or {}).get(tipo)
+
+
+def _construir_indice(modelo, tipo="phash"):
+    indice = IndiceHamming(*_TIPOS_INDICE[tipo])
+    if tipo == "phash":
+        filas = (
+            modelo.objects.exclude(image_hash__isnull=True).exclude(image_hash="")
+            .values_list("pk", "image_hash")
+        )
+        indice.cargar(filas.iterator(chunk_size=5000))
+    else:
+        filas = modelo.objects.values_list("pk", f"huellas__{tipo}")
+        indice.cargar(filas.iterator(chunk_size=5000))
+    return indice
+
+
+def obtener_indice(modelo, tipo="phash"):
+    """Devuelve el índice del modelo, reconstruyéndolo si otro proceso lo modificó."""
+    version = _version_global(modelo)
+    with _indices_lock:
+        actual = _indices.get((modelo, tipo))
+        if actual is not None and actual[0] == version:
+            return actual[1]
+    indice = _construir_indice(modelo, tipo)
+    with _indices_lock:
+        _indices[(modelo, tipo)] = (version, indice)
+    return indice
+
+
+def _registrar_cambio(modelo, aplicar):
+    """
+    Al confirmarse la transacción publica una nueva versión global y aplica
+    el cambio a los índices locales del modelo. ``aplicar(tipo, indice)``
+    recibe cada índice cargado.
+    """
+    def aplicar_local(nueva):
+        with _indices_lock:
+            for tipo in _TIPOS_INDICE:
+                actual = _indices.get((modelo, tipo))
+                if actual is None:
+                    continue
+                version, indice = actual
+                if version + 1 == nueva:
+                    aplicar(tipo, indice)
+                    _indices[(modelo, tipo)] = (nueva, indice)
+                else:
+                    # Nos perdimos cambios de otro proceso: se reconstruye en la próxima búsqueda.
+                    del _indices[(modelo, tipo)]
+
+    versiones.incrementar_al_confirmar(_clave_version(modelo), aplicar_local)
+
+
+def actualizar_en_indice(instancia):
+    """Sincroniza los hashes de ``instancia`` (MarcaSenal o ImagenMarcaPredefinida)."""
+    # Se copian ahora: el cambio se aplica recién después del commit.
+    pk = instancia.pk
+    hashes = {tipo: _hash_de_tipo(instancia, tipo) for tipo in _TIPOS_INDICE}
+    _registrar_cambio(type(instancia), lambda tipo, indice: indice.agregar(pk, hashes[tipo]))
+
+
+def quitar_de_indice(instancia):
+    # delete() deja la pk en None antes del commit
+    pk = instancia.pk
+    _registrar_cambio(type(instancia), lambda tipo, indice: indice.quitar(pk))
+
+
+def invalidar_indice(modelo):
+    """Fuerza a todos los procesos a reconstruir el índice (p. ej. tras un bulk_update)."""
+    _registrar_cambio(modelo, lambda tipo, indice: None)
+    with _indices_lock:
+        for tipo in _TIPOS_INDICE:
+            _indices.pop((modelo, tipo), None)
+
+
+def _candidatos(modelo, hash_nuevo, excluir_id=None):
+    """Busca en el índice y devuelve ``{pk: distancia}``."""
+    encontrados = obtener_indice(modelo).buscar(hash_nuevo)
+    return {pk: dist for pk, dist in encontrados if pk != excluir_id}
+
+
+def _motor_sql():
+    """True si las búsquedas de marcas se resuelven en PostgreSQL (ver SIMILITUD_MOTOR)."""
+    return (
+        getattr(settings, "SIMILITUD_MOTOR", "memoria") == "postgres"
+        and connection.vendor == "postgresql"
+    )
+
+
+def _marcas_similares_sql(hash_nuevo, excluir_id=None, umbral=HASH_THRESHOLD):
+    """
+    Una sola consulta: el índice GIN sobre ``image_hash_segmentos`` deja solo
+    las filas que comparten algún segmento exacto y la distancia se calcula
+    con XOR + bit_count sobre las cuatro palabras. Requiere PostgreSQL 14+.
+    """
     from app_registros.models import MarcaSenal
-    if not hash_nuevo:
-        return []
-    qs = MarcaSenal.objects.exclude(image_hash__isnull=True).exclude(image_hash="")
+    columnas = columnas_hash(hash_nuevo)
+    if columnas["image_hash_segmentos"] is None:
+        return MarcaSenal.objects.none()
+    tabla = connection.ops.quote_name(MarcaSenal._meta.db_table)
+    partes = []
+    params = []
+    for i in range(HASH_PALABRAS):
+        columna = connection.ops.quote_name(f"image_hash_{i}")
+        partes.append(f"bit_count(({tabla}.{columna} # %s::bigint)::bit(64))")
+        params.append(columnas[f"image_hash_{i}"])
+    qs = (
+        MarcaSenal.objects
+        .filter(image_hash_segmentos__overlap=columnas["image_hash_segmentos"])
+        .annotate(distancia_bd=RawSQL(" + ".join(partes), params, output_field=IntegerField()))
+        .filter(distancia_bd__lte=umbral)
+        .select_related("productor")
+    )
     if excluir_id:
         qs = qs.exclude(pk=excluir_id)
-    duplicados = []
-    for marca in qs.select_related("productor"):
-        if son_similares(hash_nuevo, marca.image_hash):
-            duplicados.append({
-                "id": marca.pk,
-                "numero_orden": marca.numero_orden,
-                "productor": str(marca.productor),
-                "productor_id": marca.productor.pk,
-                "descripcion": marca.descripcion_marca[:80],
-                "distancia": distancia(hash_nuevo, marca.image_hash),
-                "imagen_url": marca.imagen_marca.url if marca.imagen_marca else None,
-            })
-    duplicados.sort(key=lambda x: x["distancia"])
+    return qs
+
+
+def _datos_marca(marca, dist):
+    return {
+        "id": marca.pk,
+        "numero_orden": marca.numero_orden,
+        "productor": str(marca.productor),
+        "productor_id": marca.productor.pk,
+        "descripcion": marca.descripcion_marca[:80],
+        "distancia": dist,
+        "imagen_url": marca.imagen_marca.url if marca.imagen_marca else None,
+    }
+
+
+def _datos_predefinida(img, dist):
+    return {
+        "id": img.pk,
+        "nombre": img.nombre,
+        "tipo_marca": img.get_tipo_marca_display(),
+        "distancia": dist,
+    }
+
+
+def _armar_resultados(hash_nuevo, pks, objetos, datos, umbral=HASH_THRESHOLD):
+    """
+    Arma la lista de resultados para ``pks`` a partir de los objetos traídos
+    de la BD. El hash se vuelve a verificar por si otro proceso lo cambió
+    después de armar el índice.
+    """
+    resultados = []
+    for pk in pks:
+        obj = objetos.get(pk)
+        if obj is None:
+            continue
+        dist = distancia(hash_nuevo, obj.image_hash)
+        if dist <= umbral:
+            resultados.append(datos(obj, dist))
+    resultados.sort(key=lambda x: x["distancia"])
+    return resultados
+
+
+def _marcas_por_pk(pks):
+    from app_registros.models import MarcaSenal
+    if not pks:
+        return {}
+    return MarcaSenal.objects.select_related("productor").in_bulk(pks)
+
+
+def _predefinidas_por_pk(pks):
+    from app_registros.models import ImagenMarcaPredefinida
+    from app_registros.predefinidas import activas_por_pk
+    if not pks:
+        return {}
+    # Las activas salen de la caché; solo las inactivas van a la BD.
+    activas = activas_por_pk()
+    encontradas = {pk: activas[pk] for pk in pks if pk in activas}
+    faltan = [pk for pk in pks if pk not in encontradas]
+    if faltan:
+        encontradas.update(ImagenMarcaPredefinida.objects.in_bulk(faltan))
+    return encontradas
+
+
+_ETAPAS_CASCADA = (
+    ("ahash", UMBRAL_AHASH),
+    ("dhash", UMBRAL_DHASH),
+    ("whash", UMBRAL_WHASH),
+    ("phash", HASH_THRESHOLD),
+)
+
+
+def _distancias(variante, guardadas, etapas=_ETAPAS_CASCADA):
+    """
+    Distancias de ``variante`` a las huellas ``guardadas`` en cada etapa
+    ``(tipo, umbral)`` y en el colorHash. Devuelve None si alguna pasa su
+    umbral; las etapas con umbral None no descartan.
+    """
+    distancias = {}
+    for tipo, umbral in etapas:
+        dist = _distancia_bits(variante.get(tipo), guardadas.get(tipo))
+        if umbral is not None and (dist is None or dist > umbral):
+            return None
+        distancias[tipo] = dist
+    distancias["colorhash"] = _distancia_bits(variante.get("colorhash"), guardadas.get("colorhash"))
+    return distancias
+
+
+def _puntaje(variante, distancias):
+    largos = {tipo: len(variante.get(tipo) or "") * 4 for tipo in distancias}
+    return puntaje_combinado(distancias, largos)
+
+
+def _cascada(modelo, variantes, excluir_id=None):
+    """
+    Motor en cascada: el índice de aHash junta los candidatos de todas las
+    variantes de la consulta y después se descartan por dHash, wHash y, al
+    final, pHash. Devuelve ``{pk: (puntaje, variante, distancia_phash)}``
+    con la variante que mejor coincide para cada imagen.
+    """
+    indice = obtener_indice(modelo, "ahash")
+    cercania = {}
+    for variante in variantes:
+        for pk, dist in indice.buscar(variante.get("ahash")):
+            if pk != excluir_id and dist < cercania.get(pk, dist + 1):
+                cercania[pk] = dist
+    if not cercania:
+        return {}
+
+    pks = sorted(cercania, key=cercania.get)[:MAX_CANDIDATOS_CASCADA]
+    encontrados = {}
+    for pk, image_hash, huellas in modelo.objects.filter(pk__in=pks).values_list(
+        "pk", "image_hash", "huellas"
+    ):
+        guardadas = dict(huellas or {}, phash=image_hash)
+        for variante in variantes:
+            distancias = _distancias(variante, guardadas)
+            if distancias is None:
+                continue
+            puntaje = _puntaje(variante, distancias)
+            if pk not in encontrados or puntaje < encontrados[pk][0]:
+                encontrados[pk] = (puntaje, variante.nombre, distancias["phash"])
+    return encontrados
+
+
+def _sumar_cascada(modelo, duplicados, variantes, excluir_id, por_pk, datos):
+    """
+    Agrega a los resultados del pHash los que encuentra la cascada (imágenes
+    rotadas o espejadas) y ordena todo por puntaje combinado. Los que solo
+    encontró el pHash se puntúan con todas sus huellas contra la original,
+    así los dos puntajes están en la misma escala.
+    """
+    cascada = _cascada(modelo, variantes, excluir_id)
+    vistos = {r["id"] for r in duplicados}
+    nuevos = [pk for pk in cascada if pk not in vistos]
+    objetos = por_pk(nuevos)
+    resultados = list(duplicados) + [
+        datos(objetos[pk], cascada[pk][2]) for pk in nuevos if pk in objetos
+    ]
+    solo_phash = [r["id"] for r in duplicados if r["id"] not in cascada]
+    guardadas = {}
+    if solo_phash:
+        guardadas = dict(modelo.objects.filter(pk__in=solo_phash).values_list("pk", "huellas"))
+    etapas = [(tipo, None) for tipo, _ in _ETAPAS_CASCADA if tipo != "phash"]
+    for r in resultados:
+        if r["id"] in cascada:
+            r["puntaje"], r["variante"], r["distancia"] = cascada[r["id"]]
+        else:
+            distancias = _distancias(variantes[0], guardadas.get(r["id"]) or {}, etapas)
+            distancias["phash"] = r["distancia"]
+            r["puntaje"] = _puntaje(variantes[0], distancias)
+            r["variante"] = VARIANTES[0][0]
+    resultados.sort(key=lambda x: x["puntaje"])
+    return resultados
+
+
+def buscar_duplicados_marca(hash_nuevo: str, excluir_id: int = None, huellas: list = None) -> list:
+    """
+    Busca en MarcaSenal imágenes visualmente similares. Con ``huellas``
+    (ver huellas_consulta) también encuentra versiones rotadas o espejadas.
+    """
+    from app_registros.models import MarcaSenal
+    if not hash_nuevo:
+        return []
+    if _motor_sql():
+        duplicados = [
+            _datos_marca(marca, marca.distancia_bd)
+            for marca in _marcas_similares_sql(hash_nuevo, excluir_id)
+        ]
+        duplicados.sort(key=lambda x: x["distancia"])
+    else:
+        candidatos = _candidatos(MarcaSenal, hash_nuevo, excluir_id)
+        duplicados = _armar_resultados(
+            hash_nuevo, candidatos, _marcas_por_pk(list(candidatos)), _datos_marca
+        )
+    if huellas:
+        duplicados = _sumar_cascada(
+            MarcaSenal, duplicados, huellas, excluir_id, _marcas_por_pk, _datos_marca,
+        )
     return duplicados
 
 
-def buscar_duplicados_predefinida(hash_nuevo: str, excluir_id: int = None) -> list:
+def buscar_duplicados_predefinida(hash_nuevo: str, excluir_id: int = None, huellas: list = None) -> list:
     """Busca en ImagenMarcaPredefinida imágenes visualmente similares."""
     from app_registros.models import ImagenMarcaPredefinida
     if not hash_nuevo:
         return []
-    qs = ImagenMarcaPredefinida.objects.exclude(image_hash__isnull=True).exclude(image_hash="")
-    if excluir_id:
-        qs = qs.exclude(pk=excluir_id)
-    duplicados = []
-    for img in qs:
-        if son_similares(hash_nuevo, img.image_hash):
-            duplicados.append({
-                "id": img.pk,
-                "nombre": img.nombre,
-                "tipo_marca": img.get_tipo_marca_display(),
-                "distancia": distancia(hash_nuevo, img.image_hash),
-            })
-    duplicados.sort(key=lambda x: x["distancia"])
+    candidatos = _candidatos(ImagenMarcaPredefinida, hash_nuevo, excluir_id)
+    duplicados = _armar_resultados(
+        hash_nuevo, candidatos, _predefinidas_por_pk(list(candidatos)), _datos_predefinida
+    )
+    if huellas:
+        duplicados = _sumar_cascada(
+            ImagenMarcaPredefinida, duplicados, huellas, excluir_id,
+            _predefinidas_por_pk, _datos_predefinida,
+        )
     return duplicados
 
 
-def buscar_en_todo(hash_nuevo: str, excluir_marca_id: int = None) -> dict:
-    """Busca duplicados en ambas tablas a la vez."""
+def contar_pendientes(excluir_marca_id: int = None) -> int:
+    """Imágenes guardadas cuyo hash todavía no se calculó (no entran en la búsqueda)."""
+    from app_registros.models import MarcaSenal, ImagenMarcaPredefinida
+    return (
+        MarcaSenal.objects.filter(hash_pendiente=True).exclude(pk=excluir_marca_id).count()
+        + ImagenMarcaPredefinida.objects.filter(hash_pendiente=True).count()
+    )
+
+
+def buscar_en_todo(hash_nuevo: str, excluir_marca_id: int = None, huellas: list = None) -> dict:
+    """
+    Busca duplicados en ambas tablas a la vez. Si se pasan las ``huellas``
+    de la consulta (huellas_consulta) se usa además el motor en cascada y
+    cada resultado trae ``puntaje`` y ``variante``.
+    """
     return {
-        "marcas": buscar_duplicados_marca(hash_nuevo, excluir_id=excluir_marca_id),
-        "predefinidas": buscar_duplicados_predefinida(hash_nuevo),
-    }
\ No newline at end of file
+        "marcas": buscar_duplicados_marca(hash_nuevo, excluir_id=excluir_marca_id, huellas=huellas),
+        "predefinidas": buscar_duplicados_predefinida(hash_nuevo, huellas=huellas),
+        "pendientes": contar_pendientes(excluir_marca_id),
+    }
+
+
+def buscar_en_todo_lote(hashes: list, excluir_marca_id: int = None, k: int = None) -> list:
+    """
+    Igual que buscar_en_todo pero para muchos hashes en una sola pasada.
+
+    Usa la búsqueda vectorizada del índice y trae de la BD todos los
+    candidatos de una vez. Devuelve un dict por hash, en el mismo orden,
+    con a lo sumo ``k`` resultados por tabla si se indica.
+    """
+    from app_registros.models import MarcaSenal, ImagenMarcaPredefinida
+    if not hashes:
+        return []
+    por_marca = obtener_indice(MarcaSenal).buscar_lote(hashes, umbral=HASH_THRESHOLD, k=k)
+    por_predefinida = obtener_indice(ImagenMarcaPredefinida).buscar_lote(
+        hashes, umbral=HASH_THRESHOLD, k=k
+    )
+
+    marcas = _marcas_por_pk({pk for fila in por_marca for pk, _ in fila if pk != excluir_marca_id})
+    predefinidas = _predefinidas_por_pk({pk for fila in por_predefinida for pk, _ in fila})
+
+    pendientes = contar_pendientes(excluir_marca_id)
+    resultados = []
+    for hash_nuevo, fila_marca, fila_predefinida in zip(hashes, por_marca, por_predefinida):
+        resultados.append({
+            "marcas": _armar_resultados(
+                hash_nuevo, [pk for pk, _ in fila_marca if pk != excluir_marca_id],
+                marcas, _datos_marca,
+            ),
+            "predefinidas": _armar_resultados(
+                hash_nuevo, [pk for pk, _ in fila_predefinida], predefinidas, _datos_predefinida,
+            ),
+            "pendientes": pendientes,
+        })
+    return resultados
+
+
+def hashear_lote(contenidos: list, hilos: int = None) -> list:
+    """
+    Calcula el pHash de varias imágenes (bytes) en paralelo. PIL libera el
+    GIL al decodificar, así que alcanza con hilos. Devuelve los hashes en el
+    mismo orden, None para las que no se pudieron leer.
+    """
+    if not contenidos:
+        return []
+    hilos = hilos or min(8, os.cpu_count() or 1, len(contenidos))
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return list(pool.map(calcular_hash_desde_bytes, contenidos))
+
+
+def verificar_lote(archivos: list, excluir_marca_id: int = None) -> list:
+    """
+    Verifica un lote de imágenes ``[(nombre, bytes), ...]`` de una vez:
+    las hashea en paralelo, las busca en el índice con buscar_en_todo_lote
+    y además las compara entre sí para detectar repetidas dentro del lote.
+
+    Devuelve un dict por archivo, en el mismo orden, con ``nombre``,
+    ``hash``, ``marcas``, ``predefinidas``, ``pendientes`` y ``en_lote``
+    (``[{"nombre", "distancia"}, ...]`` de las otras imágenes del lote
+    parecidas). Si la imagen no se pudo leer, ``hash`` es None y trae ``error``.
+    """
+    nombres = [nombre for nombre, _ in archivos]
+    hashes = hashear_lote([contenido for _, contenido in archivos])
+    validos = [i for i, h in enumerate(hashes) if h]
+    encontrados = dict(zip(
+        validos, buscar_en_todo_lote([hashes[i] for i in validos], excluir_marca_id)
+    ))
+
+    # Repetidas dentro del mismo lote: índice temporal con la posición como pk
+    propio = IndiceHamming()
+    propio.cargar((i, hashes[i]) for i in validos)
+    parecidas = dict(zip(validos, propio.buscar_lote([hashes[i] for i in validos])))
+
+    resultados = []
+    for i, (nombre, hash_nuevo) in enumerate(zip(nombres, hashes)):
+        if not hash_nuevo:
+            resultados.append({"nombre": nombre, "hash": None, "error": "No se pudo leer la imagen."})
+            continue
+        fila = {"nombre": nombre, "hash": hash_nuevo}
+        fila.update(encontrados[i])
+        fila["en_lote"] = [
+            {"nombre": nombres[j], "distancia": dist}
+            for j, dist in parecidas[i] if j != i
+        ]
+        resultados.append(fila)
+    return resultados
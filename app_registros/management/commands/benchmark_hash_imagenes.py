@@ -0,0 +1,75 @@
+import glob
+import io
+import os
+import time
+
+import imagehash
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from app_registros.image_similarity import HASH_SIZE, abrir_para_hash
+
+EXTENSIONES = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+
+class Command(BaseCommand):
+    help = 'Compara el tiempo y el hash de decodificar a tamaño completo contra la decodificación reducida.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('carpetas', nargs='*',
+                            help='Carpetas con imágenes (por defecto media/marcas y media/carnets).')
+        parser.add_argument('--lados', nargs='+', type=int, default=[128, 256, 512],
+                            help='Lados mínimos de decodificación a probar.')
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        carpetas = options['carpetas'] or [
+            os.path.join(settings.MEDIA_ROOT, 'marcas'),
+            os.path.join(settings.MEDIA_ROOT, 'carnets'),
+        ]
+        archivos = sorted(
+            ruta for carpeta in carpetas
+            for ruta in glob.glob(os.path.join(carpeta, '**', '*'), recursive=True)
+            if ruta.lower().endswith(EXTENSIONES)
+        )
+        if not archivos:
+            self.stdout.write(self.style.WARNING('No se encontraron imágenes.'))
+            return
+        datos = []
+        for ruta in archivos:
+            with open(ruta, 'rb') as f:
+                datos.append(f.read())
+        self.stdout.write(f'{len(datos)} imágenes')
+
+        # Primera llamada fuera de la medición (scipy se importa de forma perezosa).
+        self._hash(datos[0], 0)
+
+        # Referencia: decodificación completa en RGB, como se hacía antes.
+        repeticiones = options['repeticiones']
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            referencia = [
+                imagehash.phash(Image.open(io.BytesIO(contenido)).convert('RGB'), hash_size=HASH_SIZE)
+                for contenido in datos
+            ]
+        segundos = (time.perf_counter() - inicio) / (repeticiones * len(datos))
+        self._linea('RGB completo', segundos, 'referencia')
+
+        for lado in [0] + options['lados']:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                hashes = [self._hash(contenido, lado) for contenido in datos]
+            segundos = (time.perf_counter() - inicio) / (repeticiones * len(datos))
+            distancias = [h - r for h, r in zip(hashes, referencia)]
+            iguales = sum(d == 0 for d in distancias)
+            self._linea(
+                f'lado {lado}' if lado else 'grises completo', segundos,
+                f'{iguales}/{len(datos)} iguales, distancia máx. {max(distancias)}',
+            )
+
+    def _hash(self, contenido, lado):
+        return imagehash.phash(abrir_para_hash(io.BytesIO(contenido), lado), hash_size=HASH_SIZE)
+
+    def _linea(self, nombre, segundos, detalle):
+        self.stdout.write(f'  {nombre:<24} {segundos * 1000:>9.2f} ms por imagen  {detalle}')
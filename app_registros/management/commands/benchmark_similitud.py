@@ -0,0 +1,75 @@
+import random
+import time
+
+import imagehash
+from django.core.management.base import BaseCommand
+
+from app_registros.image_similarity import HASH_BITS, HASH_THRESHOLD, IndiceHamming
+
+
+class Command(BaseCommand):
+    help = 'Compara la búsqueda de hashes por bucle contra el índice en memoria (sin tocar la BD).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+                            help='Cantidad de hashes registrados a simular.')
+        parser.add_argument('--consultas', type=int, default=20,
+                            help='Cantidad de hashes a buscar en cada tamaño.')
+        parser.add_argument('--k', type=int, default=10, help='Top-k para la búsqueda por lote.')
+        parser.add_argument('--max-bucle', type=int, default=100_000,
+                            help='A partir de este tamaño el bucle se mide con una sola consulta.')
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        for tamano in options['tamanos']:
+            self._medir(rnd, tamano, options)
+
+    def _medir(self, rnd, tamano, options):
+        ancho = HASH_BITS // 4
+        hashes = [format(rnd.getrandbits(HASH_BITS), f'0{ancho}x') for _ in range(tamano)]
+
+        # Consultas: la mitad son variaciones cercanas de hashes registrados.
+        consultas = []
+        for i in range(options['consultas']):
+            if i % 2:
+                consultas.append(format(rnd.getrandbits(HASH_BITS), f'0{ancho}x'))
+                continue
+            valor = int(rnd.choice(hashes), 16)
+            for bit in rnd.sample(range(HASH_BITS), rnd.randint(0, HASH_THRESHOLD)):
+                valor ^= 1 << bit
+            consultas.append(format(valor, f'0{ancho}x'))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{tamano:,} hashes'))
+
+        inicio = time.perf_counter()
+        indice = IndiceHamming()
+        indice.cargar(enumerate(hashes))
+        self._linea('armado del índice', time.perf_counter() - inicio)
+
+        # Primera llamada fuera de la medición (imports perezosos de NumPy).
+        indice.buscar(consultas[0])
+        indice.buscar_lote(consultas[:1])
+
+        # Bucle anterior: hex_to_hash + resta por cada fila registrada.
+        bucle = consultas if tamano < options['max_bucle'] else consultas[:1]
+        inicio = time.perf_counter()
+        for consulta in bucle:
+            objetivo = imagehash.hex_to_hash(consulta)
+            [h for h in hashes if objetivo - imagehash.hex_to_hash(h) <= HASH_THRESHOLD]
+        self._linea('bucle hex_to_hash', (time.perf_counter() - inicio) / len(bucle), por_consulta=True)
+
+        inicio = time.perf_counter()
+        for consulta in consultas:
+            indice.buscar(consulta)
+        self._linea('índice por segmentos', (time.perf_counter() - inicio) / len(consultas),
+                    por_consulta=True)
+
+        inicio = time.perf_counter()
+        indice.buscar_lote(consultas, k=options['k'])
+        self._linea(f'matriz top-{options["k"]} (lote)', (time.perf_counter() - inicio) / len(consultas),
+                    por_consulta=True)
+
+    def _linea(self, nombre, segundos, por_consulta=False):
+        sufijo = ' por consulta' if por_consulta else ''
+        self.stdout.write(f'  {nombre:<28} {segundos * 1000:>12.3f} ms{sufijo}')
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from app_registros.cola_hashes import encolar_faltantes, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Calcula los hashes perceptuales encolados (SIMILITUD_HASH_ASINCRONO).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50,
+                            help='Trabajos que toma cada vuelta.')
+        parser.add_argument('--continuo', action='store_true',
+                            help='Queda esperando trabajos nuevos en lugar de terminar.')
+        parser.add_argument('--espera', type=float, default=2.0,
+                            help='Segundos entre consultas cuando la cola está vacía.')
+
+    def handle(self, *args, **options):
+        encolados = encolar_faltantes()
+        if encolados:
+            self.stdout.write(f'Se encolaron {encolados} imágenes pendientes sin trabajo.')
+
+        total = total_errores = 0
+        while True:
+            procesados, errores = procesar_pendientes(options['lote'])
+            total += procesados
+            total_errores += errores
+            if procesados or errores:
+                self.stdout.write(f'  {procesados} hashes calculados, {errores} con error')
+            elif not options['continuo']:
+                break
+            else:
+                time.sleep(options['espera'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} hashes calculados, {total_errores} con error'
+        ))
@@ -1,42 +1,159 @@
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from app_registros.image_similarity import calcular_hash_desde_path
+from app_registros import predefinidas
+from app_registros.image_similarity import (
+    columnas_hash, digest_contenido, hash_y_huellas, invalidar_indice,
+)
+
+
+def _hashear_archivo(tarea):
+    """
+    Corre en los procesos del pool. Recibe ``(ruta, digest_guardado)`` y
+    devuelve ``(digest, hash, huellas)``; si el contenido es el mismo que
+    ya está en la BD no se decodifica y hash/huellas vuelven como None.
+    """
+    ruta, digest_guardado = tarea
+    try:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+    except OSError:
+        return None, None, None
+    digest = digest_contenido(contenido)
+    if digest == digest_guardado:
+        return digest, None, None
+    return (digest, *hash_y_huellas(contenido))
 
 
 class Command(BaseCommand):
     help = 'Recalcula los hashes perceptuales de las imágenes ya cargadas.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Procesos para calcular los hashes (por defecto, todos los núcleos).')
+        parser.add_argument('--lote', type=int, default=500,
+                            help='Filas por cada bulk_update.')
+        parser.add_argument('--estado', default=os.path.join(settings.MEDIA_ROOT, '.recalcular_hashes.json'),
+                            help='Archivo donde se guarda tamaño/mtime/digest de la última corrida.')
+        parser.add_argument('--forzar', action='store_true',
+                            help='Recalcula todo aunque los archivos no hayan cambiado.')
+
     def handle(self, *args, **options):
-        self._procesar_marcas()
-        self._procesar_predefinidas()
-
-    def _procesar_marcas(self):
-        from app_registros.models import MarcaSenal
-        marcas = MarcaSenal.objects.exclude(imagen_marca='').exclude(imagen_marca__isnull=True)
-        self.stdout.write(f'Procesando {marcas.count()} marcas...')
-        ok = 0
-        for marca in marcas:
-            path = os.path.join(settings.MEDIA_ROOT, marca.imagen_marca.name)
-            if os.path.exists(path):
-                hash_val = calcular_hash_desde_path(path)
-                if hash_val:
-                    marca.image_hash = hash_val
-                    marca.save(update_fields=['image_hash'])
-                    ok += 1
-        self.stdout.write(self.style.SUCCESS(f'MarcaSenal: {ok} procesadas'))
-
-    def _procesar_predefinidas(self):
-        from app_registros.models import ImagenMarcaPredefinida
-        imgs = ImagenMarcaPredefinida.objects.exclude(imagen='').exclude(imagen__isnull=True)
-        self.stdout.write(f'Procesando {imgs.count()} imágenes predefinidas...')
-        ok = 0
-        for img in imgs:
-            path = os.path.join(settings.MEDIA_ROOT, img.imagen.name)
-            if os.path.exists(path):
-                hash_val = calcular_hash_desde_path(path)
-                if hash_val:
-                    img.image_hash = hash_val
-                    img.save(update_fields=['image_hash'])
-                    ok += 1
-        self.stdout.write(self.style.SUCCESS(f'ImagenMarcaPredefinida: {ok} procesadas'))
\ No newline at end of file
+        from app_registros.models import MarcaSenal, ImagenMarcaPredefinida
+
+        self.options = options
+        self.estado = {} if options['forzar'] else self._leer_estado(options['estado'])
+
+        with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            campos = ['image_hash', 'imagen_digest', 'huellas', 'hash_pendiente']
+            self._procesar(pool, MarcaSenal, 'imagen_marca', campos + list(columnas_hash(None)))
+            self._procesar(pool, ImagenMarcaPredefinida, 'imagen', campos)
+
+        self._guardar_estado(options['estado'])
+
+    def _procesar(self, pool, modelo, campo_imagen, campos):
+        nombre = modelo.__name__
+        filas = (
+            modelo.objects.exclude(**{campo_imagen: ''}).exclude(**{f'{campo_imagen}__isnull': True})
+            .values_list('pk', campo_imagen, 'image_hash', 'imagen_digest', 'huellas__ahash')
+        )
+        total = filas.count()
+        self.stdout.write(f'Procesando {total} {nombre}...')
+
+        inicio = time.perf_counter()
+        pendientes = []
+        tareas = []
+        sin_cambios = faltantes = 0
+        for pk, nombre_archivo, hash_actual, digest_actual, ahash_actual in filas.iterator(chunk_size=2000):
+            ruta = os.path.join(settings.MEDIA_ROOT, nombre_archivo)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                faltantes += 1
+                continue
+            previo = self.estado.get(nombre_archivo, {})
+            completo = bool(hash_actual and ahash_actual) and not self.options['forzar']
+            if (
+                completo
+                and previo.get('hash') == hash_actual
+                and previo.get('digest') == digest_actual
+                and previo.get('tamano') == info.st_size
+                and previo.get('mtime') == info.st_mtime_ns
+            ):
+                sin_cambios += 1
+                continue
+            pendientes.append((pk, nombre_archivo, info, hash_actual, digest_actual))
+            tareas.append((ruta, digest_actual if completo else None))
+
+        chunksize = max(1, len(tareas) // (self.options['workers'] * 4))
+
+        lote = []
+        ok = reutilizados = errores = 0
+        resultados = pool.map(_hashear_archivo, tareas, chunksize=chunksize)
+        for i, ((pk, nombre_archivo, info, hash_actual, digest_actual), (digest, hash_val, huellas)) in enumerate(
+            zip(pendientes, resultados), start=1
+        ):
+            if digest is None:
+                errores += 1
+                continue
+            if hash_val is None and digest == digest_actual:
+                # Mismo contenido que en la BD: solo se actualiza el estado.
+                hash_val = hash_actual
+                reutilizados += 1
+            elif hash_val is None:
+                errores += 1
+                continue
+            else:
+                ok += 1
+                obj = modelo(
+                    pk=pk, image_hash=hash_val, imagen_digest=digest, huellas=huellas,
+                    hash_pendiente=False,
+                )
+                for campo, valor in columnas_hash(hash_val).items():
+                    if campo in campos:
+                        setattr(obj, campo, valor)
+                lote.append(obj)
+                if len(lote) >= self.options['lote']:
+                    modelo.objects.bulk_update(lote, campos)
+                    lote = []
+
+            self.estado[nombre_archivo] = {
+                'tamano': info.st_size, 'mtime': info.st_mtime_ns, 'digest': digest, 'hash': hash_val,
+            }
+            if i % 500 == 0:
+                self._progreso(nombre, i, len(pendientes), inicio)
+
+        if lote:
+            modelo.objects.bulk_update(lote, campos)
+        # bulk_update no dispara señales: los índices en memoria se rearman.
+        invalidar_indice(modelo)
+        if modelo._meta.label_lower == 'app_registros.imagenmarcapredefinida':
+            predefinidas.invalidar()
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{nombre}: {ok} procesadas, {reutilizados + sin_cambios} sin cambios, '
+            f'{faltantes} sin archivo, {errores} con error '
+            f'({segundos:.1f} s, {len(pendientes) / segundos if segundos else 0:.1f} archivos/s)'
+        ))
+
+    def _progreso(self, nombre, hechos, total, inicio):
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(f'  {nombre}: {hechos}/{total} ({hechos / segundos:.1f} archivos/s)')
+
+    def _leer_estado(self, ruta):
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_estado(self, ruta):
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.estado, f)
+        os.replace(temporal, ruta)
@@ -0,0 +1,64 @@
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def completar_hash_enteros(apps, schema_editor):
+    from app_registros.image_similarity import columnas_hash
+    MarcaSenal = apps.get_model('app_registros', 'MarcaSenal')
+    marcas = MarcaSenal.objects.exclude(image_hash__isnull=True).exclude(image_hash='')
+    lote = []
+    campos = list(columnas_hash(None))
+    for marca in marcas.only('pk', 'image_hash').iterator(chunk_size=2000):
+        for campo, valor in columnas_hash(marca.image_hash).items():
+            setattr(marca, campo, valor)
+        lote.append(marca)
+        if len(lote) >= 2000:
+            MarcaSenal.objects.bulk_update(lote, campos)
+            lote = []
+    if lote:
+        MarcaSenal.objects.bulk_update(lote, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0011_add_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcasenal',
+            name='image_hash_0',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='image_hash_1',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='image_hash_2',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='image_hash_3',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='image_hash_segmentos',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), blank=True, editable=False, null=True, size=None,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='marcasenal',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['image_hash_segmentos'], name='marca_hash_segmentos_gin',
+            ),
+        ),
+        migrations.RunPython(completar_hash_enteros, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0012_marcasenal_hash_enteros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenmarcapredefinida',
+            name='imagen_digest',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='imagen_digest',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AlterField(
+            model_name='imagenmarcapredefinida',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=128, null=True, verbose_name='Hash perceptual'),
+        ),
+        migrations.AlterField(
+            model_name='marcasenal',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=128, null=True, verbose_name='Hash perceptual de imagen_marca'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0013_imagen_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenmarcapredefinida',
+            name='hash_pendiente',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='hash_pendiente',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='TrabajoHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=120)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['fecha_creacion'],
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'objeto_id'), name='trabajo_hash_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0014_cola_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenmarcapredefinida',
+            name='huellas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='marcasenal',
+            name='huellas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:43
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def iniciar_numero_orden(apps, schema_editor):
+    MarcaSenal = apps.get_model('app_registros', 'MarcaSenal')
+    Contador = apps.get_model('app_registros', 'Contador')
+    ultimo = MarcaSenal.objects.aggregate(ultimo=Max('numero_orden'))['ultimo'] or 0
+    Contador.objects.update_or_create(nombre='numero_orden', defaults={'valor': ultimo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0015_huellas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contador',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(iniciar_numero_orden, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0016_contadores'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marcasenal',
+            index=models.Index(fields=['-fecha_inscripcion', '-id'], name='marca_inscripcion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productor',
+            index=models.Index(fields=['apellido', 'nombre', 'id'], name='productor_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitud',
+            index=models.Index(fields=['-fecha_solicitud', '-id'], name='solicitud_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:53
+
+import unicodedata
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# Copias fijas de app_registros.busqueda: la migración no debe cambiar si
+# ese módulo cambia después.
+CONFIG = 'spanish'
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def llenar_texto_busqueda(apps, schema_editor):
+    Productor = apps.get_model('app_registros', 'Productor')
+    lote = []
+    for productor in Productor.objects.only('apellido', 'nombre', 'campo').iterator(chunk_size=2000):
+        productor.texto_busqueda = normalizar(' '.join(
+            v or '' for v in (productor.apellido, productor.nombre, productor.campo)
+        ))
+        lote.append(productor)
+        if len(lote) >= 2000:
+            Productor.objects.bulk_update(lote, ['texto_busqueda'])
+            lote = []
+    Productor.objects.bulk_update(lote, ['texto_busqueda'])
+    if schema_editor.connection.vendor == 'postgresql':
+        Productor.objects.update(vector_busqueda=django.contrib.postgres.search.SearchVector(
+            'texto_busqueda', config=CONFIG,
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0017_indices_paginacion'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='productor',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='productor',
+            name='vector_busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_texto_busqueda, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['vector_busqueda'], name='productor_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='productor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['texto_busqueda'], name='productor_texto_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='productor',
+            index=models.Index(fields=['dni'], name='productor_dni_prefijo', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
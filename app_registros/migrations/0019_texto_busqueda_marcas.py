@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:54
+
+import unicodedata
+from collections import defaultdict
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# Copias fijas de app_registros.busqueda: la migración no debe cambiar si
+# ese módulo cambia después.
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def texto_marca(descripcion, nombres_componentes):
+    """Texto de búsqueda de una marca: descripción, salto de línea y nombres de componentes."""
+    return normalizar(descripcion) + '\n' + normalizar(' '.join(sorted(nombres_componentes)))
+
+
+def llenar_texto_busqueda(apps, schema_editor):
+    MarcaSenal = apps.get_model('app_registros', 'MarcaSenal')
+    nombres = defaultdict(list)
+    for marca_id, nombre in MarcaSenal.imagenes_predefinidas.through.objects.values_list(
+        'marcasenal_id', 'imagenmarcapredefinida__nombre',
+    ):
+        nombres[marca_id].append(nombre)
+    lote = []
+    for marca in MarcaSenal.objects.only('descripcion_marca').iterator(chunk_size=2000):
+        marca.texto_busqueda = texto_marca(marca.descripcion_marca, nombres[marca.pk])
+        lote.append(marca)
+        if len(lote) >= 2000:
+            MarcaSenal.objects.bulk_update(lote, ['texto_busqueda'])
+            lote = []
+    MarcaSenal.objects.bulk_update(lote, ['texto_busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0018_busqueda_productores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcasenal',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(llenar_texto_busqueda, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='marcasenal',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['texto_busqueda'], name='marca_texto_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
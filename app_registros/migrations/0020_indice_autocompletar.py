@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:56
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_registros', '0019_texto_busqueda_marcas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productor',
+            index=django.contrib.postgres.indexes.BTreeIndex(django.db.models.functions.comparison.Collate('texto_busqueda', 'C'), name='productor_texto_prefijo'),
+        ),
+    ]
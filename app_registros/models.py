@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, FileExtensionValidator
+from django.contrib.postgres.indexes import BTreeIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Collate
 
 # ----------------------------------------
 # PRODUCTOR GANADERO (Modelo principal)
@@ -38,11 +41,38 @@ class Productor(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
     fecha_registro = models.DateTimeField(auto_now_add=True)
     observaciones = models.TextField(blank=True)
+
+    # Búsqueda por texto (ver app_registros/busqueda.py); se mantienen en save()
+    texto_busqueda = models.TextField(blank=True, default='', editable=False)
+    vector_busqueda = SearchVectorField(null=True, editable=False)
     
     class Meta:
         verbose_name = "Productor"
         verbose_name_plural = "Productores"
         ordering = ['apellido', 'nombre']
+        indexes = [
+            # Orden de la paginación por clave del listado
+            models.Index(fields=['apellido', 'nombre', 'id'], name='productor_orden_idx'),
+            GinIndex(fields=['vector_busqueda'], name='productor_vector_gin'),
+            GinIndex(fields=['texto_busqueda'], opclasses=['gin_trgm_ops'], name='productor_texto_trgm'),
+            # Prefijo de DNI (LIKE 'xxx%') sin depender de la collation
+            models.Index(fields=['dni'], opclasses=['varchar_pattern_ops'], name='productor_dni_prefijo'),
+            # Autocompletado por prefijo, ya ordenado (ver sugerencias.py)
+            BTreeIndex(Collate('texto_busqueda', 'C'), name='productor_texto_prefijo'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        from app_registros.busqueda import CAMPOS_PRODUCTOR, actualizar_vectores, texto_productor
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields) & set(CAMPOS_PRODUCTOR):
+            super().save(*args, **kwargs)
+            return
+        self.texto_busqueda = texto_productor(self)
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'texto_busqueda'}
+        super().save(*args, **kwargs)
+        actualizar_vectores(Productor.objects.filter(pk=self.pk))
+
     
     def __str__(self):
         return f"{self.apellido}, {self.nombre} ({self.dni})"
@@ -123,19 +153,31 @@ class ImagenMarcaPredefinida(models.Model):
     activa = models.BooleanField(default=True)
     image_hash = models.CharField(
         max_length=128, blank=True, null=True,
-        verbose_name='Hash perceptual', db_index=True,
+        verbose_name='Hash perceptual', db_index=True, editable=False,
     )
+    imagen_digest = models.CharField(max_length=32, blank=True, null=True, editable=False)
+    huellas = models.JSONField(default=dict, blank=True, editable=False)
+    hash_pendiente = models.BooleanField(default=False, editable=False, db_index=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Nombre del archivo tal como está en la BD, para detectar cambios
+        instancia._imagen_original = instancia.__dict__.get('imagen')
+        return instancia
 
     def save(self, *args, **kwargs):
-        if self.imagen:
-            try:
-                from app_registros.image_similarity import calcular_hash
-                nuevo_hash = calcular_hash(self.imagen)
-                if nuevo_hash:
-                    self.image_hash = nuevo_hash
-            except Exception:
-                pass
+        # Solo se recalcula el hash si el archivo de la imagen cambió
+        from app_registros.image_similarity import actualizar_hash_imagen
+        update_fields = kwargs.get('update_fields')
+        cambios = actualizar_hash_imagen(self, 'imagen', update_fields)
+        if update_fields is not None and cambios:
+            kwargs['update_fields'] = set(update_fields) | set(cambios)
         super().save(*args, **kwargs)
+        self._imagen_original = self.imagen.name
+        if 'hash_pendiente' in cambios and self.hash_pendiente:
+            from app_registros.cola_hashes import encolar
+            encolar(self)
 
 
     class Meta:
@@ -151,6 +193,8 @@ from django.db import models
 from django.db.models import Max
 from django.utils import timezone
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
 
 class MarcaSenal(models.Model):
@@ -226,6 +270,10 @@ class MarcaSenal(models.Model):
         help_text="Seleccione una o más imágenes que componen la marca"
     )
 
+    # Descripción + nombres de componentes normalizados (ver busqueda.py);
+    # lo mantienen save() y la señal m2m_changed de imagenes_predefinidas
+    texto_busqueda = models.TextField(blank=True, default='', editable=False)
+
     # ============================
     # GANADO
     # ============================
@@ -255,9 +303,25 @@ class MarcaSenal(models.Model):
     observaciones = models.TextField(blank=True)
     image_hash = models.CharField(
         max_length=128, blank=True, null=True,
-        verbose_name='Hash perceptual de imagen_marca', db_index=True,
+        verbose_name='Hash perceptual de imagen_marca', db_index=True, editable=False,
     )
 
+    # El mismo hash en enteros, para buscar por distancia de Hamming en SQL
+    # (ver image_similarity.columnas_hash). Se derivan de image_hash al guardar.
+    image_hash_0 = models.BigIntegerField(blank=True, null=True, editable=False)
+    image_hash_1 = models.BigIntegerField(blank=True, null=True, editable=False)
+    image_hash_2 = models.BigIntegerField(blank=True, null=True, editable=False)
+    image_hash_3 = models.BigIntegerField(blank=True, null=True, editable=False)
+    image_hash_segmentos = ArrayField(
+        models.BigIntegerField(), blank=True, null=True, editable=False,
+    )
+    # Digest del archivo con el que se calculó image_hash
+    imagen_digest = models.CharField(max_length=32, blank=True, null=True, editable=False)
+    # aHash/dHash/wHash/colorHash para el motor en cascada (image_similarity)
+    huellas = models.JSONField(default=dict, blank=True, editable=False)
+    # El hash se está calculando en segundo plano (todavía no está en el índice)
+    hash_pendiente = models.BooleanField(default=False, editable=False, db_index=True)
+
 
 
     # ============================
@@ -279,6 +343,11 @@ class MarcaSenal(models.Model):
         verbose_name = "Marca y Señal"
         verbose_name_plural = "Marcas y Señales"
         ordering = ['-fecha_inscripcion']
+        indexes = [
+            GinIndex(fields=['image_hash_segmentos'], name='marca_hash_segmentos_gin'),
+            models.Index(fields=['-fecha_inscripcion', '-id'], name='marca_inscripcion_idx'),
+            GinIndex(fields=['texto_busqueda'], opclasses=['gin_trgm_ops'], name='marca_texto_trgm'),
+        ]
 
     # ============================
     # MÉTODOS
@@ -286,6 +355,13 @@ class MarcaSenal(models.Model):
     def __str__(self):
         return f"Marca #{self.numero_orden} - {self.productor}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Nombre del archivo tal como está en la BD, para detectar cambios
+        instancia._imagen_original = instancia.__dict__.get('imagen_marca')
+        return instancia
+
     @property
     def total_ganado(self):
         return sum([
@@ -300,23 +376,36 @@ class MarcaSenal(models.Model):
     def save(self, *args, **kwargs):
         # Generar número de orden automático
         if not self.numero_orden:
-            from django.db.models import Max
-            ultimo = MarcaSenal.objects.aggregate(
-                Max('numero_orden')
-            )['numero_orden__max']
-            self.numero_orden = (ultimo or 0) + 1
+            from app_registros.contadores import siguiente_numero_orden
+            self.numero_orden = siguiente_numero_orden()
+
+        # Calcular hash perceptual solo si cambió la imagen de marca
+        from app_registros.image_similarity import actualizar_hash_imagen, columnas_hash
+        update_fields = kwargs.get('update_fields')
+        cambios = actualizar_hash_imagen(self, 'imagen_marca', update_fields)
+        if update_fields is not None and cambios:
+            update_fields = kwargs['update_fields'] = set(update_fields) | set(cambios)
+
+        # Columnas enteras derivadas del hash
+        for campo, valor in columnas_hash(self.image_hash).items():
+            setattr(self, campo, valor)
+        if update_fields is not None and 'image_hash' in update_fields:
+            kwargs['update_fields'] = update_fields = set(update_fields) | set(columnas_hash(None))
+
+        # Los componentes se conservan: los actualiza la señal del M2M
+        if update_fields is None or 'descripcion_marca' in update_fields:
+            from app_registros.busqueda import componentes_de_texto, normalizar
+            self.texto_busqueda = (
+                normalizar(self.descripcion_marca) + '\n' + componentes_de_texto(self.texto_busqueda)
+            )
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'texto_busqueda'}
 
-        # Calcular hash perceptual si hay imagen de marca
-        if self.imagen_marca:
-            try:
-                from app_registros.image_similarity import calcular_hash
-                nuevo_hash = calcular_hash(self.imagen_marca)
-                if nuevo_hash:
-                    self.image_hash = nuevo_hash
-            except Exception:
-                pass
-
-        super().save(*args, **kwargs)    
+        super().save(*args, **kwargs)
+        self._imagen_original = self.imagen_marca.name
+        if 'hash_pendiente' in cambios and self.hash_pendiente:
+            from app_registros.cola_hashes import encolar
+            encolar(self)
 
 
 # ----------------------------------------
@@ -541,6 +630,9 @@ class Solicitud(models.Model):
     # ----------------------------------------
     class Meta:
         ordering = ['-fecha_solicitud']
+        indexes = [
+            models.Index(fields=['-fecha_solicitud', '-id'], name='solicitud_fecha_idx'),
+        ]
         permissions = [
             ('can_review_solicitud', 'Puede revisar solicitudes'),
             ('can_approve_solicitud', 'Puede aprobar solicitudes'),
@@ -555,11 +647,8 @@ class Solicitud(models.Model):
 
     def generar_numero_expediente(self):
         if not self.numero_expediente:
-            año = timezone.now().year
-            consecutivo = Solicitud.objects.filter(
-                fecha_solicitud__year=año
-            ).count() + 1
-            self.numero_expediente = f"EX-{año}-{consecutivo:05d}"
+            from app_registros.contadores import siguiente_numero_expediente
+            self.numero_expediente = siguiente_numero_expediente()
 
     def save(self, *args, **kwargs):
         if not self.numero_expediente:
@@ -637,6 +726,39 @@ class ChangeLog(models.Model):
         return f"{self.modelo}:{self.objeto_id} {self.accion} @ {self.timestamp}"
     
 
+# ----------------------------------------
+# COLA DE HASHES PERCEPTUALES
+# ----------------------------------------
+class TrabajoHash(models.Model):
+    """Imagen cuyo hash perceptual falta calcular (ver app_registros.cola_hashes)."""
+    modelo = models.CharField(max_length=120)
+    objeto_id = models.PositiveBigIntegerField()
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['fecha_creacion']
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'objeto_id'], name='trabajo_hash_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo}:{self.objeto_id} ({self.intentos} intentos)"
+
+
+# ----------------------------------------
+# CONTADORES (NUMERACIÓN)
+# ----------------------------------------
+class Contador(models.Model):
+    """Último número entregado de cada numeración (ver app_registros.contadores)."""
+    nombre = models.CharField(max_length=50, primary_key=True)
+    valor = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
 
 # app_registros/models.py - AÑADIR ESTO:
 
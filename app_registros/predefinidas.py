@@ -0,0 +1,77 @@
+"""
+predefinidas.py
+---------------
+Caché en memoria (por proceso) de las imágenes de marcas predefinidas activas.
+
+Casi nunca cambian y se leen en cada formulario de marca, en el AJAX de la
+galería y en cada búsqueda por imagen. La versión compartida (ver
+app_registros.versiones) avisa a los demás procesos que tienen que volver a
+leerlas; las señales de ImagenMarcaPredefinida la incrementan al guardar o
+borrar.
+"""
+
+import threading
+
+from app_registros import versiones
+
+CLAVE_VERSION = "predefinidas"
+
+_cache = None
+_lock = threading.Lock()
+
+
+class _Predefinidas:
+    def __init__(self, version, imagenes):
+        self.version = version
+        self.imagenes = tuple(imagenes)
+        self.por_pk = {img.pk: img for img in self.imagenes}
+        self.datos = tuple(
+            {
+                "id": img.pk,
+                "nombre": img.nombre,
+                "tipo_marca": img.get_tipo_marca_display(),
+                "imagen": img.imagen.url if img.imagen else "",
+                "image_hash": img.image_hash,
+            }
+            for img in self.imagenes
+        )
+
+
+def _version():
+    return versiones.actual(CLAVE_VERSION)
+
+
+def _actual():
+    global _cache
+    version = _version()
+    with _lock:
+        if _cache is not None and _cache.version == version:
+            return _cache
+    from app_registros.models import ImagenMarcaPredefinida
+    nuevas = _Predefinidas(version, ImagenMarcaPredefinida.objects.filter(activa=True).order_by("pk"))
+    with _lock:
+        _cache = nuevas
+    return nuevas
+
+
+def imagenes_activas():
+    """Tupla de ImagenMarcaPredefinida activas. Son compartidas: no modificarlas."""
+    return _actual().imagenes
+
+
+def activas_por_pk():
+    """``{pk: ImagenMarcaPredefinida}`` de las activas."""
+    return _actual().por_pk
+
+
+def datos_activas():
+    """Datos ya armados de cada imagen activa (id, nombre, tipo_marca, imagen, image_hash)."""
+    return _actual().datos
+
+
+def invalidar():
+    """Descarta la caché en todos los procesos."""
+    global _cache
+    versiones.incrementar_al_confirmar(CLAVE_VERSION)
+    with _lock:
+        _cache = None
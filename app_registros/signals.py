@@ -0,0 +1,69 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from app_registros.models import MarcaSenal, ImagenMarcaPredefinida, Productor
+from app_registros import busqueda, image_similarity, predefinidas, sugerencias
+
+
+@receiver(post_save, sender=MarcaSenal)
+@receiver(post_save, sender=ImagenMarcaPredefinida)
+def sincronizar_indice_imagen(sender, instance, **kwargs):
+    """Mantiene al día el índice de hashes perceptuales al guardar."""
+    image_similarity.actualizar_en_indice(instance)
+
+
+@receiver(post_delete, sender=MarcaSenal)
+@receiver(post_delete, sender=ImagenMarcaPredefinida)
+def quitar_imagen_del_indice(sender, instance, **kwargs):
+    """Quita del índice las imágenes eliminadas."""
+    image_similarity.quitar_de_indice(instance)
+
+
+@receiver(post_save, sender=ImagenMarcaPredefinida)
+@receiver(post_delete, sender=ImagenMarcaPredefinida)
+def invalidar_cache_predefinidas(sender, instance, **kwargs):
+    """Las imágenes predefinidas activas se cachean en memoria (ver predefinidas.py)."""
+    predefinidas.invalidar()
+
+
+@receiver(m2m_changed, sender=MarcaSenal.imagenes_predefinidas.through)
+def actualizar_texto_componentes(sender, instance, action, reverse, pk_set, **kwargs):
+    """El texto de búsqueda de la marca incluye los nombres de sus componentes."""
+    if action == 'pre_clear' and reverse:
+        # Después del clear ya no se sabe qué marcas tenían esta imagen
+        instance._marcas_a_actualizar = list(instance.marcasenal_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            pks = [instance.pk]
+        elif action == 'post_clear':
+            pks = getattr(instance, '_marcas_a_actualizar', [])
+        else:
+            pks = pk_set or []
+        busqueda.actualizar_texto_marcas(pks)
+
+
+@receiver(post_save, sender=ImagenMarcaPredefinida)
+def actualizar_texto_marcas_con_imagen(sender, instance, created, **kwargs):
+    """Si cambia el nombre de una imagen, cambia el texto de las marcas que la usan."""
+    update_fields = kwargs.get('update_fields')
+    if created or (update_fields is not None and 'nombre' not in update_fields):
+        return
+    busqueda.actualizar_texto_marcas(instance.marcasenal_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=ImagenMarcaPredefinida)
+def recordar_marcas_con_imagen(sender, instance, **kwargs):
+    """Borrar la imagen quita sus filas del M2M sin enviar m2m_changed."""
+    instance._marcas_a_actualizar = list(instance.marcasenal_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=ImagenMarcaPredefinida)
+def actualizar_texto_marcas_sin_imagen(sender, instance, **kwargs):
+    """Las marcas que usaban la imagen borrada dejan de encontrarse por su nombre."""
+    busqueda.actualizar_texto_marcas(getattr(instance, '_marcas_a_actualizar', []))
+
+
+@receiver(post_save, sender=Productor)
+@receiver(post_delete, sender=Productor)
+def invalidar_sugerencias_productores(sender, instance, **kwargs):
+    """Las sugerencias del autocompletado se cachean en memoria (ver sugerencias.py)."""
+    sugerencias.invalidar()
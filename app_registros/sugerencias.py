@@ -0,0 +1,151 @@
+"""
+sugerencias.py
+--------------
+Autocompletado de productores por prefijo de apellido, nombre o DNI.
+
+Las consultas van por índices de prefijo: ``texto_busqueda`` (que empieza
+por el apellido) con collation "C", el de trigramas para el comienzo de
+cualquier otra palabra y ``varchar_pattern_ops`` para el DNI. Los
+resultados de los prefijos más pedidos quedan en memoria (por proceso); si
+la lista de un prefijo quedó incompleta (menos de LIMITE_MAX), los prefijos
+más largos se resuelven filtrándola sin ir a la BD. La versión compartida
+(ver app_registros.versiones), que las señales de Productor incrementan,
+descarta todo.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+
+from app_registros import versiones
+from app_registros.busqueda import normalizar
+
+CLAVE_VERSION = 'sugerencias:productores'
+LIMITE_MAX = 20
+MIN_CARACTERES = 2
+MAX_PREFIJOS = 1024
+
+_prefijos = OrderedDict()
+_version = None
+_lock = threading.Lock()
+
+
+def _version_actual():
+    return versiones.actual(CLAVE_VERSION)
+
+
+def invalidar():
+    """Descarta las sugerencias en memoria de todos los procesos."""
+    global _version
+    versiones.incrementar_al_confirmar(CLAVE_VERSION)
+    with _lock:
+        _prefijos.clear()
+        _version = None
+
+
+def _es_dni(consulta, texto):
+    return not re.search(r'[a-z]', texto) and bool(re.sub(r'\D', '', consulta))
+
+
+def _coincide(fila, texto, dni):
+    clave = fila[0]
+    if dni:
+        return fila[1]['dni'].startswith(texto)
+    return clave.startswith(texto) or f' {texto}' in clave
+
+
+def _orden(fila, texto, dni):
+    if dni:
+        return fila[1]['dni']
+    return (not fila[0].startswith(texto), fila[0])
+
+
+def _consultar(texto, dni):
+    """``[(clave, dato), ...]`` de hasta LIMITE_MAX productores, ya ordenados."""
+    from app_registros.models import Productor
+    columnas = ('texto_busqueda', 'pk', 'apellido', 'nombre', 'dni')
+    if dni:
+        filas = list(
+            Productor.objects.filter(dni__startswith=texto).order_by('dni')
+            .values_list(*columnas)[:LIMITE_MAX]
+        )
+    else:
+        # Con collation "C" el orden y el LIKE 'x%' coinciden con el índice
+        clave = Collate('texto_busqueda', 'C') if connection.vendor == 'postgresql' else F('texto_busqueda')
+        base = Productor.objects.alias(clave=clave)
+        filas = list(
+            base.filter(clave__startswith=texto).order_by('clave').values_list(*columnas)[:LIMITE_MAX]
+        )
+        if len(filas) < LIMITE_MAX:
+            # Comienzo de otra palabra (nombre o campo)
+            filas += list(
+                base.filter(texto_busqueda__contains=f' {texto}').exclude(clave__startswith=texto)
+                .order_by('clave').values_list(*columnas)[:LIMITE_MAX - len(filas)]
+            )
+    return [
+        (clave, {'id': pk, 'texto': f'{apellido}, {nombre}', 'dni': dni_productor})
+        for clave, pk, apellido, nombre, dni_productor in filas
+    ]
+
+
+def _desde_memoria(texto, dni):
+    """Filas de ``texto`` a partir de lo guardado en memoria, o None. Requiere ``_lock``."""
+    for largo in range(len(texto), MIN_CARACTERES - 1, -1):
+        prefijo = (dni, texto[:largo])
+        filas = _prefijos.get(prefijo)
+        if filas is None:
+            continue
+        _prefijos.move_to_end(prefijo)
+        if largo == len(texto):
+            return filas
+        if len(filas) < LIMITE_MAX:
+            # La lista del prefijo más corto está completa: alcanza con filtrarla
+            return sorted(
+                (f for f in filas if _coincide(f, texto, dni)), key=lambda f: _orden(f, texto, dni),
+            )
+        return None
+    return None
+
+
+def _guardar(clave, filas):
+    _prefijos[clave] = filas
+    _prefijos.move_to_end(clave)
+    while len(_prefijos) > MAX_PREFIJOS:
+        _prefijos.popitem(last=False)
+
+
+def sugerir_productores(consulta, limite=10):
+    """
+    ``[{'id', 'texto', 'dni'}, ...]`` de hasta ``limite`` (máximo LIMITE_MAX)
+    productores cuyo apellido, otra palabra del nombre o DNI empiezan con
+    ``consulta``. Con menos de MIN_CARACTERES devuelve una lista vacía.
+    """
+    global _version
+    texto = normalizar(consulta)
+    if len(texto) < MIN_CARACTERES:
+        return []
+    dni = _es_dni(consulta, texto)
+    if dni:
+        texto = re.sub(r'\D', '', consulta)
+        if len(texto) < MIN_CARACTERES:
+            return []
+    limite = max(1, min(limite, LIMITE_MAX))
+
+    version = _version_actual()
+    with _lock:
+        if _version != version:
+            _prefijos.clear()
+            _version = version
+        filas = _desde_memoria(texto, dni)
+        if filas is not None:
+            _guardar((dni, texto), filas)
+    if filas is None:
+        filas = _consultar(texto, dni)
+        with _lock:
+            if _version == version:
+                _guardar((dni, texto), filas)
+    return [dato for _, dato in filas[:limite]]
@@ -1,3 +1,598 @@
-from django.test import TestCase
+import glob
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.db import connection
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.urls import reverse
+from django.utils import timezone
+import imagehash
+from PIL import Image, ImageDraw
+
+from app_registros import busqueda, cola_hashes, contadores, conteo, image_similarity, sugerencias
+from app_registros.models import Campo, ImagenMarcaPredefinida, MarcaSenal, Productor, Solicitud
+
+
+def imagen_jpeg(figura):
+    """Genera un JPEG chico con una figura distinta según ``figura``."""
+    img = Image.new('RGB', (200, 200), 'white')
+    dibujo = ImageDraw.Draw(img)
+    if figura == 'circulo':
+        dibujo.ellipse((40, 40, 160, 160), fill='black')
+    else:
+        dibujo.rectangle((20, 90, 180, 110), fill='black')
+        dibujo.rectangle((90, 20, 110, 180), fill='black')
+    salida = io.BytesIO()
+    img.save(salida, format='JPEG')
+    return salida.getvalue()
+
+
+class MediaTemporalMixin:
+    """MEDIA_ROOT en un directorio temporal que se borra al terminar la clase."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.override = override_settings(MEDIA_ROOT=cls.media)
+        cls.override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+
+class HashImagenMarcaTests(MediaTemporalMixin, TestCase):
+    """El hash perceptual solo se recalcula cuando cambia el archivo."""
+
+    def setUp(self):
+        self.productor = Productor.objects.create(nombre='Juan', apellido='Perez', dni='12345678')
+        self.campo = Campo.objects.create(
+            nombre='La Loma', productor=self.productor, distrito='Centro', departamento='Capital',
+        )
+        self.decodificaciones = mock.patch.object(
+            image_similarity, 'hash_y_huellas', wraps=image_similarity.hash_y_huellas,
+        )
+        self.contador = self.decodificaciones.start()
+        self.addCleanup(self.decodificaciones.stop)
+
+    def datos_formulario(self, marca, **extra):
+        datos = {
+            'productor': marca.productor_id,
+            'campo': marca.campo_id,
+            'tipo_tramite': marca.tipo_tramite,
+            'fecha_inscripcion': timezone.localdate().isoformat(),
+            'descripcion_marca': marca.descripcion_marca,
+            'estado': marca.estado,
+            'observaciones': marca.observaciones,
+            'vacuno': marca.vacuno,
+        }
+        datos.update(extra)
+        return datos
+
+    def test_editar_marca_no_vuelve_a_decodificar(self):
+        marca = MarcaSenal(
+            productor=self.productor, campo=self.campo,
+            descripcion_marca='Círculo negro en el anca', vacuno=10,
+        )
+        marca.imagen_marca = SimpleUploadedFile('circulo.jpg', imagen_jpeg('circulo'), 'image/jpeg')
+        marca.save()
+        self.assertEqual(self.contador.call_count, 1)
+        hash_original = marca.image_hash
+        self.assertTrue(hash_original)
+        self.assertTrue(marca.imagen_digest)
+
+        url = reverse('editar_marca', args=[marca.pk])
+
+        # Editar datos sin tocar la imagen
+        respuesta = self.client.post(url, self.datos_formulario(
+            marca, observaciones='Cambio de domicilio', estado='VIGENTE',
+        ))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(self.contador.call_count, 1)
+
+        # Guardados parciales y recargas desde la BD
+        marca = MarcaSenal.objects.get(pk=marca.pk)
+        marca.estado = 'VENCIDA'
+        marca.save(update_fields=['estado'])
+        marca.save()
+        self.assertEqual(self.contador.call_count, 1)
+
+        # Subir otra imagen: el validador del form y el save comparten el hash
+        respuesta = self.client.post(url, self.datos_formulario(
+            marca, imagen_marca=SimpleUploadedFile('cruz.jpg', imagen_jpeg('cruz'), 'image/jpeg'),
+        ))
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(self.contador.call_count, 2)
+        marca.refresh_from_db()
+        self.assertNotEqual(marca.image_hash, hash_original)
+        self.assertEqual(marca.image_hash, image_similarity.calcular_hash_desde_bytes(imagen_jpeg('cruz')))
+
+        # Y otra edición sin imagen no vuelve a leerla
+        antes = self.contador.call_count
+        self.client.post(url, self.datos_formulario(marca, observaciones='Sin cambios de imagen'))
+        self.assertEqual(self.contador.call_count, antes)
+
+    def test_mismo_contenido_con_otro_nombre_no_decodifica(self):
+        contenido = imagen_jpeg('circulo')
+        marca = MarcaSenal(
+            productor=self.productor, campo=self.campo,
+            descripcion_marca='Círculo negro en el anca', vacuno=10,
+        )
+        marca.imagen_marca = SimpleUploadedFile('a.jpg', contenido, 'image/jpeg')
+        marca.save()
+
+        marca = MarcaSenal.objects.get(pk=marca.pk)
+        marca.imagen_marca = SimpleUploadedFile('b.jpg', contenido, 'image/jpeg')
+        marca.save()
+        self.assertEqual(self.contador.call_count, 1)
+
+
+class CascadaTests(MediaTemporalMixin, TestCase):
+    """La cascada encuentra imágenes rotadas y puntúa todo en la misma escala."""
+
+    def bandera(self, transformacion=None, calidad=75):
+        img = Image.new('RGB', (240, 200), 'white')
+        dibujo = ImageDraw.Draw(img)
+        dibujo.rectangle((30, 20, 60, 180), fill='black')
+        dibujo.polygon([(60, 20), (200, 60), (60, 100)], fill='red')
+        if transformacion is not None:
+            img = img.transpose(transformacion)
+        salida = io.BytesIO()
+        img.save(salida, format='JPEG', quality=calidad)
+        return salida.getvalue()
+
+    def test_rotada_y_misma_escala(self):
+        productor = Productor.objects.create(nombre='Juan', apellido='Perez', dni='12345678')
+        campo = Campo.objects.create(
+            nombre='La Loma', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        imagenes = [
+            ('parecida', self.bandera(calidad=20)),
+            ('rotada', self.bandera(Image.Transpose.ROTATE_90)),
+        ]
+        for nombre, contenido in imagenes:
+            marca = MarcaSenal(productor=productor, campo=campo, descripcion_marca=nombre, vacuno=1)
+            marca.imagen_marca = SimpleUploadedFile(f'{nombre}.jpg', contenido, 'image/jpeg')
+            marca.save()
+
+        consulta = self.bandera()
+        variantes = image_similarity.huellas_consulta(consulta)
+        hash_nuevo = variantes[0].get('phash')
+        self.assertEqual(hash_nuevo, image_similarity.calcular_hash_desde_bytes(consulta))
+        resultados = {
+            r['descripcion']: r
+            for r in image_similarity.buscar_duplicados_marca(hash_nuevo, huellas=variantes)
+        }
+        self.assertEqual(resultados['parecida']['variante'], 'original')
+        self.assertEqual(resultados['rotada']['variante'], 'rotada 90°')
+
+        # Si solo lo encuentra el pHash, el puntaje es el mismo que da la cascada
+        parecida = resultados['parecida']
+        with mock.patch.object(image_similarity, '_cascada', return_value={}):
+            solo_phash = image_similarity._sumar_cascada(
+                MarcaSenal, [{'id': parecida['id'], 'distancia': parecida['distancia']}],
+                variantes, None, image_similarity._marcas_por_pk, image_similarity._datos_marca,
+            )
+        self.assertEqual(solo_phash[0]['puntaje'], parecida['puntaje'])
+
+
+@override_settings(SIMILITUD_HASH_ASINCRONO=True)
+class HashAsincronoTests(MediaTemporalMixin, TestCase):
+    """Los hashes que calcula el worker llegan al índice de los procesos web."""
+
+    def test_indice_web_se_reconstruye(self):
+        productor = Productor.objects.create(nombre='Juan', apellido='Perez', dni='12345678')
+        campo = Campo.objects.create(
+            nombre='La Loma', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        marca = MarcaSenal(productor=productor, campo=campo, descripcion_marca='Círculo', vacuno=1)
+        marca.imagen_marca = SimpleUploadedFile('circulo.jpg', imagen_jpeg('circulo'), 'image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            marca.save()
+        self.assertNotIn(marca.pk, image_similarity.obtener_indice(MarcaSenal))
+
+        # El worker corre en otro proceso: el índice de este no se toca
+        web = dict(image_similarity._indices)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(cola_hashes.procesar_pendientes(), (1, 0))
+        image_similarity._indices.clear()
+        image_similarity._indices.update(web)
+
+        self.assertIn(marca.pk, image_similarity.obtener_indice(MarcaSenal))
+
+
+class IndiceSenalesTests(MediaTemporalMixin, TestCase):
+    """Las señales mantienen el índice en memoria sin volver a armarlo."""
+
+    def test_alta_cambio_y_baja(self):
+        productor = Productor.objects.create(nombre='Juan', apellido='Perez', dni='12345678')
+        campo = Campo.objects.create(
+            nombre='La Loma', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        indice = image_similarity.obtener_indice(MarcaSenal)
+        construir = mock.patch.object(
+            image_similarity, '_construir_indice', side_effect=AssertionError('se reconstruyó'),
+        )
+
+        with construir:
+            marca = MarcaSenal(productor=productor, campo=campo, descripcion_marca='Círculo', vacuno=1)
+            marca.imagen_marca = SimpleUploadedFile('circulo.jpg', imagen_jpeg('circulo'), 'image/jpeg')
+            with self.captureOnCommitCallbacks(execute=True):
+                marca.save()
+            self.assertIs(image_similarity.obtener_indice(MarcaSenal), indice)
+            self.assertEqual(indice.buscar(marca.image_hash), [(marca.pk, 0)])
+
+            hash_anterior = marca.image_hash
+            marca.imagen_marca = SimpleUploadedFile('cruz.jpg', imagen_jpeg('cruz'), 'image/jpeg')
+            with self.captureOnCommitCallbacks(execute=True):
+                marca.save()
+            self.assertNotEqual(marca.image_hash, hash_anterior)
+            self.assertIs(image_similarity.obtener_indice(MarcaSenal), indice)
+            self.assertEqual(indice.buscar(marca.image_hash), [(marca.pk, 0)])
+            self.assertNotIn(marca.pk, [pk for pk, _ in indice.buscar(hash_anterior)])
+
+            pk = marca.pk
+            with self.captureOnCommitCallbacks(execute=True):
+                marca.delete()
+            self.assertIs(image_similarity.obtener_indice(MarcaSenal), indice)
+            self.assertNotIn(pk, indice)
+
+
+class DecodificacionReducidaTests(SimpleTestCase):
+    """La decodificación reducida da el mismo pHash que la completa en RGB."""
+
+    def test_predefinidas_mismo_hash(self):
+        rutas = sorted(glob.glob(os.path.join(settings.MEDIA_ROOT, 'marcas', 'predefinidas', '*')))
+        if not rutas:
+            self.skipTest('No hay imágenes predefinidas en media/.')
+        for ruta in rutas:
+            with self.subTest(imagen=os.path.basename(ruta)):
+                with Image.open(ruta) as img:
+                    esperado = str(imagehash.phash(img.convert('RGB'), hash_size=image_similarity.HASH_SIZE))
+                self.assertEqual(image_similarity.calcular_hash_desde_path(ruta), esperado)
+                with open(ruta, 'rb') as f:
+                    self.assertEqual(image_similarity.calcular_hash_desde_bytes(f.read()), esperado)
+
+    def test_decodificacion_reducida_acota_la_diferencia(self):
+        aleatorio = random.Random(3)
+        for i in range(8):
+            img = Image.new('RGB', (2400, 1800), 'white')
+            dibujo = ImageDraw.Draw(img)
+            for _ in range(8):
+                x, y = aleatorio.randrange(1800), aleatorio.randrange(1300)
+                color = tuple(aleatorio.randrange(256) for _ in range(3))
+                dibujo.ellipse((x, y, x + aleatorio.randrange(100, 600), y + aleatorio.randrange(100, 500)), fill=color)
+            salida = io.BytesIO()
+            img.save(salida, format='JPEG', quality=85)
+            with self.subTest(imagen=i):
+                completa, reducida = (
+                    str(imagehash.phash(
+                        image_similarity.abrir_para_hash(io.BytesIO(salida.getvalue()), lado=lado),
+                        hash_size=image_similarity.HASH_SIZE,
+                    ))
+                    for lado in (0, 256)
+                )
+                self.assertLessEqual(
+                    image_similarity.distancia(completa, reducida),
+                    image_similarity.DERIVA_DECODIFICACION_REDUCIDA,
+                )
+
+    def test_jpeg_grande_se_decodifica_chico(self):
+        salida = io.BytesIO()
+        Image.new('RGB', (3000, 2000), 'white').save(salida, format='JPEG')
+        img = image_similarity.abrir_para_hash(io.BytesIO(salida.getvalue()), lado=256)
+        self.assertEqual(img.mode, 'L')
+        self.assertLess(max(img.size), 1000)
+        self.assertGreaterEqual(min(img.size), 256)
+
+
+class IndiceHammingTests(SimpleTestCase):
+    """El índice por segmentos encuentra lo mismo que recorrer todas las filas."""
+
+    def setUp(self):
+        aleatorio = random.Random(11)
+        bits = image_similarity.HASH_BITS
+        self.consultas = [aleatorio.getrandbits(bits) for _ in range(5)]
+        self.hashes = {}
+        pk = 0
+        for consulta in self.consultas:
+            # Vecinos justo antes, en y después del umbral, más ruido
+            for distancia in range(image_similarity.HASH_THRESHOLD - 2, image_similarity.HASH_THRESHOLD + 3):
+                for _ in range(6):
+                    pk += 1
+                    bits_distintos = aleatorio.sample(range(bits), distancia)
+                    self.hashes[pk] = f'{consulta ^ sum(1 << b for b in bits_distintos):064x}'
+        for _ in range(200):
+            pk += 1
+            self.hashes[pk] = f'{aleatorio.getrandbits(bits):064x}'
+
+        # La mitad se carga de una vez y el resto se agrega de a uno
+        items = sorted(self.hashes.items())
+        self.indice = image_similarity.IndiceHamming()
+        self.indice.cargar(items[::2])
+        for pk, hash_hex in items[1::2]:
+            self.indice.agregar(pk, hash_hex)
+        for pk in (1, 2, 40):
+            self.indice.quitar(pk)
+            del self.hashes[pk]
+
+    def fuerza_bruta(self, consulta, umbral):
+        return sorted(
+            (pk, d) for pk, hash_hex in self.hashes.items()
+            if (d := image_similarity.distancia(f'{consulta:064x}', hash_hex)) <= umbral
+        )
+
+    def test_en_el_umbral_y_uno_mas(self):
+        for umbral in (image_similarity.HASH_THRESHOLD, image_similarity.HASH_THRESHOLD + 1):
+            for consulta in self.consultas:
+                with self.subTest(umbral=umbral, consulta=consulta):
+                    obtenido = self.indice.buscar(f'{consulta:064x}', umbral=umbral)
+                    self.assertEqual(sorted(obtenido), self.fuerza_bruta(consulta, umbral))
+                    self.assertEqual([d for _, d in obtenido], sorted(d for _, d in obtenido))
+
+
+class IndiceHammingLoteTests(SimpleTestCase):
+    """La búsqueda por lotes da lo mismo que comparar contra todas las filas."""
+
+    def setUp(self):
+        aleatorio = random.Random(7)
+        base = aleatorio.getrandbits(256)
+        self.hashes = {}
+        for pk in range(1, 301):
+            # Variantes de la base a pocas distancias y hashes al azar
+            if pk % 3:
+                valor = base ^ sum(1 << b for b in aleatorio.sample(range(256), pk % 20))
+            else:
+                valor = aleatorio.getrandbits(256)
+            self.hashes[pk] = f'{valor:064x}'
+        self.consultas = [f'{base:064x}', self.hashes[7], 'invalido']
+        self.indice = image_similarity.IndiceHamming()
+        self.indice.cargar(self.hashes.items())
+        self.indice.quitar(2)
+
+    def esperado(self, consulta, umbral, k):
+        if consulta == 'invalido':
+            return []
+        valor = int(consulta, 16)
+        distancias = sorted(
+            (bin(valor ^ int(h, 16)).count('1'), pk) for pk, h in self.hashes.items() if pk != 2
+        )
+        return [(pk, d) for d, pk in distancias if umbral is None or d <= umbral][:k]
+
+    def test_umbral_y_k(self):
+        for umbral, k in [(5, None), (8, 2), (10, None), (40, 5), (None, 8), (200, 3)]:
+            with self.subTest(umbral=umbral, k=k):
+                obtenido = self.indice.buscar_lote(self.consultas, umbral=umbral, k=k, filas_por_bloque=50)
+                self.assertEqual(
+                    [[d for _, d in fila] for fila in obtenido],
+                    [[d for _, d in self.esperado(c, umbral, k)] for c in self.consultas],
+                )
+                if k is None:
+                    self.assertEqual(obtenido, [self.esperado(c, umbral, k) for c in self.consultas])
+
+
+class ContadorTests(TestCase):
+    """Numeración de marcas con el contador atómico."""
+
+    def test_reservar_bloques_consecutivos(self):
+        primero = contadores.reservar('prueba', 5)
+        segundo = contadores.reservar('prueba', 3)
+        self.assertEqual(list(primero), [1, 2, 3, 4, 5])
+        self.assertEqual(list(segundo), [6, 7, 8])
+        self.assertEqual(contadores.siguiente('prueba'), 9)
+
+    def test_contador_nuevo_parte_del_ultimo_usado(self):
+        self.assertEqual(contadores.siguiente('otro', inicial=lambda: 41), 42)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ContadorConcurrenteTests(TransactionTestCase):
+    """Muchos hilos pidiendo números a la vez nunca reciben uno repetido."""
+
+    HILOS = 16
+    POR_HILO = 25
+
+    def test_numeros_unicos_con_hilos(self):
+        contadores.siguiente('concurrente')
+        barrera = threading.Barrier(self.HILOS)
+        numeros = []
+        errores = []
+
+        def pedir():
+            try:
+                barrera.wait()
+                propios = [contadores.siguiente('concurrente') for _ in range(self.POR_HILO)]
+                propios += list(contadores.reservar('concurrente', 10))
+                numeros.extend(propios)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=pedir) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        total = self.HILOS * (self.POR_HILO + 10)
+        self.assertEqual(len(numeros), total)
+        self.assertEqual(sorted(numeros), list(range(2, total + 2)))
+
+
+class NumeroExpedienteTests(TestCase):
+    """Los expedientes se numeran por año sin repetirse tras borrar solicitudes."""
+
+    def test_numeracion_por_anio(self):
+        año = timezone.now().year
+        self.assertEqual(contadores.siguiente_numero_expediente(), f'EX-{año}-00001')
+        self.assertEqual(
+            contadores.reservar_numeros_expediente(2),
+            [f'EX-{año}-00002', f'EX-{año}-00003'],
+        )
+        self.assertEqual(contadores.siguiente_numero_expediente(año - 1), f'EX-{año - 1}-00001')
+
+    def test_sigue_desde_los_existentes_y_no_repite(self):
+        año = timezone.now().year
+        productor = Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        vieja = Solicitud.objects.create(
+            productor=productor, tipo_tramite='NUEVO', numero_expediente=f'EX-{año}-00007',
+        )
+        nueva = Solicitud.objects.create(productor=productor, tipo_tramite='NUEVO')
+        self.assertEqual(nueva.numero_expediente, f'EX-{año}-00008')
+        vieja.delete()
+        otra = Solicitud.objects.create(productor=productor, tipo_tramite='NUEVO')
+        self.assertEqual(otra.numero_expediente, f'EX-{año}-00009')
+
+
+class BusquedaProductoresTests(TestCase):
+    """La búsqueda ignora acentos y mayúsculas y encuentra DNI por prefijo."""
+
+    def setUp(self):
+        Productor.objects.create(nombre='José', apellido='Núñez', dni='20111222', campo='La Quebrada')
+        Productor.objects.create(nombre='Ana', apellido='Gómez', dni='30111222')
+        Productor.objects.create(nombre='Luis', apellido='Pérez', dni='20999888')
+
+    def dnis(self, consulta):
+        return sorted(busqueda.buscar_productores(Productor.objects.all(), consulta).values_list('dni', flat=True))
+
+    def test_texto_normalizado_al_guardar(self):
+        productor = Productor.objects.get(dni='20111222')
+        self.assertEqual(productor.texto_busqueda, 'nunez jose la quebrada')
+        productor.apellido = 'Muñoz'
+        productor.save(update_fields=['apellido'])
+        productor.refresh_from_db()
+        self.assertEqual(productor.texto_busqueda, 'munoz jose la quebrada')
+
+    def test_acentos_campo_y_dni(self):
+        self.assertEqual(self.dnis('NUNEZ'), ['20111222'])
+        self.assertEqual(self.dnis('gómez'), ['30111222'])
+        self.assertEqual(self.dnis('quebrada'), ['20111222'])
+        self.assertEqual(self.dnis('20'), ['20111222', '20999888'])
+
+
+class BusquedaMarcasTests(TestCase):
+    """El texto de búsqueda de la marca sigue a su descripción y sus componentes."""
+
+    def setUp(self):
+        productor = Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        campo = Campo.objects.create(
+            nombre='El Alto', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        self.marca = MarcaSenal.objects.create(
+            productor=productor, campo=campo, descripcion_marca='Dos rayas', vacuno=1,
+        )
+        # bulk_create: sin archivo no hay hash que calcular
+        self.herradura, self.corazon = ImagenMarcaPredefinida.objects.bulk_create([
+            ImagenMarcaPredefinida(nombre='Herradura', imagen='predefinidas/h.png'),
+            ImagenMarcaPredefinida(nombre='Corazón', imagen='predefinidas/c.png'),
+        ])
+
+    def encontradas(self, consulta):
+        return list(busqueda.buscar_marcas(MarcaSenal.objects.all(), consulta).values_list('pk', flat=True))
+
+    def test_componentes_y_descripcion(self):
+        self.assertEqual(self.encontradas('RAYAS'), [self.marca.pk])
+        self.assertEqual(self.encontradas('corazon'), [])
+
+        self.marca.imagenes_predefinidas.add(self.herradura, self.corazon)
+        self.assertEqual(self.encontradas('corazon'), [self.marca.pk])
+
+        # Guardar la marca conserva los componentes
+        self.marca.refresh_from_db()
+        self.marca.descripcion_marca = 'Tres rayas'
+        self.marca.save()
+        self.assertEqual(self.encontradas('herradura'), [self.marca.pk])
+        self.assertEqual(self.encontradas('tres'), [self.marca.pk])
+
+        self.herradura.nombre = 'Ancla'
+        self.herradura.save(update_fields=['nombre'])
+        self.assertEqual(self.encontradas('ancla'), [self.marca.pk])
+
+        self.corazon.marcasenal_set.clear()
+        self.assertEqual(self.encontradas('corazon'), [])
+        self.marca.imagenes_predefinidas.remove(self.herradura)
+        self.assertEqual(self.encontradas('ancla'), [])
+
+    def test_borrar_imagen_predefinida(self):
+        self.marca.imagenes_predefinidas.add(self.herradura, self.corazon)
+        self.corazon.delete()
+        self.assertEqual(self.encontradas('corazon'), [])
+        self.assertEqual(self.encontradas('herradura'), [self.marca.pk])
+
+        ImagenMarcaPredefinida.objects.filter(pk=self.herradura.pk).delete()
+        self.assertEqual(self.encontradas('herradura'), [])
+
+
+class SugerenciasProductoresTests(TestCase):
+    """El autocompletado busca por prefijo y reutiliza los prefijos ya consultados."""
+
+    def setUp(self):
+        sugerencias.invalidar()
+        Productor.objects.create(nombre='José', apellido='Núñez', dni='20111222')
+        Productor.objects.create(nombre='Ana', apellido='Nuñoz', dni='30111222')
+        Productor.objects.create(nombre='Nuria', apellido='Pérez', dni='20999888')
+
+    def ids(self, consulta):
+        return [r['dni'] for r in sugerencias.sugerir_productores(consulta)]
+
+    def test_prefijos(self):
+        # Primero los que empiezan por el apellido, después otras palabras
+        self.assertEqual(self.ids('nu'), ['20111222', '30111222', '20999888'])
+        self.assertEqual(self.ids('NÚÑE'), ['20111222'])
+        self.assertEqual(self.ids('20.1'), ['20111222'])
+        self.assertEqual(self.ids('n'), [])
+
+    def test_prefijo_mas_largo_sin_consultar(self):
+        self.ids('nu')
+        # Solo se lee la versión compartida
+        with self.assertNumQueries(1):
+            self.assertEqual(self.ids('nur'), ['20999888'])
+
+    def test_se_invalida_al_guardar(self):
+        self.assertEqual(self.ids('go'), [])
+        Productor.objects.create(nombre='Luis', apellido='Gómez', dni='40111222')
+        self.assertEqual(self.ids('go'), ['40111222'])
+
+
+@override_settings(CONTEO_EXACTO_HASTA=1000)
+class ConteoAproximadoTests(TestCase):
+    """Por encima del umbral se usa la estimación y no se hace COUNT(*)."""
+
+    def setUp(self):
+        for i in range(3):
+            Productor.objects.create(nombre='Ana', apellido=f'Gomez{i}', dni=f'5000000{i}')
+
+    def test_estimacion_grande(self):
+        with mock.patch.object(conteo, 'estimar', return_value=50000), self.assertNumQueries(0):
+            paginador = conteo.ConteoAproximadoPaginator(Productor.objects.all(), 20)
+            self.assertEqual((paginador.count, paginador.aproximado), (50000, True))
+            self.assertEqual(paginador.num_pages, 2500)
+
+    def test_paginas_con_estimacion_de_mas(self):
+        with mock.patch.object(conteo, 'estimar', return_value=50000):
+            paginador = conteo.ConteoAproximadoPaginator(Productor.objects.order_by('pk'), 2)
+            self.assertTrue(paginador.page(1).has_next())
+            ultima = paginador.page(2)
+            self.assertEqual(len(ultima), 1)
+            self.assertFalse(ultima.has_next())
+            self.assertEqual(paginador.validate_number(30000), 30000)
+            rango = list(paginador.get_elided_page_range(1))
+            self.assertEqual(rango, [1, 2, 3, 4, paginador.ELLIPSIS])
+
+    def test_estimacion_chica_cuenta_exacto(self):
+        with mock.patch.object(conteo, 'estimar', return_value=10):
+            self.assertEqual(conteo.contar(Productor.objects.all()), (3, False))
@@ -258,7 +258,7 @@ class ImagenDuplicadaValidator:
     def __call__(self, imagen_field):
         from app_registros.image_similarity import (
             calcular_hash, buscar_duplicados_marca,
-            buscar_duplicados_predefinida, HASH_THRESHOLD,
+            buscar_duplicados_predefinida, huellas_consulta, HASH_THRESHOLD,
         )
         from django.core.exceptions import ValidationError
 
@@ -266,7 +266,14 @@ class ImagenDuplicadaValidator:
         if not hash_nuevo:
             return
 
-        duplicados_marcas = buscar_duplicados_marca(hash_nuevo, excluir_id=self.excluir_id)
+        # Huellas de las rotaciones/espejados para la búsqueda en cascada
+        imagen_field.seek(0)
+        huellas = huellas_consulta(imagen_field.read())
+        imagen_field.seek(0)
+
+        duplicados_marcas = buscar_duplicados_marca(
+            hash_nuevo, excluir_id=self.excluir_id, huellas=huellas,
+        )
         if duplicados_marcas:
             mejor = duplicados_marcas[0]
             raise ValidationError(
@@ -275,7 +282,7 @@ class ImagenDuplicadaValidator:
                 code='imagen_duplicada_marca',
             )
 
-        duplicados_pred = buscar_duplicados_predefinida(hash_nuevo)
+        duplicados_pred = buscar_duplicados_predefinida(hash_nuevo, huellas=huellas)
         if duplicados_pred:
             mejor = duplicados_pred[0]
             raise ValidationError(
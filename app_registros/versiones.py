@@ -0,0 +1,52 @@
+"""
+versiones.py
+------------
+Versiones compartidas por todos los procesos (workers web y comandos).
+
+Las cachés en memoria de cada proceso (índice de hashes, imágenes
+predefinidas, sugerencias, dashboards) guardan la versión con la que se
+armaron y se descartan cuando cambia. La versión es una fila de Contador:
+se lee con una consulta por clave primaria y se incrementa con un UPDATE
+atómico, así no depende de que CACHES sea compartida entre procesos.
+
+Las señales publican con ``incrementar_al_confirmar``: el UPDATE corre en su
+propia transacción corta después del commit, así la fila de Contador (una
+por clave, compartida por todos) no queda bloqueada mientras dura la
+transacción que cambió los datos. Entre el commit y el incremento otro
+proceso puede leer la versión anterior por un instante; nunca ve una versión
+nueva sin los datos que la cambiaron.
+"""
+
+from django.db import transaction
+
+from app_registros import contadores
+
+
+def _nombre(clave):
+    return f'version:{clave}'
+
+
+def actual(clave):
+    """Versión vigente de ``clave`` (0 si nunca se incrementó)."""
+    from app_registros.models import Contador
+    valor = Contador.objects.filter(nombre=_nombre(clave)).values_list('valor', flat=True).first()
+    return valor or 0
+
+
+def incrementar(clave):
+    """Publica una versión nueva de ``clave`` y la devuelve."""
+    return contadores.siguiente(_nombre(clave))
+
+
+def incrementar_al_confirmar(clave, despues=None):
+    """
+    Publica una versión nueva de ``clave`` cuando se confirme la transacción
+    en curso (en el acto si no hay ninguna). ``despues(nueva)`` se llama con
+    la versión publicada; si la transacción se revierte no pasa nada.
+    """
+    def publicar():
+        nueva = incrementar(clave)
+        if despues is not None:
+            despues(nueva)
+
+    transaction.on_commit(publicar)
@@ -1,3 +1,19 @@
 from django.contrib import admin
 
+from .models import TrabajoReporte
+
 # Register your models here.
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('reporte', 'formato', 'usuario', 'estado', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado', 'reporte', 'formato')
+    search_fields = ('usuario__username',)
+    readonly_fields = ('clave', 'archivo_generado', 'fecha_creacion', 'fecha_inicio', 'fecha_fin')
+    # El archivo no tiene URL pública (ver AlmacenamientoReportes)
+    exclude = ('archivo',)
+
+    @admin.display(description='Archivo')
+    def archivo_generado(self, obj):
+        return obj.archivo.name
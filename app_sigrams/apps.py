@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppSigramsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_sigrams'
+
+    def ready(self):
+        # Importar las señales
+        import app_sigrams.signals
@@ -0,0 +1,288 @@
+"""
+estadisticas.py
+---------------
+Números de los dashboards con pocas consultas.
+
+Las marcas y solicitudes se cuentan sobre EstadisticaDiaria, una fila por
+día, tabla, estado, tipo de trámite y prioridad que las señales mantienen al
+día: los dashboards leen unos cientos de filas en lugar de todo el historial.
+
+Las señales solo ven ``save()`` y ``delete()``. ``QuerySet.update()``,
+``bulk_create()``, ``bulk_update()`` o los cambios hechos por SQL sobre
+marcas o solicitudes no las disparan, y la tabla queda desfasada de los
+datos; después de cualquiera de ellos hay que correr
+``manage.py reconstruir_estadisticas``.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from app_registros import versiones
+from app_registros.models import Campo, MarcaSenal, Productor, Solicitud
+from app_sigrams.models import EstadisticaDiaria
+
+MESES_ACTIVIDAD = 6
+
+
+def _inicio_mes(fecha, meses_atras=0):
+    """Primer día del mes ``meses_atras`` meses antes del de ``fecha``."""
+    indice = fecha.year * 12 + fecha.month - 1 - meses_atras
+    return datetime.date(indice // 12, indice % 12 + 1, 1)
+
+
+def _por_mes(filas, campo):
+    """``{(año, mes): valor}`` de filas agrupadas con TruncMonth en ``mes``."""
+    return {(fila['mes'].year, fila['mes'].month): fila[campo] or 0 for fila in filas if fila['mes']}
+
+
+# ─── Mantenimiento de EstadisticaDiaria ──────────────────────────────────
+
+# Campos de cada modelo que definen su fila en EstadisticaDiaria
+CAMPOS_ESTADISTICA = {
+    MarcaSenal: ('fecha_creacion', 'estado', 'tipo_tramite', 'valor_sellado'),
+    Solicitud: ('fecha_solicitud', 'estado', 'tipo_tramite', 'prioridad'),
+}
+
+
+def clave_estadistica(instancia):
+    """
+    ``(fecha, tabla, estado, tipo_tramite, prioridad, valor_sellado)`` con
+    que ``instancia`` suma en EstadisticaDiaria, o None si todavía no tiene fecha.
+    """
+    if isinstance(instancia, MarcaSenal):
+        if not instancia.fecha_creacion:
+            return None
+        return (timezone.localdate(instancia.fecha_creacion), 'marca', instancia.estado,
+                instancia.tipo_tramite, '', instancia.valor_sellado)
+    if not instancia.fecha_solicitud:
+        return None
+    return (timezone.localdate(instancia.fecha_solicitud), 'solicitud', instancia.estado,
+            instancia.tipo_tramite, instancia.prioridad or '', None)
+
+
+def sumar_estadistica(clave, signo=1):
+    """Suma (``signo=1``) o resta (``signo=-1``) una fila de la clave en EstadisticaDiaria."""
+    if clave is None:
+        return
+    fecha, tabla, estado, tipo_tramite, prioridad, valor = clave
+    filas = EstadisticaDiaria.objects.filter(
+        fecha=fecha, tabla=tabla, estado=estado, tipo_tramite=tipo_tramite, prioridad=prioridad,
+    )
+    cambios = {'cantidad': F('cantidad') + signo}
+    if valor is not None:
+        cambios['cantidad_sellado'] = F('cantidad_sellado') + signo
+        cambios['valor_sellado'] = F('valor_sellado') + signo * valor
+    with transaction.atomic():
+        if filas.update(**cambios) or signo < 0:
+            # Una resta sin fila no debería pasar; reconstruir_estadisticas lo corrige.
+            return
+        try:
+            with transaction.atomic():
+                EstadisticaDiaria.objects.create(
+                    fecha=fecha, tabla=tabla, estado=estado, tipo_tramite=tipo_tramite,
+                    prioridad=prioridad, cantidad=1,
+                    cantidad_sellado=0 if valor is None else 1, valor_sellado=valor or 0,
+                )
+        except IntegrityError:
+            # Otro proceso creó la fila primero
+            filas.update(**cambios)
+
+
+def reconstruir_estadisticas():
+    """
+    Rearma EstadisticaDiaria desde cero a partir de las marcas y solicitudes.
+    Va después de cualquier operación masiva que no dispare señales.
+    """
+    filas = []
+    marcas = (
+        MarcaSenal.objects.annotate(dia=TruncDate('fecha_creacion')).order_by()
+        .values('dia', 'estado', 'tipo_tramite')
+        .annotate(total=Count('id'), sellado=Count('valor_sellado'), valor=Sum('valor_sellado'))
+    )
+    for fila in marcas:
+        filas.append(EstadisticaDiaria(
+            fecha=fila['dia'], tabla='marca', estado=fila['estado'],
+            tipo_tramite=fila['tipo_tramite'], cantidad=fila['total'],
+            cantidad_sellado=fila['sellado'], valor_sellado=fila['valor'] or 0,
+        ))
+    solicitudes = (
+        Solicitud.objects.annotate(dia=TruncDate('fecha_solicitud')).order_by()
+        .values('dia', 'estado', 'tipo_tramite', 'prioridad').annotate(total=Count('id'))
+    )
+    for fila in solicitudes:
+        filas.append(EstadisticaDiaria(
+            fecha=fila['dia'], tabla='solicitud', estado=fila['estado'],
+            tipo_tramite=fila['tipo_tramite'], prioridad=fila['prioridad'] or '',
+            cantidad=fila['total'],
+        ))
+    with transaction.atomic():
+        EstadisticaDiaria.objects.all().delete()
+        EstadisticaDiaria.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+# ─── Lecturas ────────────────────────────────────────────────────────────
+
+def totales_por(tabla, campo):
+    """``[{campo: valor, 'total': n}, ...]`` de la tabla ('marca' o 'solicitud')."""
+    return list(
+        EstadisticaDiaria.objects.filter(tabla=tabla).order_by(campo)
+        .values(campo).annotate(total=Sum('cantidad'))
+    )
+
+
+def ingresos_por_mes(desde=None, año=None, mes=None):
+    """``[{'mes', 'total', 'cantidad'}, ...]`` de las marcas con valor de sellado, por mes."""
+    filas = EstadisticaDiaria.objects.filter(tabla='marca', cantidad_sellado__gt=0)
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if año:
+        filas = filas.filter(fecha__year=año)
+    if mes:
+        filas = filas.filter(fecha__month=mes)
+    return list(
+        filas.annotate(mes=TruncMonth('fecha')).order_by('mes').values('mes')
+        .annotate(total=Sum('valor_sellado'), cantidad=Sum('cantidad_sellado'))
+    )
+
+
+def estadisticas_home(hoy=None):
+    """
+    Totales, distribuciones y actividad de los últimos MESES_ACTIVIDAD
+    meses (al menos 2: los ingresos comparan con el mes anterior) para el
+    dashboard. Siempre hace la misma cantidad de consultas.
+    """
+    hoy = timezone.localdate(hoy)
+    primer_dia_mes = _inicio_mes(hoy)
+    desde = _inicio_mes(hoy, MESES_ACTIVIDAD - 1)
+
+    # ========== PRODUCTORES ==========
+    productores_por_estado = list(
+        Productor.objects.values('estado').annotate(total=Count('id')).order_by('estado')
+    )
+    total_productores = sum(fila['total'] for fila in productores_por_estado)
+
+    total_campos = Campo.objects.count()
+
+    # ========== MARCAS Y SOLICITUDES (EstadisticaDiaria) ==========
+    totales = list(
+        EstadisticaDiaria.objects.order_by('tabla', 'estado', 'tipo_tramite')
+        .values('tabla', 'estado', 'tipo_tramite')
+        .annotate(total=Sum('cantidad'), del_mes=Sum('cantidad', filter=Q(fecha__gte=primer_dia_mes)))
+    )
+    marcas_por_tipo = {}
+    solicitudes_por_estado = {}
+    total_marcas = solicitudes_pendientes = tramites_mes = 0
+    for fila in totales:
+        if fila['tabla'] == 'marca':
+            marcas_por_tipo[fila['tipo_tramite']] = marcas_por_tipo.get(fila['tipo_tramite'], 0) + fila['total']
+            if fila['estado'] == 'VIGENTE':
+                total_marcas += fila['total']
+        else:
+            solicitudes_por_estado[fila['estado']] = solicitudes_por_estado.get(fila['estado'], 0) + fila['total']
+            if fila['estado'] == 'PENDIENTE':
+                solicitudes_pendientes += fila['total']
+            tramites_mes += fila['del_mes'] or 0
+    marcas_por_tipo = [{'tipo_tramite': k, 'total': v} for k, v in sorted(marcas_por_tipo.items())]
+    solicitudes_por_estado = [{'estado': k, 'total': v} for k, v in sorted(solicitudes_por_estado.items())]
+
+    # ========== ACTIVIDAD MENSUAL ==========
+    mensual = (
+        EstadisticaDiaria.objects.filter(fecha__gte=desde)
+        .annotate(mes=TruncMonth('fecha')).order_by()
+        .values('tabla', 'mes').annotate(total=Sum('cantidad'), valor=Sum('valor_sellado'))
+    )
+    solicitudes_mes = {}
+    ingresos_mensuales = {}
+    for fila in mensual:
+        clave = (fila['mes'].year, fila['mes'].month)
+        if fila['tabla'] == 'marca':
+            ingresos_mensuales[clave] = fila['valor'] or 0
+        else:
+            solicitudes_mes[clave] = fila['total']
+    # La serie de marcas va por fecha de inscripción, que no está en la tabla diaria
+    marcas_mes = _por_mes(
+        MarcaSenal.objects.filter(fecha_inscripcion__gte=desde)
+        .annotate(mes=TruncMonth('fecha_inscripcion')).order_by()
+        .values('mes').annotate(total=Count('id')),
+        'total',
+    )
+
+    meses_actividad = []
+    for i in reversed(range(MESES_ACTIVIDAD)):
+        inicio = _inicio_mes(hoy, i)
+        clave = (inicio.year, inicio.month)
+        meses_actividad.append({
+            'mes': inicio.strftime('%Y-%m'),
+            'nombre': inicio.strftime('%b'),
+            'solicitudes': solicitudes_mes.get(clave, 0),
+            'marcas': marcas_mes.get(clave, 0),
+            'ingresos': float(ingresos_mensuales.get(clave, 0)),
+        })
+
+    # ========== INGRESOS ==========
+    mes_anterior = _inicio_mes(hoy, 1)
+    ingresos_mes = ingresos_mensuales.get((hoy.year, hoy.month), 0)
+    ingresos_mes_anterior = ingresos_mensuales.get((mes_anterior.year, mes_anterior.month), 0)
+    if ingresos_mes_anterior > 0:
+        variacion_ingresos = ((ingresos_mes - ingresos_mes_anterior) / ingresos_mes_anterior) * 100
+    else:
+        variacion_ingresos = 100 if ingresos_mes > 0 else 0
+
+    return {
+        'total_productores': total_productores,
+        'total_marcas': total_marcas,
+        'solicitudes_pendientes': solicitudes_pendientes,
+        'total_campos': total_campos,
+        'ingresos_mes': ingresos_mes,
+        'ingresos_mes_anterior': ingresos_mes_anterior,
+        'variacion_ingresos': variacion_ingresos,
+        'tramites_mes': tramites_mes,
+        'productores_por_estado': productores_por_estado,
+        'marcas_por_tipo': marcas_por_tipo,
+        'solicitudes_por_estado': solicitudes_por_estado,
+        'meses_actividad': meses_actividad,
+    }
+
+
+# ─── Caché de dashboards ─────────────────────────────────────────────────
+# Los contextos se guardan bajo la versión global de los datos (una fila de
+# Contador, ver app_registros.versiones, así todos los procesos la ven), que
+# las señales incrementan al confirmarse cada alta, cambio o baja de
+# productores, campos, marcas o solicitudes (en su propia transacción corta,
+# sin bloquear la fila mientras dura la que cambió los datos).
+# DASHBOARD_CACHE_SEGUNDOS acota cuánto puede quedar atrasado lo que no
+# dispara esas señales (fechas que pasan, usuarios, logs).
+
+CLAVE_VERSION_DATOS = 'dashboard'
+
+
+def version_datos():
+    return versiones.actual(CLAVE_VERSION_DATOS)
+
+
+def invalidar_dashboards():
+    """Publica una versión nueva al confirmarse la transacción en curso."""
+    versiones.incrementar_al_confirmar(CLAVE_VERSION_DATOS)
+
+
+def contexto_cacheado(nombre, construir):
+    """
+    Devuelve el contexto del dashboard ``nombre`` desde la caché o lo arma
+    con ``construir()`` (que debe devolver datos ya evaluados, no querysets).
+    """
+    segundos = getattr(settings, 'DASHBOARD_CACHE_SEGUNDOS', 300)
+    if not segundos:
+        return construir()
+    clave = f'dashboard:{nombre}:{version_datos()}'
+    contexto = cache.get(clave)
+    if contexto is None:
+        contexto = construir()
+        cache.set(clave, contexto, segundos)
+    return contexto
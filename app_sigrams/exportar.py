@@ -0,0 +1,265 @@
+"""
+exportar.py
+-----------
+Exportaciones sin cargar todo en memoria.
+
+El libro se escribe en modo ``write_only`` (openpyxl no guarda las celdas,
+las vuelca a disco a medida que llegan), las filas salen de
+``values_list().iterator()`` y el ancho de las columnas se calcula con las
+primeras FILAS_MUESTRA filas. El archivo queda en un temporal que se envía
+por partes con FileResponse.
+
+CSV y NDJSON se generan mientras se envían (StreamingHttpResponse), leyendo
+con cursores del servidor y, si se pide, comprimiendo con gzip al vuelo.
+
+Los PDF parten las filas en LongTable de FILAS_POR_TABLA filas (el
+encabezado se repite en cada página) con anchos de columna fijos y un
+TableStyle compartido: ReportLab diagrama cada tabla chica por separado y
+el tiempo crece en forma lineal con la cantidad de filas. Las tablas se
+arman a medida que ``build()`` las consume.
+"""
+
+import csv
+import datetime
+import json
+import tempfile
+import zlib
+from itertools import chain, islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TAMANO_LOTE = 2000
+FILAS_MUESTRA = 200
+ANCHO_MAXIMO = 50
+TAMANO_BLOQUE = 64 * 1024
+
+CONTENT_TYPES_STREAMING = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+FUENTE_ENCABEZADO = Font(bold=True, color="FFFFFF")
+RELLENO_ENCABEZADO = PatternFill(start_color="0A2E5A", end_color="0A2E5A", fill_type="solid")
+ALINEACION_ENCABEZADO = Alignment(horizontal="center")
+
+FILAS_POR_TABLA = 200
+ESTILO_TABLA_PDF = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0A2E5A')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+])
+
+
+def etiquetas(modelo, campo):
+    """``{valor: etiqueta}`` de las choices de ``campo`` (en lugar de get_*_display por fila)."""
+    return dict(modelo._meta.get_field(campo).flatchoices)
+
+
+def filas_de(queryset, *campos):
+    """Tuplas de ``campos`` leídas por lotes con un cursor del servidor."""
+    return queryset.values_list(*campos).iterator(chunk_size=TAMANO_LOTE)
+
+
+def _anchos(encabezados, muestra):
+    anchos = [len(str(h)) for h in encabezados]
+    for fila in muestra:
+        for i, valor in enumerate(fila):
+            if valor is not None:
+                anchos[i] = max(anchos[i], len(str(valor)))
+    return [min(ancho + 2, ANCHO_MAXIMO) for ancho in anchos]
+
+
+def escribir_xlsx(destino, titulo, encabezados, filas):
+    """Escribe en ``destino`` (ruta o archivo) una hoja con ``encabezados`` y ``filas``."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+
+    filas = iter(filas)
+    muestra = list(islice(filas, FILAS_MUESTRA))
+    # En modo write_only los anchos se fijan antes de la primera fila
+    for i, ancho in enumerate(_anchos(encabezados, muestra), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = ancho
+
+    fila_encabezado = []
+    for texto in encabezados:
+        celda = WriteOnlyCell(ws, value=texto)
+        celda.font = FUENTE_ENCABEZADO
+        celda.fill = RELLENO_ENCABEZADO
+        celda.alignment = ALINEACION_ENCABEZADO
+        fila_encabezado.append(celda)
+    ws.append(fila_encabezado)
+
+    for fila in chain(muestra, filas):
+        ws.append(fila)
+    wb.save(destino)
+
+
+def respuesta_xlsx(nombre_archivo, titulo, encabezados, filas):
+    """FileResponse con el libro escrito en un archivo temporal (se borra al cerrarse)."""
+    temporal = tempfile.TemporaryFile()
+    try:
+        escribir_xlsx(temporal, titulo, encabezados, filas)
+    except Exception:
+        temporal.close()
+        raise
+    temporal.seek(0)
+    return FileResponse(
+        temporal, as_attachment=True, filename=nombre_archivo, content_type=CONTENT_TYPE_XLSX,
+    )
+
+
+# ─── PDF por partes ───
+
+class _FlowablesPerezosos(list):
+    """
+    Lista que ``build()`` vacía desde el principio y que se vuelve a llenar
+    desde un iterador cuando queda vacía: solo una tabla vive en memoria.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._siguientes = iter(flowables)
+
+    def __len__(self):
+        if not super().__len__():
+            siguiente = next(self._siguientes, None)
+            if siguiente is not None:
+                self.append(siguiente)
+        return super().__len__()
+
+
+def _texto_pdf(valor):
+    return '' if valor is None else str(valor)
+
+
+def _tablas(encabezados, filas, anchos, estilo):
+    filas = iter(filas)
+    while True:
+        bloque = [[_texto_pdf(v) for v in fila] for fila in islice(filas, FILAS_POR_TABLA)]
+        if not bloque:
+            return
+        yield LongTable([encabezados] + bloque, colWidths=anchos, repeatRows=1, style=estilo)
+
+
+def escribir_pdf(destino, titulo, encabezados, filas, pagesize=landscape(A4), estilo=ESTILO_TABLA_PDF):
+    """
+    Escribe en ``destino`` un PDF con ``titulo``, la fecha y ``filas`` en
+    tablas de FILAS_POR_TABLA filas. Los anchos salen de las primeras
+    FILAS_MUESTRA filas y se reparten en el ancho de la página.
+    """
+    doc = SimpleDocTemplate(destino, pagesize=pagesize)
+    styles = getSampleStyleSheet()
+
+    filas = iter(filas)
+    muestra = list(islice(filas, FILAS_MUESTRA))
+    proporciones = _anchos(encabezados, muestra)
+    total = sum(proporciones)
+    anchos = [doc.width * p / total for p in proporciones]
+
+    def flowables():
+        yield Paragraph(f"{titulo} - SIGRAMS", styles['Title'])
+        yield Spacer(1, 12)
+        yield Paragraph(f"Generado: {timezone.localtime().strftime('%d/%m/%Y %H:%M')}", styles['Normal'])
+        yield Spacer(1, 24)
+        yield from _tablas(encabezados, chain(muestra, filas), anchos, estilo)
+
+    doc.build(_FlowablesPerezosos(flowables()))
+
+
+def respuesta_pdf(nombre_archivo, titulo, encabezados, filas, **opciones):
+    """HttpResponse con el PDF de ``escribir_pdf``."""
+    respuesta = HttpResponse(content_type='application/pdf')
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    escribir_pdf(respuesta, titulo, encabezados, filas, **opciones)
+    return respuesta
+
+
+# ─── CSV / NDJSON en streaming ───
+
+class _Eco:
+    """Archivo falso para csv.writer: devuelve la línea en lugar de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    return valor
+
+
+def lineas_csv(columnas, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(columnas).encode()
+    for fila in filas:
+        yield escritor.writerow([_valor_csv(v) for v in fila]).encode()
+
+
+def lineas_ndjson(columnas, filas):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for fila in filas:
+        yield (codificador.encode(dict(zip(columnas, fila))) + '\n').encode()
+
+
+def _en_bloques(partes):
+    """Junta las líneas en bloques de ~TAMANO_BLOQUE para no enviar una por fila."""
+    bloque = []
+    tamano = 0
+    for parte in partes:
+        bloque.append(parte)
+        tamano += len(parte)
+        if tamano >= TAMANO_BLOQUE:
+            yield b''.join(bloque)
+            bloque = []
+            tamano = 0
+    if bloque:
+        yield b''.join(bloque)
+
+
+def _gzip(bloques):
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def respuesta_streaming(nombre, formato, columnas, filas, comprimir=False):
+    """
+    StreamingHttpResponse con ``filas`` en ``formato`` ('csv' o 'ndjson').
+    Con ``comprimir`` el archivo sale como ``nombre.formato.gz``.
+    """
+    lineas = lineas_csv(columnas, filas) if formato == 'csv' else lineas_ndjson(columnas, filas)
+    contenido = _en_bloques(lineas)
+    nombre_archivo = f'{nombre}.{formato}'
+    content_type = CONTENT_TYPES_STREAMING[formato]
+    if comprimir:
+        contenido = _gzip(contenido)
+        nombre_archivo += '.gz'
+        content_type = 'application/gzip'
+    respuesta = StreamingHttpResponse(contenido, content_type=content_type)
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
@@ -0,0 +1,143 @@
+"""
+filtros.py
+----------
+Filtros de los listados a partir de los parámetros GET.
+
+Los usan las vistas de lista y las exportaciones, así un mismo enlace
+(``?estado=...&q=...``) da las mismas filas en pantalla y en el archivo.
+"""
+
+import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from app_registros.busqueda import buscar_productores, normalizar
+
+
+def _fecha(params, nombre):
+    try:
+        return parse_date(params.get(nombre, '') or '')
+    except ValueError:
+        return None
+
+
+def _desde_el_dia(fecha, dias=0):
+    """
+    Comienzo (hora local) del día ``fecha + dias``. Comparar la columna con
+    este valor, en lugar de usar ``__date``, deja usar su índice.
+    """
+    dia = fecha + datetime.timedelta(days=dias)
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+
+def filtrar_productores(queryset, params):
+    """Filtra por estado, localidad, departamento y búsqueda ``q`` (anota ``rango``)."""
+    estado = params.get('estado', '')
+    localidad = params.get('localidad', '')
+    departamento = params.get('departamento', '')
+    query = params.get('q', '')
+
+    if estado:
+        queryset = queryset.filter(estado=estado)
+    if localidad:
+        queryset = queryset.filter(localidad__icontains=localidad)
+    if departamento:
+        queryset = queryset.filter(departamento__icontains=departamento)
+    if query:
+        queryset = buscar_productores(queryset, query)
+    return queryset
+
+
+def filtrar_marcas(queryset, params):
+    """Filtra por estado, tipo de trámite y ``q`` (número de orden, productor o descripción)."""
+    estado = params.get('estado', '')
+    tipo_tramite = params.get('tipo_tramite', '')
+    query = params.get('q', '').strip()
+
+    if estado:
+        queryset = queryset.filter(estado=estado)
+    if tipo_tramite:
+        queryset = queryset.filter(tipo_tramite=tipo_tramite)
+    if query.isdigit():
+        queryset = queryset.filter(numero_orden=int(query))
+    elif query:
+        texto = normalizar(query)
+        queryset = queryset.filter(
+            Q(productor__texto_busqueda__contains=texto) | Q(texto_busqueda__contains=texto)
+        )
+    return queryset
+
+
+def filtrar_solicitudes(queryset, params):
+    """Filtra por estado, tipo de trámite, prioridad, productor y rango de fechas."""
+    estado = params.get('estado', '')
+    tipo_tramite = params.get('tipo_tramite', '')
+    prioridad = params.get('prioridad', '')
+    productor_id = params.get('productor', '')
+    fecha_inicio = _fecha(params, 'fecha_inicio')
+    fecha_fin = _fecha(params, 'fecha_fin')
+
+    if estado:
+        queryset = queryset.filter(estado=estado)
+    if tipo_tramite:
+        queryset = queryset.filter(tipo_tramite=tipo_tramite)
+    if prioridad:
+        queryset = queryset.filter(prioridad=prioridad)
+    if productor_id.isdigit():
+        queryset = queryset.filter(productor_id=productor_id)
+    if fecha_inicio:
+        queryset = queryset.filter(fecha_solicitud__gte=_desde_el_dia(fecha_inicio))
+    if fecha_fin:
+        queryset = queryset.filter(fecha_solicitud__lt=_desde_el_dia(fecha_fin, 1))
+    return queryset
+
+
+def filtrar_campos(queryset, params):
+    """Filtra por productor, distrito y departamento."""
+    productor_id = params.get('productor', '')
+    distrito = params.get('distrito', '')
+    departamento = params.get('departamento', '')
+
+    if productor_id.isdigit():
+        queryset = queryset.filter(productor_id=productor_id)
+    if distrito:
+        queryset = queryset.filter(distrito__icontains=distrito)
+    if departamento:
+        queryset = queryset.filter(departamento__icontains=departamento)
+    return queryset
+
+
+def filtrar_cambios(queryset, params):
+    """Filtra el historial por modelo, acción, usuario y rango de fechas."""
+    modelo = params.get('modelo', '')
+    accion = params.get('accion', '')
+    usuario = params.get('usuario', '')
+    desde = _fecha(params, 'desde')
+    hasta = _fecha(params, 'hasta')
+
+    if modelo:
+        queryset = queryset.filter(modelo=modelo)
+    if accion:
+        queryset = queryset.filter(accion=accion)
+    if usuario:
+        queryset = queryset.filter(user__username=usuario)
+    if desde:
+        queryset = queryset.filter(timestamp__gte=_desde_el_dia(desde))
+    if hasta:
+        queryset = queryset.filter(timestamp__lt=_desde_el_dia(hasta, 1))
+    return queryset
+
+
+def filtrar_ingresos(queryset, params):
+    """Marcas con sellado cargado, por año y mes de creación."""
+    año = str(params.get('año', ''))
+    mes = str(params.get('mes', ''))
+
+    queryset = queryset.filter(valor_sellado__isnull=False)
+    if año.isdigit():
+        queryset = queryset.filter(fecha_creacion__year=año)
+    if mes.isdigit():
+        queryset = queryset.filter(fecha_creacion__month=mes)
+    return queryset
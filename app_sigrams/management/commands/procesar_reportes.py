@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_sigrams.trabajos import limpiar_vencidos, reencolar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Genera los reportes que quedaron pendientes y borra los archivos vencidos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conservar-dias', type=int,
+                            default=getattr(settings, 'REPORTES_CONSERVAR_DIAS', 7),
+                            help='Días que se guardan los reportes generados.')
+
+    def handle(self, *args, **options):
+        procesados = reencolar_pendientes()
+        borrados = limpiar_vencidos(options['conservar_dias'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{procesados} reportes generados, {borrados} trabajos vencidos borrados.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app_sigrams.estadisticas import reconstruir_estadisticas
+
+
+class Command(BaseCommand):
+    help = (
+        'Rearma la tabla EstadisticaDiaria a partir de las marcas y solicitudes. '
+        'Correrlo después de QuerySet.update, bulk_create o bulk_update sobre '
+        'marcas o solicitudes, que no disparan las señales que la mantienen.'
+    )
+
+    def handle(self, *args, **options):
+        filas = reconstruir_estadisticas()
+        self.stdout.write(self.style.SUCCESS(f'EstadisticaDiaria reconstruida: {filas} filas.'))
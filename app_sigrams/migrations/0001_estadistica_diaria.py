@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def cargar_estadisticas(apps, schema_editor):
+    MarcaSenal = apps.get_model('app_registros', 'MarcaSenal')
+    Solicitud = apps.get_model('app_registros', 'Solicitud')
+    EstadisticaDiaria = apps.get_model('app_sigrams', 'EstadisticaDiaria')
+    filas = [
+        EstadisticaDiaria(
+            fecha=f['dia'], tabla='marca', estado=f['estado'], tipo_tramite=f['tipo_tramite'],
+            cantidad=f['total'], cantidad_sellado=f['sellado'], valor_sellado=f['valor'] or 0,
+        )
+        for f in MarcaSenal.objects.annotate(dia=TruncDate('fecha_creacion')).order_by()
+        .values('dia', 'estado', 'tipo_tramite')
+        .annotate(total=Count('id'), sellado=Count('valor_sellado'), valor=Sum('valor_sellado'))
+    ]
+    filas += [
+        EstadisticaDiaria(
+            fecha=f['dia'], tabla='solicitud', estado=f['estado'], tipo_tramite=f['tipo_tramite'],
+            prioridad=f['prioridad'] or '', cantidad=f['total'],
+        )
+        for f in Solicitud.objects.annotate(dia=TruncDate('fecha_solicitud')).order_by()
+        .values('dia', 'estado', 'tipo_tramite', 'prioridad').annotate(total=Count('id'))
+    ]
+    EstadisticaDiaria.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('app_registros', '0016_contadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tabla', models.CharField(choices=[('marca', 'Marca y señal'), ('solicitud', 'Solicitud')], max_length=10)),
+                ('estado', models.CharField(max_length=20)),
+                ('tipo_tramite', models.CharField(max_length=20)),
+                ('prioridad', models.CharField(blank=True, default='', max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('cantidad_sellado', models.IntegerField(default=0)),
+                ('valor_sellado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Estadística diaria',
+                'verbose_name_plural': 'Estadísticas diarias',
+                'ordering': ['fecha'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tabla', 'estado', 'tipo_tramite', 'prioridad'), name='estadistica_diaria_unica')],
+            },
+        ),
+        migrations.RunPython(cargar_estadisticas, migrations.RunPython.noop),
+    ]
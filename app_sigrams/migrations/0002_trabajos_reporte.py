@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_sigrams', '0001_estadistica_diaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reporte', models.CharField(max_length=50)),
+                ('formato', models.CharField(max_length=10)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('clave', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('archivo', models.FileField(blank=True, upload_to='reportes/')),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_reporte', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de reporte',
+                'verbose_name_plural': 'Trabajos de reporte',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['clave', 'estado', 'fecha_fin'], name='trabajo_reporte_clave_idx'), models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_reporte_estado_idx')],
+            },
+        ),
+    ]
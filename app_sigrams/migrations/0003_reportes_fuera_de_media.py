@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:31
+
+import app_sigrams.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_sigrams', '0002_trabajos_reporte'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='archivo',
+            field=models.FileField(blank=True, storage=app_sigrams.models.AlmacenamientoReportes(), upload_to=''),
+        ),
+    ]
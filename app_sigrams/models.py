@@ -1,3 +1,107 @@
+import os
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 
 # Create your models here.
+
+
+# ----------------------------------------
+# ESTADÍSTICAS PRE-AGREGADAS
+# ----------------------------------------
+class EstadisticaDiaria(models.Model):
+    """
+    Cantidad de marcas y solicitudes por día, estado, tipo de trámite y
+    prioridad, con la suma de ``valor_sellado``. Las señales la mantienen al
+    día (ver app_sigrams.estadisticas); ``reconstruir_estadisticas`` la rearma.
+    """
+    TABLA_CHOICES = [
+        ('marca', 'Marca y señal'),
+        ('solicitud', 'Solicitud'),
+    ]
+
+    fecha = models.DateField()
+    tabla = models.CharField(max_length=10, choices=TABLA_CHOICES)
+    estado = models.CharField(max_length=20)
+    tipo_tramite = models.CharField(max_length=20)
+    prioridad = models.CharField(max_length=20, blank=True, default='')
+    cantidad = models.IntegerField(default=0)
+    # Marcas con valor_sellado cargado y su suma (ingresos)
+    cantidad_sellado = models.IntegerField(default=0)
+    valor_sellado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Estadística diaria"
+        verbose_name_plural = "Estadísticas diarias"
+        ordering = ['fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'tabla', 'estado', 'tipo_tramite', 'prioridad'],
+                name='estadistica_diaria_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.tabla} {self.estado}/{self.tipo_tramite}: {self.cantidad}"
+
+
+# ----------------------------------------
+# REPORTES EN SEGUNDO PLANO
+# ----------------------------------------
+class AlmacenamientoReportes(FileSystemStorage):
+    """
+    Archivos de los reportes en REPORTES_ROOT, fuera de MEDIA_ROOT: tienen
+    DNI, CUIT y datos de contacto, así que no tienen URL pública y solo se
+    entregan con la vista descargar_reporte, que verifica el dueño.
+    """
+
+    @property
+    def base_location(self):
+        return settings.REPORTES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError('Los reportes no tienen URL pública: usar descargar_reporte.')
+
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte pedido por un usuario que se genera fuera del request (ver
+    app_sigrams.trabajos). ``clave`` identifica el reporte y sus parámetros:
+    los pedidos iguales dentro de REPORTES_VIGENCIA_MINUTOS usan el mismo archivo.
+    """
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('PROCESANDO', 'Procesando'),
+        ('LISTO', 'Listo'),
+        ('ERROR', 'Error'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trabajos_reporte')
+    reporte = models.CharField(max_length=50)
+    formato = models.CharField(max_length=10)
+    parametros = models.JSONField(default=dict, blank=True)
+    clave = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='PENDIENTE')
+    archivo = models.FileField(storage=AlmacenamientoReportes(), blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Trabajo de reporte"
+        verbose_name_plural = "Trabajos de reporte"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['clave', 'estado', 'fecha_fin'], name='trabajo_reporte_clave_idx'),
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_reporte_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.reporte}.{self.formato} ({self.get_estado_display()})"
@@ -0,0 +1,148 @@
+"""
+paginacion.py
+-------------
+Paginación por clave (keyset) para los listados largos.
+
+En lugar de ``OFFSET n`` cada página pide las filas que vienen después de
+la última mostrada según un orden único (p. ej. apellido, nombre, id), así
+que la página 500 cuesta lo mismo que la primera y no hace falta COUNT(*).
+El cursor que viaja en la URL es opaco y va firmado.
+"""
+
+import datetime
+import json
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+SALT_CURSOR = 'app_sigrams.paginacion'
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder recorta las fechas a milisegundos; el cursor necesita
+    # el valor exacto o se saltean/repiten filas.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class PaginaKeyset:
+    """Una página de resultados. Se itera como una lista."""
+
+    def __init__(self, object_list, cursor_siguiente, cursor_anterior):
+        self.object_list = object_list
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+
+    @property
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pagina ``queryset`` por los campos (o anotaciones) de ``orden`` (con
+    ``-`` para descendente), que deben identificar una fila de forma única y
+    no ser nulos; normalmente el último es ``id``.
+
+        pagina = KeysetPaginator(qs, ('apellido', 'nombre', 'id'), 20).pagina(cursor)
+    """
+
+    def __init__(self, queryset, orden, por_pagina=20):
+        self.queryset = queryset
+        self.orden = [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+        self.por_pagina = por_pagina
+        self._campos = {f.name: f for f in queryset.model._meta.concrete_fields}
+
+    # ─── Cursores ───
+
+    def _clave(self, obj):
+        return [getattr(obj, campo) for campo, _ in self.orden]
+
+    def _cursor(self, obj, direccion):
+        valores = json.dumps(self._clave(obj), cls=_CursorEncoder)
+        return signing.dumps({'v': valores, 'd': direccion}, salt=SALT_CURSOR, compress=True)
+
+    def _a_python(self, campo, valor):
+        # Las anotaciones (p. ej. un rango de búsqueda) van tal cual
+        return self._campos[campo].to_python(valor) if campo in self._campos else valor
+
+    def _leer_cursor(self, cursor):
+        """``(valores, direccion)`` del cursor, o None si no es válido."""
+        if not cursor:
+            return None
+        try:
+            datos = signing.loads(cursor, salt=SALT_CURSOR)
+            valores = json.loads(datos['v'])
+            if len(valores) != len(self.orden) or datos['d'] not in ('s', 'a'):
+                return None
+            valores = [self._a_python(campo, v) for (campo, _), v in zip(self.orden, valores)]
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            return None
+        return valores, datos['d']
+
+    # ─── Consultas ───
+
+    def _despues_de(self, valores, invertir):
+        """Q de las filas que van después de ``valores`` (antes, si ``invertir``)."""
+        condicion = Q()
+        iguales = Q()
+        for (campo, descendente), valor in zip(self.orden, valores):
+            hacia_abajo = descendente != invertir
+            condicion |= iguales & Q(**{f'{campo}__{"lt" if hacia_abajo else "gt"}': valor})
+            iguales &= Q(**{campo: valor})
+        if len(self.orden) > 1:
+            # Cota redundante sobre el primer campo: con solo el OR el planner
+            # no puede usar el índice como rango y recorre desde el principio.
+            (campo, descendente), valor = self.orden[0], valores[0]
+            condicion &= Q(**{f'{campo}__{"lte" if descendente != invertir else "gte"}': valor})
+        return condicion
+
+    def _ordenar(self, queryset, invertir):
+        return queryset.order_by(*[
+            f'{"-" if descendente != invertir else ""}{campo}' for campo, descendente in self.orden
+        ])
+
+    def pagina(self, cursor=None):
+        """Página que indica ``cursor`` (la primera si no hay cursor o no es válido)."""
+        leido = self._leer_cursor(cursor)
+        n = self.por_pagina
+        if leido is None:
+            filas = list(self._ordenar(self.queryset, False)[:n + 1])
+            hay_siguiente, hay_anterior = len(filas) > n, False
+            filas = filas[:n]
+        elif leido[1] == 's':
+            qs = self.queryset.filter(self._despues_de(leido[0], False))
+            filas = list(self._ordenar(qs, False)[:n + 1])
+            hay_siguiente, hay_anterior = len(filas) > n, True
+            filas = filas[:n]
+        else:
+            qs = self.queryset.filter(self._despues_de(leido[0], True))
+            filas = list(self._ordenar(qs, True)[:n + 1])
+            hay_siguiente, hay_anterior = True, len(filas) > n
+            filas = filas[:n][::-1]
+
+        if not filas:
+            # Se borraron las filas alrededor del cursor: se vuelve al principio
+            return self.pagina() if leido else PaginaKeyset([], None, None)
+        return PaginaKeyset(
+            filas,
+            self._cursor(filas[-1], 's') if hay_siguiente else None,
+            self._cursor(filas[0], 'a') if hay_anterior else None,
+        )
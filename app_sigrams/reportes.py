@@ -0,0 +1,246 @@
+"""
+reportes.py
+-----------
+Registro de reportes declarativos.
+
+Un Reporte es una lista de Columnas (ruta del campo, título y formato
+opcional) sobre un modelo, con el filtro del listado y el orden. Las
+columnas se compilan en un único ``values_list()`` leído con un cursor del
+servidor; los campos con choices se traducen con diccionarios armados una
+sola vez. El mismo reporte se escribe en PDF, Excel o CSV sin depender del
+request, así puede correr en los workers de app_sigrams.trabajos.
+"""
+
+from django.contrib.auth.models import User
+from reportlab.lib.pagesizes import A4, landscape, letter
+
+from app_registros.models import MarcaSenal, Productor, Solicitud, UserProfile
+from app_sigrams.exportar import (
+    escribir_pdf, escribir_xlsx, etiquetas, filas_de, lineas_csv, respuesta_pdf,
+    respuesta_streaming, respuesta_xlsx,
+)
+from app_sigrams.filtros import filtrar_ingresos, filtrar_marcas, filtrar_productores, filtrar_solicitudes
+
+FORMATOS = {
+    'pdf': 'PDF',
+    'xlsx': 'Excel',
+    'csv': 'CSV',
+}
+
+
+# ─── Formatos de columna ───
+
+def fecha(valor):
+    return valor.strftime('%d/%m/%Y') if valor else ''
+
+
+def fecha_hora(valor):
+    return valor.strftime('%d/%m/%Y %H:%M') if valor else ''
+
+
+def nombre_completo(apellido, nombre):
+    return f"{apellido}, {nombre}"
+
+
+def suma(*valores):
+    return sum(v or 0 for v in valores)
+
+
+def importe(valor):
+    return float(valor) if valor else 0
+
+
+class Columna:
+    """
+    Columna de un reporte. ``campo`` es una ruta de ``values_list`` o una
+    tupla de rutas; con varias, ``formato`` recibe un valor por ruta. Sin
+    ``formato``, los campos con choices muestran su etiqueta.
+    """
+
+    def __init__(self, campo, titulo, formato=None):
+        self.campos = (campo,) if isinstance(campo, str) else tuple(campo)
+        self.titulo = titulo
+        self.formato = formato
+
+
+def _campo_del_modelo(modelo, ruta):
+    *relaciones, nombre = ruta.split('__')
+    for relacion in relaciones:
+        modelo = modelo._meta.get_field(relacion).related_model
+    return modelo._meta.get_field(nombre)
+
+
+def _con_etiquetas(opciones):
+    return lambda valor: opciones.get(valor, valor)
+
+
+class Reporte:
+    """
+    ``columnas`` de ``modelo``, filtradas con ``filtro(queryset, parametros)``
+    y ordenadas por ``orden``. ``parametros`` son los nombres GET que usa el
+    filtro: los demás no cambian el archivo.
+    """
+
+    def __init__(self, nombre, titulo, hoja, modelo, columnas, orden, filtro=None, parametros=(),
+                 pagesize=landscape(A4)):
+        self.nombre = nombre
+        self.titulo = titulo
+        self.hoja = hoja
+        self.modelo = modelo
+        self.columnas = columnas
+        self.orden = orden
+        self.filtro = filtro
+        self.parametros = parametros
+        self.pagesize = pagesize
+        self._compiladas = None
+
+    @property
+    def encabezados(self):
+        return [columna.titulo for columna in self.columnas]
+
+    def queryset(self, parametros):
+        queryset = self.modelo.objects.all()
+        if self.filtro:
+            queryset = self.filtro(queryset, parametros)
+        return queryset.order_by(*self.orden)
+
+    def _compilar(self):
+        """Rutas únicas para ``values_list`` y, por columna, sus posiciones y su formato."""
+        if self._compiladas is None:
+            rutas = []
+            columnas = []
+            for columna in self.columnas:
+                for ruta in columna.campos:
+                    if ruta not in rutas:
+                        rutas.append(ruta)
+                posiciones = [rutas.index(ruta) for ruta in columna.campos]
+                formato = columna.formato
+                if formato is None and len(posiciones) == 1:
+                    campo = _campo_del_modelo(self.modelo, columna.campos[0])
+                    if campo.choices:
+                        formato = _con_etiquetas(dict(campo.flatchoices))
+                columnas.append((posiciones, formato))
+            self._compiladas = rutas, columnas
+        return self._compiladas
+
+    def filas(self, parametros):
+        """Tuplas ya formateadas, leídas por lotes."""
+        rutas, columnas = self._compilar()
+        for fila in filas_de(self.queryset(parametros), *rutas):
+            yield tuple(
+                formato(*[fila[i] for i in posiciones]) if formato else fila[posiciones[0]]
+                for posiciones, formato in columnas
+            )
+
+    def escribir(self, destino, formato, parametros):
+        """Escribe el reporte en ``destino`` (archivo binario abierto o ruta, salvo CSV)."""
+        filas = self.filas(parametros)
+        if formato == 'pdf':
+            escribir_pdf(destino, self.titulo, self.encabezados, filas, pagesize=self.pagesize)
+        elif formato == 'xlsx':
+            escribir_xlsx(destino, self.hoja, self.encabezados, filas)
+        elif formato == 'csv':
+            for linea in lineas_csv(self.encabezados, filas):
+                destino.write(linea)
+        else:
+            raise ValueError(f'Formato inexistente: {formato}')
+
+    def respuesta(self, formato, parametros):
+        """El reporte generado dentro del request (para los que siempre son chicos)."""
+        filas = self.filas(parametros)
+        if formato == 'pdf':
+            return respuesta_pdf(
+                f'{self.nombre}.pdf', self.titulo, self.encabezados, filas, pagesize=self.pagesize,
+            )
+        if formato == 'xlsx':
+            return respuesta_xlsx(f'{self.nombre}.xlsx', self.hoja, self.encabezados, filas)
+        if formato == 'csv':
+            return respuesta_streaming(self.nombre, 'csv', self.encabezados, filas)
+        raise ValueError(f'Formato inexistente: {formato}')
+
+
+# ─── Registro ───
+
+REPORTES = {}
+
+
+def registrar(reporte):
+    REPORTES[reporte.nombre] = reporte
+    return reporte
+
+
+registrar(Reporte(
+    'productores', "Reporte de Productores", "Productores", Productor,
+    [
+        Columna('apellido', 'Apellido'),
+        Columna('nombre', 'Nombre'),
+        Columna('dni', 'DNI'),
+        Columna('cuit', 'CUIT'),
+        Columna('localidad', 'Localidad'),
+        Columna('departamento', 'Departamento'),
+        Columna('estado', 'Estado'),
+        Columna('fecha_registro', 'Fecha Registro', fecha),
+    ],
+    orden=('apellido', 'nombre', 'id'),
+    filtro=filtrar_productores,
+    parametros=('estado', 'localidad', 'departamento', 'q'),
+    pagesize=landscape(letter),
+))
+
+registrar(Reporte(
+    'marcas', "Reporte de Marcas y Señales", "Marcas", MarcaSenal,
+    [
+        Columna('numero_orden', 'N° Orden'),
+        Columna(('productor__apellido', 'productor__nombre'), 'Productor', nombre_completo),
+        Columna('tipo_tramite', 'Tipo Trámite'),
+        Columna('estado', 'Estado'),
+        Columna('fecha_inscripcion', 'Fecha Inscripción', fecha),
+        Columna(('vacuno', 'caballar', 'mular', 'asnal', 'ovino', 'cabrio'), 'Total Ganado', suma),
+    ],
+    orden=('-fecha_inscripcion', '-id'),
+    filtro=filtrar_marcas,
+    parametros=('estado', 'tipo_tramite', 'q'),
+))
+
+registrar(Reporte(
+    'solicitudes', "Reporte de Solicitudes", "Solicitudes", Solicitud,
+    [
+        Columna('id', 'ID'),
+        Columna(('productor__apellido', 'productor__nombre'), 'Productor', nombre_completo),
+        Columna('tipo_tramite', 'Tipo Trámite'),
+        Columna('estado', 'Estado'),
+        Columna('prioridad', 'Prioridad'),
+        Columna('fecha_solicitud', 'Fecha Solicitud', fecha),
+    ],
+    orden=('-fecha_solicitud', '-id'),
+    filtro=filtrar_solicitudes,
+    parametros=('estado', 'tipo_tramite', 'prioridad', 'productor', 'fecha_inicio', 'fecha_fin'),
+))
+
+registrar(Reporte(
+    'ingresos', "Reporte de Ingresos", "Ingresos", MarcaSenal,
+    [
+        Columna('fecha_creacion', 'Fecha', fecha_hora),
+        Columna('numero_orden', 'N° Orden'),
+        Columna(('productor__apellido', 'productor__nombre'), 'Productor', nombre_completo),
+        Columna('tipo_tramite', 'Tipo Trámite'),
+        Columna('valor_sellado', 'Valor', importe),
+    ],
+    orden=('-fecha_creacion', '-id'),
+    filtro=filtrar_ingresos,
+    parametros=('año', 'mes'),
+))
+
+registrar(Reporte(
+    'usuarios', "Reporte de Usuarios", "Usuarios", User,
+    [
+        Columna('username', 'Usuario'),
+        Columna('email', 'Email'),
+        Columna('userprofile__rol', 'Rol', lambda rol, roles=etiquetas(UserProfile, 'rol'): (
+            roles.get(rol, rol) if rol else 'Sin perfil'
+        )),
+        Columna('date_joined', 'Fecha registro', fecha),
+        Columna('last_login', 'Último acceso', fecha_hora),
+    ],
+    orden=('username',),
+))
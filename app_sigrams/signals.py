@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from app_registros.models import Campo, MarcaSenal, Productor, Solicitud
+from app_sigrams import estadisticas
+
+
+def _toca_estadistica(sender, update_fields):
+    campos = estadisticas.CAMPOS_ESTADISTICA[sender]
+    return update_fields is None or not set(update_fields).isdisjoint(campos)
+
+
+# EstadisticaDiaria se mantiene solo desde estas señales: las operaciones
+# masivas (QuerySet.update, bulk_create, bulk_update) no pasan por acá y
+# requieren correr reconstruir_estadisticas después.
+
+@receiver(pre_save, sender=MarcaSenal)
+@receiver(pre_save, sender=Solicitud)
+def recordar_estadistica_anterior(sender, instance, update_fields=None, **kwargs):
+    """Guarda la clave con que la fila sumaba antes del cambio."""
+    instance._estadistica_anterior = None
+    if instance._state.adding or not instance.pk or not _toca_estadistica(sender, update_fields):
+        return
+    anterior = (
+        sender.objects.filter(pk=instance.pk)
+        .only(*estadisticas.CAMPOS_ESTADISTICA[sender]).first()
+    )
+    if anterior is not None:
+        instance._estadistica_anterior = estadisticas.clave_estadistica(anterior)
+
+
+@receiver(post_save, sender=MarcaSenal)
+@receiver(post_save, sender=Solicitud)
+def actualizar_estadistica(sender, instance, created, update_fields=None, **kwargs):
+    """Mantiene EstadisticaDiaria al día sin volver a agregar el historial."""
+    if not created and not _toca_estadistica(sender, update_fields):
+        return
+    anterior = getattr(instance, '_estadistica_anterior', None)
+    nueva = estadisticas.clave_estadistica(instance)
+    if anterior != nueva:
+        estadisticas.sumar_estadistica(anterior, -1)
+        estadisticas.sumar_estadistica(nueva, 1)
+    instance._estadistica_anterior = None
+
+
+@receiver(post_delete, sender=MarcaSenal)
+@receiver(post_delete, sender=Solicitud)
+def quitar_estadistica(sender, instance, **kwargs):
+    estadisticas.sumar_estadistica(estadisticas.clave_estadistica(instance), -1)
+
+
+@receiver(post_save, sender=Productor)
+@receiver(post_save, sender=Campo)
+@receiver(post_save, sender=MarcaSenal)
+@receiver(post_save, sender=Solicitud)
+@receiver(post_delete, sender=Productor)
+@receiver(post_delete, sender=Campo)
+@receiver(post_delete, sender=MarcaSenal)
+@receiver(post_delete, sender=Solicitud)
+def invalidar_dashboards(sender, **kwargs):
+    """Los dashboards cacheados se vuelven a armar en la próxima visita."""
+    estadisticas.invalidar_dashboards()
@@ -1,3 +1,439 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from app_registros.models import Campo, MarcaSenal, Productor, Solicitud, UserProfile
+from app_registros.busqueda import ORDEN_RANGO, buscar_productores
+from app_sigrams.exportar import ESTILO_TABLA_PDF, FILAS_POR_TABLA, _tablas, escribir_pdf
+from app_sigrams.estadisticas import MESES_ACTIVIDAD, estadisticas_home, reconstruir_estadisticas
+from app_notificaciones.models import Notificacion
+from app_sigrams.models import EstadisticaDiaria, TrabajoReporte
+from app_sigrams.paginacion import KeysetPaginator
+from app_sigrams.reportes import REPORTES, Columna, Reporte
+from app_sigrams.trabajos import limpiar_vencidos, procesar
+
+CONSULTAS_HOME = 14
+
+
+class EstadisticasHomeTests(TestCase):
+    """El dashboard se arma con una cantidad fija de consultas."""
+
+    def setUp(self):
+        # La versión vuelve atrás con el rollback de cada test; la caché no
+        cache.clear()
+        for i in range(3):
+            productor = Productor.objects.create(
+                nombre='Juan', apellido='Perez', dni=f'1234567{i}',
+                estado='REGISTRADO' if i else 'PENDIENTE',
+            )
+            campo = Campo.objects.create(
+                nombre=f'Campo {i}', productor=productor, distrito='Centro', departamento='Capital',
+            )
+            MarcaSenal.objects.create(
+                productor=productor, campo=campo, descripcion_marca='Marca', vacuno=5,
+                estado='VIGENTE' if i else 'VENCIDA', valor_sellado=Decimal('1000.00'),
+            )
+            Solicitud.objects.create(
+                productor=productor, tipo_tramite='NUEVO',
+                estado='PENDIENTE' if i else 'APROBADO',
+            )
+
+    def test_estadisticas_en_cinco_consultas(self):
+        with self.assertNumQueries(5):
+            datos = estadisticas_home()
+        self.assertEqual(datos['total_productores'], 3)
+        self.assertEqual(datos['total_marcas'], 2)
+        self.assertEqual(datos['solicitudes_pendientes'], 2)
+        self.assertEqual(datos['total_campos'], 3)
+        self.assertEqual(datos['tramites_mes'], 3)
+        self.assertEqual(datos['ingresos_mes'], Decimal('3000.00'))
+        self.assertEqual(len(datos['meses_actividad']), MESES_ACTIVIDAD)
+        actual = datos['meses_actividad'][-1]
+        self.assertEqual(actual['mes'], timezone.localdate().strftime('%Y-%m'))
+        self.assertEqual((actual['solicitudes'], actual['marcas'], actual['ingresos']), (3, 3, 3000.0))
+
+    def test_home_presupuesto_de_consultas(self):
+        self.client.force_login(User.objects.create_user('empleado', password='x'))
+        url = reverse('home')
+        # Sesión, usuario, perfil y versión, 5 de estadísticas y 5 listados
+        with self.assertNumQueries(CONSULTAS_HOME):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Con el contexto en caché quedan sesión, usuario, perfil y versión
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_tarjetas_de_solicitudes(self):
+        self.client.force_login(User.objects.create_user('empleado', password='x'))
+        respuesta = self.client.get(reverse('lista_solicitudes'))
+        self.assertEqual(respuesta.context['total_solicitudes'], 3)
+        self.assertEqual(respuesta.context['solicitudes_pendientes'], 2)
+        self.assertEqual(respuesta.context['solicitudes_en_revision'], 0)
+
+    def test_cache_se_invalida_al_guardar(self):
+        self.client.force_login(User.objects.create_user('empleado', password='x'))
+        url = reverse('home')
+        self.assertEqual(self.client.get(url).context['total_productores'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        self.assertEqual(self.client.get(url).context['total_productores'], 4)
+
+
+class EstadisticaDiariaTests(TestCase):
+    """Las señales dejan EstadisticaDiaria igual que reconstruirla desde cero."""
+
+    def filas(self):
+        return sorted(EstadisticaDiaria.objects.filter(cantidad__gt=0).values_list(
+            'fecha', 'tabla', 'estado', 'tipo_tramite', 'prioridad',
+            'cantidad', 'cantidad_sellado', 'valor_sellado',
+        ))
+
+    def test_altas_cambios_y_bajas(self):
+        productor = Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        campo = Campo.objects.create(
+            nombre='El Alto', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        marcas = [
+            MarcaSenal.objects.create(
+                productor=productor, campo=campo, descripcion_marca='Marca', vacuno=1,
+                valor_sellado=Decimal('500.00') if i else None,
+            )
+            for i in range(3)
+        ]
+        solicitud = Solicitud.objects.create(productor=productor, tipo_tramite='NUEVO')
+
+        marcas[0].estado = 'VENCIDA'
+        marcas[0].save(update_fields=['estado'])
+        marcas[1].valor_sellado = Decimal('750.00')
+        marcas[1].save()
+        marcas[2].delete()
+        solicitud.estado = 'APROBADO'
+        solicitud.prioridad = 'ALTA'
+        solicitud.save()
+
+        incremental = self.filas()
+        reconstruir_estadisticas()
+        self.assertEqual(incremental, self.filas())
+        self.assertEqual(
+            sum(f[5] for f in incremental if f[1] == 'marca'), MarcaSenal.objects.count(),
+        )
+
+    def test_operacion_masiva_requiere_reconstruir(self):
+        productor = Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        campo = Campo.objects.create(
+            nombre='El Alto', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        for _ in range(2):
+            MarcaSenal.objects.create(
+                productor=productor, campo=campo, descripcion_marca='Marca', vacuno=1,
+                valor_sellado=Decimal('500.00'),
+            )
+        antes = self.filas()
+
+        # QuerySet.update no dispara señales: la tabla queda desfasada...
+        MarcaSenal.objects.update(valor_sellado=Decimal('800.00'))
+        self.assertEqual(self.filas(), antes)
+
+        # ...hasta correr el comando
+        call_command('reconstruir_estadisticas', stdout=io.StringIO())
+        self.assertEqual(sum(f[7] for f in self.filas()), Decimal('1600.00'))
+
+
+class KeysetPaginatorTests(TestCase):
+    """Ir y volver por las páginas recorre todas las filas una sola vez."""
+
+    def setUp(self):
+        # Apellidos repetidos para que el desempate por id importe
+        for i in range(23):
+            Productor.objects.create(nombre=f'N{i % 4}', apellido=f'A{i % 3}', dni=f'3000{i:04d}')
+
+    def test_avanzar_y_retroceder(self):
+        paginador = KeysetPaginator(Productor.objects.all(), ('apellido', 'nombre', 'id'), 5)
+        esperado = list(Productor.objects.order_by('apellido', 'nombre', 'id').values_list('id', flat=True))
+
+        paginas = [paginador.pagina()]
+        while paginas[-1].has_next:
+            paginas.append(paginador.pagina(paginas[-1].cursor_siguiente))
+        self.assertEqual([p.pk for pagina in paginas for p in pagina], esperado)
+        self.assertFalse(paginas[0].has_previous)
+
+        for i in range(len(paginas) - 1, 0, -1):
+            anterior = paginador.pagina(paginas[i].cursor_anterior)
+            self.assertEqual([p.pk for p in anterior], [p.pk for p in paginas[i - 1]])
+
+    def test_cursor_con_fecha_y_hora(self):
+        # Las fechas viajan con microsegundos: ninguna solicitud se pierde
+        for productor in Productor.objects.all():
+            Solicitud.objects.create(productor=productor, tipo_tramite='NUEVO')
+        paginador = KeysetPaginator(Solicitud.objects.all(), ('-fecha_solicitud', '-id'), 5)
+        vistas, pagina = [], paginador.pagina()
+        while True:
+            vistas += [s.pk for s in pagina]
+            if not pagina.has_next:
+                break
+            pagina = paginador.pagina(pagina.cursor_siguiente)
+        self.assertEqual(
+            vistas, list(Solicitud.objects.order_by('-fecha_solicitud', '-id').values_list('id', flat=True)),
+        )
+
+    def test_busqueda_con_rangos_empatados(self):
+        # Mismo apellido: muchos rangos iguales entre los que desempatan nombre e id
+        for i in range(12):
+            Productor.objects.create(nombre=f'Luis{i % 2}', apellido='Gomez', dni=f'4100{i:04d}')
+        Productor.objects.create(nombre='Ana', apellido='Gomes Paz', dni='41009999')
+        qs = buscar_productores(Productor.objects.all(), 'gomez')
+        paginador = KeysetPaginator(qs, ORDEN_RANGO, 5)
+
+        vistas, pagina = [], paginador.pagina()
+        while True:
+            vistas += [p.pk for p in pagina]
+            if not pagina.has_next:
+                break
+            pagina = paginador.pagina(pagina.cursor_siguiente)
+        self.assertEqual(len(vistas), len(set(vistas)))
+        self.assertEqual(sorted(vistas), sorted(qs.values_list('pk', flat=True)))
+
+    def test_cursor_invalido_vuelve_al_principio(self):
+        paginador = KeysetPaginator(Productor.objects.all(), ('apellido', 'nombre', 'id'), 5)
+        self.assertEqual(
+            [p.pk for p in paginador.pagina('basura')], [p.pk for p in paginador.pagina()],
+        )
+
+
+class MediaTemporalMixin:
+    """MEDIA_ROOT y REPORTES_ROOT en directorios temporales y reportes generados en el request."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media = tempfile.mkdtemp()
+        cls.reportes = tempfile.mkdtemp()
+        cls.override = override_settings(
+            MEDIA_ROOT=cls.media, REPORTES_ROOT=cls.reportes, REPORTES_WORKERS=0,
+        )
+        cls.override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.override.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        shutil.rmtree(cls.reportes, ignore_errors=True)
+        super().tearDownClass()
+
+    def descargar(self, url, datos=None):
+        """Pide el reporte, lo genera al confirmar y devuelve el archivo."""
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.get(url, datos)
+        self.assertEqual(respuesta.status_code, 302)
+        estado = self.client.get(respuesta['Location'], {'json': 1}).json()
+        self.assertEqual(estado['estado'], 'LISTO')
+        return b''.join(self.client.get(estado['url']).streaming_content)
+
+
+class ExportacionExcelTests(MediaTemporalMixin, TestCase):
+    """Los Excel se escriben en modo write_only con los mismos datos de siempre."""
+
+    def test_marcas_excel(self):
+        productor = Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        campo = Campo.objects.create(
+            nombre='El Alto', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        MarcaSenal.objects.create(
+            productor=productor, campo=campo, descripcion_marca='Marca', vacuno=2, ovino=3,
+        )
+        self.client.force_login(User.objects.create_user('empleado', password='x'))
+
+        contenido = self.descargar(reverse('reporte_marcas_excel'))
+        hoja = load_workbook(io.BytesIO(contenido)).active
+        filas = list(hoja.iter_rows(values_only=True))
+        self.assertEqual(filas[0][:2], ('N° Orden', 'Productor'))
+        self.assertEqual(filas[1][1:4], ('Gomez, Ana', 'Marca nueva', 'En trámite'))
+        self.assertEqual(filas[1][5], 5)
+        self.assertGreaterEqual(hoja.column_dimensions['E'].width, len('Fecha Inscripción'))
+
+
+class ExportacionStreamingTests(TestCase):
+    """CSV y NDJSON con los filtros del listado, opcionalmente comprimidos."""
+
+    def setUp(self):
+        Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789', estado='REGISTRADO')
+        Productor.objects.create(nombre='Luis', apellido='Perez', dni='34567890')
+        self.client.force_login(User.objects.create_user('empleado', password='x'))
+
+    def _contenido(self, respuesta):
+        return b''.join(respuesta.streaming_content)
+
+    def test_csv_filtrado(self):
+        url = reverse('exportar_tabla', args=['productores', 'csv'])
+        respuesta = self.client.get(url, {'estado': 'REGISTRADO'})
+        filas = list(csv.reader(io.StringIO(self._contenido(respuesta).decode())))
+        self.assertEqual(filas[0][:3], ['id', 'apellido', 'nombre'])
+        self.assertEqual([f[1] for f in filas[1:]], ['Gomez'])
+
+    def test_ndjson_comprimido(self):
+        url = reverse('exportar_tabla', args=['productores', 'ndjson'])
+        respuesta = self.client.get(url, {'gzip': '1'})
+        self.assertEqual(respuesta['Content-Type'], 'application/gzip')
+        self.assertIn('productores.ndjson.gz', respuesta['Content-Disposition'])
+        lineas = gzip.decompress(self._contenido(respuesta)).decode().splitlines()
+        self.assertEqual([json.loads(l)['apellido'] for l in lineas], ['Gomez', 'Perez'])
+
+    def test_historial_solo_administradores(self):
+        respuesta = self.client.get(reverse('exportar_tabla', args=['cambios', 'csv']))
+        self.assertRedirects(respuesta, reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get('/exportar/otra/csv/').status_code, 404)
+
+
+class PdfPorPartesTests(TestCase):
+    """Los PDF se arman en tablas de tamaño fijo que comparten el estilo."""
+
+    def test_tablas_de_tamano_fijo(self):
+        filas = ((i, f'Fila {i}') for i in range(FILAS_POR_TABLA * 2 + 5))
+        tablas = list(_tablas(['N°', 'Texto'], filas, [50, 100], ESTILO_TABLA_PDF))
+        self.assertEqual([len(t._cellvalues) for t in tablas], [FILAS_POR_TABLA + 1] * 2 + [6])
+        self.assertTrue(all(t.repeatRows == 1 for t in tablas))
+        self.assertEqual(tablas[-1]._cellvalues[-1], ['404', 'Fila 404'])
+
+    def test_pdf_sin_limite_de_filas(self):
+        destino = io.BytesIO()
+        consumidas = []
+        filas = (consumidas.append(i) or (i, None, 'texto') for i in range(1200))
+        escribir_pdf(destino, 'Prueba', ['N°', 'Vacío', 'Texto'], filas)
+        self.assertEqual(len(consumidas), 1200)
+        self.assertTrue(destino.getvalue().startswith(b'%PDF'))
+        self.assertGreater(destino.getvalue().count(b'/Type /Page\n'), 10)
+
+
+class TrabajosReporteTests(MediaTemporalMixin, TestCase):
+    """Reportes en segundo plano: notificación, reutilización y limpieza."""
+
+    def setUp(self):
+        Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789', estado='REGISTRADO')
+        Productor.objects.create(nombre='Luis', apellido='Perez', dni='34567890')
+        self.usuario = User.objects.create_user('empleado', password='x')
+        self.client.force_login(self.usuario)
+
+    def test_genera_filtrado_y_notifica(self):
+        contenido = self.descargar(reverse('reporte_productores_excel'), {'estado': 'REGISTRADO'})
+        filas = list(load_workbook(io.BytesIO(contenido)).active.iter_rows(values_only=True))
+        self.assertEqual([f[0] for f in filas[1:]], ['Gomez'])
+
+        trabajo = TrabajoReporte.objects.get()
+        self.assertEqual(trabajo.parametros, {'estado': 'REGISTRADO'})
+        # Fuera de MEDIA_ROOT y con un nombre que no se puede adivinar
+        self.assertRegex(trabajo.archivo.name, r'^[0-9a-f]{32}\.xlsx$')
+        self.assertTrue(os.path.isfile(os.path.join(self.reportes, trabajo.archivo.name)))
+        self.assertEqual(os.listdir(self.media), [])
+        notificacion = Notificacion.objects.get(usuario=self.usuario)
+        self.assertEqual(notificacion.tipo, 'exito')
+        self.assertEqual(notificacion.url, reverse('estado_reporte', args=[trabajo.pk]))
+
+    def test_pedido_igual_reutiliza_el_archivo(self):
+        url = reverse('reporte_productores_pdf')
+        self.descargar(url)
+        otro = User.objects.create_user('otro', password='x')
+        self.client.force_login(otro)
+        with self.captureOnCommitCallbacks() as encolados:
+            self.client.get(url)
+        self.assertEqual(encolados, [])
+        primero, segundo = TrabajoReporte.objects.order_by('pk')
+        self.assertEqual(segundo.usuario, otro)
+        self.assertEqual(segundo.estado, 'LISTO')
+        self.assertEqual(segundo.archivo.name, primero.archivo.name)
+
+        # Con otros parámetros se genera uno nuevo
+        with self.captureOnCommitCallbacks() as encolados:
+            self.client.get(url, {'estado': 'PENDIENTE'})
+        self.assertEqual(len(encolados), 1)
+
+    def test_pendientes_iguales_se_completan_juntos(self):
+        otro = User.objects.create_user('otro', password='x')
+        url = reverse('reporte_marcas_pdf')
+        with self.captureOnCommitCallbacks():
+            self.client.get(url)
+            self.client.force_login(otro)
+            self.client.get(url)
+        primero, segundo = TrabajoReporte.objects.order_by('pk')
+        procesar(primero.pk)
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.estado, 'LISTO')
+        self.assertEqual(segundo.archivo.name, TrabajoReporte.objects.get(pk=primero.pk).archivo.name)
+        self.assertIsNone(procesar(segundo.pk))
+        self.assertEqual(Notificacion.objects.filter(tipo='exito').count(), 2)
+
+    def test_solo_el_dueno_ve_el_trabajo(self):
+        self.descargar(reverse('reporte_solicitudes_excel'))
+        trabajo = TrabajoReporte.objects.get()
+        self.client.force_login(User.objects.create_user('otro', password='x'))
+        self.assertEqual(self.client.get(reverse('descargar_reporte', args=[trabajo.pk])).status_code, 404)
+
+    def test_limpiar_vencidos(self):
+        self.descargar(reverse('reporte_productores_excel'))
+        trabajo = TrabajoReporte.objects.get()
+        almacenamiento = trabajo.archivo.storage
+        TrabajoReporte.objects.update(fecha_creacion=timezone.now() - timedelta(days=10))
+        self.assertEqual(limpiar_vencidos(7), 1)
+        self.assertFalse(almacenamiento.exists(trabajo.archivo.name))
+
+
+class RegistroReportesTests(MediaTemporalMixin, TestCase):
+    """Los reportes declarativos se resuelven con una consulta y se escriben en cualquier formato."""
+
+    def setUp(self):
+        productor = Productor.objects.create(nombre='Ana', apellido='Gomez', dni='23456789')
+        campo = Campo.objects.create(
+            nombre='El Alto', productor=productor, distrito='Centro', departamento='Capital',
+        )
+        for i in range(3):
+            MarcaSenal.objects.create(
+                productor=productor, campo=campo, descripcion_marca=f'Marca {i}', vacuno=i, ovino=1,
+                valor_sellado=Decimal('100.50'),
+            )
+        self.client.force_login(User.objects.create_user('empleado', password='x'))
+
+    def test_una_consulta_con_etiquetas(self):
+        with self.assertNumQueries(1):
+            filas = list(REPORTES['marcas'].filas({}))
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[0][1:4], ('Gomez, Ana', 'Marca nueva', 'En trámite'))
+        self.assertEqual(sorted(f[5] for f in filas), [1, 2, 3])
+
+    def test_rutas_repetidas_se_piden_una_vez(self):
+        reporte = Reporte(
+            'prueba', 'Prueba', 'Prueba', Productor,
+            [Columna('apellido', 'A'), Columna(('apellido', 'dni'), 'B', lambda a, d: f'{a}-{d}')],
+            orden=('id',),
+        )
+        self.assertEqual(reporte._compilar()[0], ['apellido', 'dni'])
+        self.assertEqual(list(reporte.filas({})), [('Gomez', 'Gomez-23456789')])
+
+    def test_ingresos_en_csv(self):
+        año = timezone.localdate().year
+        contenido = self.descargar(reverse('reporte_ingresos'), {'export': 'csv', 'año': año})
+        filas = list(csv.reader(io.StringIO(contenido.decode())))
+        self.assertEqual(filas[0], ['Fecha', 'N° Orden', 'Productor', 'Tipo Trámite', 'Valor'])
+        self.assertEqual([f[4] for f in filas[1:]], ['100.5'] * 3)
+        self.assertEqual(TrabajoReporte.objects.get().parametros, {'año': str(año)})
+
+    def test_usuarios_en_el_request(self):
+        admin = User.objects.create_user('admin', password='x')
+        UserProfile.objects.update_or_create(user=admin, defaults={'rol': 'admin'})
+        self.client.force_login(admin)
+        respuesta = self.client.get(reverse('reporte_usuarios_excel'))
+        hoja = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        filas = list(hoja.iter_rows(values_only=True))
+        self.assertEqual([(f[0], f[2]) for f in filas[1:]], [('admin', 'Administrador'), ('empleado', 'Empleado')])
+        self.assertTrue(self.client.get(reverse('reporte_usuarios_pdf')).content.startswith(b'%PDF'))
@@ -0,0 +1,225 @@
+"""
+trabajos.py
+-----------
+Reportes generados en segundo plano.
+
+El request solo crea un TrabajoReporte y devuelve la página de espera. Al
+confirmarse la transacción el trabajo pasa a un pool de hilos local
+(REPORTES_WORKERS) que escribe el archivo en REPORTES_ROOT, con un nombre
+al azar, y avisa con una Notificacion. El comando ``procesar_reportes`` toma los que
+quedaron pendientes si el proceso se reinició y borra los vencidos.
+
+Un pedido igual (mismo reporte, formato y parámetros) dentro de
+REPORTES_VIGENCIA_MINUTOS reutiliza el archivo ya generado, y los que llegan
+mientras se genera se completan junto con el primero.
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from app_notificaciones.models import Notificacion
+from app_sigrams.models import TrabajoReporte
+from app_sigrams.reportes import FORMATOS, REPORTES
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+_lock = threading.Lock()
+
+
+def _workers():
+    return getattr(settings, 'REPORTES_WORKERS', 2)
+
+
+def _vigencia():
+    return timedelta(minutes=getattr(settings, 'REPORTES_VIGENCIA_MINUTOS', 10))
+
+
+def parametros_de(reporte, datos):
+    """Los parámetros de ``datos`` (GET) que cambian el reporte, como texto y sin vacíos."""
+    return {
+        nombre: str(datos.get(nombre)) for nombre in REPORTES[reporte].parametros
+        if datos.get(nombre)
+    }
+
+
+def clave_de(reporte, formato, parametros):
+    texto = json.dumps([reporte, formato, parametros], sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def titulo_de(trabajo):
+    return f'{REPORTES[trabajo.reporte].titulo} ({FORMATOS[trabajo.formato]})'
+
+
+def solicitar(usuario, reporte, formato, parametros):
+    """
+    TrabajoReporte de ``usuario`` para el reporte pedido: uno ya listo y
+    vigente, el que ya tiene en curso o uno nuevo que se encola al confirmar.
+    """
+    if reporte not in REPORTES or formato not in FORMATOS:
+        raise ValueError(f'Reporte inexistente: {reporte}.{formato}')
+    clave = clave_de(reporte, formato, parametros)
+
+    vigente = (
+        TrabajoReporte.objects.filter(
+            clave=clave, estado='LISTO', fecha_fin__gte=timezone.now() - _vigencia(),
+        )
+        .order_by('-fecha_fin').first()
+    )
+    if vigente:
+        if vigente.usuario_id == usuario.pk:
+            return vigente
+        # Otro usuario lo pidió hace poco: mismo archivo, trabajo propio
+        return TrabajoReporte.objects.create(
+            usuario=usuario, reporte=reporte, formato=formato, parametros=parametros,
+            clave=clave, estado='LISTO', archivo=vigente.archivo.name,
+            fecha_inicio=vigente.fecha_inicio, fecha_fin=vigente.fecha_fin,
+        )
+
+    en_curso = TrabajoReporte.objects.filter(
+        usuario=usuario, clave=clave, estado__in=['PENDIENTE', 'PROCESANDO'],
+    ).first()
+    if en_curso:
+        return en_curso
+
+    trabajo = TrabajoReporte.objects.create(
+        usuario=usuario, reporte=reporte, formato=formato, parametros=parametros, clave=clave,
+    )
+    transaction.on_commit(lambda: encolar(trabajo.pk))
+    return trabajo
+
+
+def encolar(pk):
+    """Manda el trabajo al pool; con REPORTES_WORKERS = 0 lo genera en el momento."""
+    global _ejecutor
+    if _workers() <= 0:
+        procesar(pk)
+        return
+    with _lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix='reportes')
+    _ejecutor.submit(_en_hilo, pk)
+
+
+def _en_hilo(pk):
+    try:
+        procesar(pk)
+    except Exception:
+        logger.exception('Error al procesar el reporte %s', pk)
+    finally:
+        # Cada hilo tiene sus propias conexiones
+        connections.close_all()
+
+
+def _tomar(pk):
+    """Marca el trabajo como PROCESANDO si sigue pendiente y nadie lo tomó."""
+    with transaction.atomic():
+        trabajo = (
+            TrabajoReporte.objects.select_for_update(skip_locked=True)
+            .filter(pk=pk, estado='PENDIENTE').first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = 'PROCESANDO'
+        trabajo.fecha_inicio = timezone.now()
+        trabajo.save(update_fields=['estado', 'fecha_inicio'])
+    return trabajo
+
+
+def procesar(pk):
+    """Genera el archivo del trabajo ``pk``. Devuelve el trabajo, o None si no estaba pendiente."""
+    trabajo = _tomar(pk)
+    if trabajo is None:
+        return None
+    titulo = titulo_de(trabajo)
+    try:
+        with tempfile.TemporaryFile() as temporal:
+            REPORTES[trabajo.reporte].escribir(temporal, trabajo.formato, trabajo.parametros)
+            temporal.seek(0)
+            nombre = f'{uuid.uuid4().hex}.{trabajo.formato}'
+            trabajo.archivo.save(nombre, File(temporal), save=False)
+    except Exception as e:
+        logger.exception('No se pudo generar el reporte %s', pk)
+        TrabajoReporte.objects.filter(pk=pk).update(
+            estado='ERROR', error=str(e), fecha_fin=timezone.now(),
+        )
+        Notificacion.crear_notificacion(
+            usuario=trabajo.usuario, titulo=f'{titulo}: error',
+            mensaje='No se pudo generar el reporte. Intente nuevamente.', tipo='error',
+            url=reverse('estado_reporte', args=[pk]),
+        )
+        trabajo.estado = 'ERROR'
+        return trabajo
+
+    # Este trabajo y los iguales que se pidieron mientras tanto
+    fin = timezone.now()
+    iguales = list(
+        TrabajoReporte.objects.filter(clave=trabajo.clave, estado='PENDIENTE')
+        .values_list('pk', 'usuario_id')
+    )
+    TrabajoReporte.objects.filter(pk__in=[pk] + [p for p, _ in iguales]).update(
+        estado='LISTO', archivo=trabajo.archivo.name, error='', fecha_fin=fin,
+    )
+    avisados = {trabajo.usuario_id}
+    Notificacion.crear_notificacion(
+        usuario=trabajo.usuario, titulo=f'{titulo} listo',
+        mensaje='El archivo ya se puede descargar.', tipo='exito',
+        url=reverse('estado_reporte', args=[pk]),
+    )
+    for otro_pk, usuario_id in iguales:
+        if usuario_id not in avisados:
+            avisados.add(usuario_id)
+            Notificacion.objects.create(
+                usuario_id=usuario_id, titulo=f'{titulo} listo',
+                mensaje='El archivo ya se puede descargar.', tipo='exito',
+                url=reverse('estado_reporte', args=[otro_pk]),
+            )
+    trabajo.estado = 'LISTO'
+    trabajo.fecha_fin = fin
+    return trabajo
+
+
+def reencolar_pendientes(colgados_despues=timedelta(hours=1)):
+    """
+    Procesa los trabajos que quedaron PENDIENTE (el proceso terminó antes de
+    tomarlos) y vuelve a pendiente los PROCESANDO de hace más de
+    ``colgados_despues``. Devuelve cuántos se procesaron.
+    """
+    TrabajoReporte.objects.filter(
+        estado='PROCESANDO', fecha_inicio__lt=timezone.now() - colgados_despues,
+    ).update(estado='PENDIENTE')
+    total = 0
+    pks = TrabajoReporte.objects.filter(estado='PENDIENTE').order_by('fecha_creacion')
+    for pk in pks.values_list('pk', flat=True):
+        if procesar(pk):
+            total += 1
+    return total
+
+
+def limpiar_vencidos(dias):
+    """Borra los trabajos de hace más de ``dias`` días y sus archivos. Devuelve cuántos."""
+    limite = timezone.now() - timedelta(days=dias)
+    viejos = TrabajoReporte.objects.filter(fecha_creacion__lt=limite)
+    archivos = set(viejos.exclude(archivo='').values_list('archivo', flat=True))
+    total, _ = viejos.delete()
+    # Un archivo puede seguir en uso por un trabajo más nuevo que lo reutilizó
+    en_uso = set(
+        TrabajoReporte.objects.filter(archivo__in=archivos).values_list('archivo', flat=True)
+    )
+    almacenamiento = TrabajoReporte._meta.get_field('archivo').storage
+    for nombre in archivos - en_uso:
+        almacenamiento.delete(nombre)
+    return total
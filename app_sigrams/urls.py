@@ -7,10 +7,12 @@ from .views import (
     DetalleMarcaView,
     cargar_campos,
     buscar_marca_por_nombre,
+    autocompletar_productores,
     get_marcas_por_productor,
     get_campos_por_productor,
     buscar_imagen_similar,
     verificar_imagen_ajax,
+    verificar_imagenes_lote,
 )
 
 urlpatterns = [
@@ -60,6 +62,7 @@ urlpatterns = [
     path('ajax/imagenes-marcas/', views.get_imagenes_marcas, name='ajax_imagenes_marcas'),
     path('ajax/buscar-imagen-similar/', buscar_imagen_similar, name='ajax_buscar_imagen_similar'),
     path('ajax/verificar-imagen/', verificar_imagen_ajax, name='ajax_verificar_imagen'),
+    path('ajax/verificar-imagenes-lote/', verificar_imagenes_lote, name='ajax_verificar_imagenes_lote'),
     # =========================
     # BÚSQUEDA POR IMAGEN (página dedicada — escenario policial)
     # =========================
@@ -94,6 +97,9 @@ urlpatterns = [
     path('reportes/productores/excel/', views.reporte_productores_excel, name='reporte_productores_excel'),
     path('reportes/marcas/excel/', views.reporte_marcas_excel, name='reporte_marcas_excel'),
     path('reportes/solicitudes/excel/', views.reporte_solicitudes_excel, name='reporte_solicitudes_excel'),
+    path('reportes/trabajos/<int:pk>/', views.estado_reporte, name='estado_reporte'),
+    path('reportes/trabajos/<int:pk>/descargar/', views.descargar_reporte, name='descargar_reporte'),
+    path('exportar/<slug:tabla>/<slug:formato>/', views.exportar_tabla, name='exportar_tabla'),
 
     # Ruta para el dashboard del administrador
     path('admin-dashboard/', views.dashboard_admin, name='dashboard_admin'),
@@ -104,5 +110,6 @@ urlpatterns = [
 
     # Ruta para buscar marcas por nombre (usada en AJAX)
     path('ajax/buscar-marca-nombre/', buscar_marca_por_nombre, name='ajax_buscar_marca_nombre'),
+    path('ajax/productores/autocompletar/', autocompletar_productores, name='ajax_autocompletar_productores'),
 
 ]
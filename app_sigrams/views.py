@@ -7,7 +7,20 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 from app_registros.models import UserProfile, Productor, MarcaSenal, Solicitud, Campo, TipoSenal, ImagenMarcaPredefinida
 from app_registros.forms import ProductorForm, MarcaSenalForm, SolicitudForm
-from django.http import JsonResponse
+from app_registros.busqueda import ORDEN_RANGO, buscar_marcas, buscar_productores, normalizar
+from app_registros.conteo import ConteoAproximadoPaginator, contar
+from app_registros.predefinidas import datos_activas, imagenes_activas
+from app_registros.sugerencias import sugerir_productores
+from app_sigrams.exportar import CONTENT_TYPES_STREAMING, filas_de, respuesta_streaming
+from app_sigrams.filtros import (
+    filtrar_cambios, filtrar_campos, filtrar_ingresos, filtrar_marcas, filtrar_productores,
+    filtrar_solicitudes,
+)
+from app_sigrams.models import TrabajoReporte
+from app_sigrams.paginacion import KeysetPaginator
+from app_sigrams.reportes import REPORTES
+from app_sigrams.trabajos import parametros_de, solicitar, titulo_de
+from django.http import FileResponse, Http404, JsonResponse
 from django.views.generic import ListView, CreateView, UpdateView, DetailView
 from django.urls import reverse_lazy, reverse
 from django.conf import settings
@@ -18,27 +31,16 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from app_registros.models import Productor, Campo, MarcaSenal
 
 
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from django.http import HttpResponse
-
-
 import datetime
+import re
+import os
+import zipfile
+from django.core.files.base import ContentFile
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum, Count
 from django.db.models.functions import TruncMonth
 
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-
 # Create your views here.
 
 from django.http import JsonResponse
@@ -88,15 +90,14 @@ def get_campos_por_productor(request, productor_id):
 def get_imagenes_marcas(request):
     """Obtener imágenes predefinidas de marcas (para AJAX)"""
     try:
-        imagenes = ImagenMarcaPredefinida.objects.filter(activa=True)
         data = []
-        for imagen in imagenes:
+        for imagen in datos_activas():
             data.append({
-                'id': imagen.id,
-                'nombre': imagen.nombre,
-                'tipo_marca': imagen.get_tipo_marca_display(),
-                'imagen': imagen.imagen.url if imagen.imagen else '',
-                'imagen_url': request.build_absolute_uri(imagen.imagen.url) if imagen.imagen else ''
+                'id': imagen['id'],
+                'nombre': imagen['nombre'],
+                'tipo_marca': imagen['tipo_marca'],
+                'imagen': imagen['imagen'],
+                'imagen_url': request.build_absolute_uri(imagen['imagen']) if imagen['imagen'] else ''
             })
         return JsonResponse(data, safe=False)
     except Exception as e:
@@ -150,74 +151,15 @@ import datetime
 import json
 
 
-@login_required
-def home(request):
-    """Vista principal del dashboard"""
-    from app_registros.models import Productor, MarcaSenal, Solicitud, Campo
+def _contexto_home():
+    """Contexto del dashboard principal (se guarda en caché, ver contexto_cacheado)."""
+    from app_registros.models import Productor, MarcaSenal, Solicitud
+    from app_sigrams.estadisticas import estadisticas_home
 
     hoy = timezone.now()
 
-    # ========== ESTADÍSTICAS BÁSICAS ==========
-    total_productores = Productor.objects.count()
-    total_marcas = MarcaSenal.objects.filter(estado='VIGENTE').count()
-    solicitudes_pendientes = Solicitud.objects.filter(estado='PENDIENTE').count()
-    total_campos = Campo.objects.count()
-
-    # ========== INGRESOS ==========
-    # Primer día del mes actual
-    primer_dia_mes = hoy.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    # Ingresos mes actual
-    ingresos_mes = (
-        MarcaSenal.objects.filter(
-            fecha_creacion__gte=primer_dia_mes,
-            valor_sellado__isnull=False
-        ).aggregate(total=Sum('valor_sellado'))['total']
-        or 0
-    )
-
-    # Ingresos mes anterior
-    primer_dia_mes_anterior = (primer_dia_mes - datetime.timedelta(days=1)).replace(day=1)
-    ultimo_dia_mes_anterior = primer_dia_mes - datetime.timedelta(days=1)
-
-    ingresos_mes_anterior = (
-        MarcaSenal.objects.filter(
-            fecha_creacion__gte=primer_dia_mes_anterior,
-            fecha_creacion__lte=ultimo_dia_mes_anterior,
-            valor_sellado__isnull=False
-        ).aggregate(total=Sum('valor_sellado'))['total']
-        or 0
-    )
-
-    # Variación porcentual
-    if ingresos_mes_anterior > 0:
-        variacion_ingresos = ((ingresos_mes - ingresos_mes_anterior) / ingresos_mes_anterior) * 100
-    else:
-        variacion_ingresos = 100 if ingresos_mes > 0 else 0
-
-    # ========== TRÁMITES ==========
-    tramites_mes = Solicitud.objects.filter(
-        fecha_solicitud__gte=primer_dia_mes
-    ).count()
-
-    # ========== DISTRIBUCIONES ==========
-    productores_por_estado = list(
-        Productor.objects.values('estado')
-        .annotate(total=Count('id'))
-        .order_by('estado')
-    )
-
-    marcas_por_tipo = list(
-        MarcaSenal.objects.values('tipo_tramite')
-        .annotate(total=Count('id'))
-        .order_by('tipo_tramite')
-    )
-
-    solicitudes_por_estado = list(
-        Solicitud.objects.values('estado')
-        .annotate(total=Count('id'))
-        .order_by('estado')
-    )
+    # ========== ESTADÍSTICAS ==========
+    estadisticas = estadisticas_home(hoy)
 
     # ========== DATOS RECIENTES ==========
     ultimas_solicitudes = (
@@ -247,43 +189,6 @@ def home(request):
         .order_by('-fecha_inscripcion')[:5]
     )
 
-    # ========== ACTIVIDAD MENSUAL (ÚLTIMOS 6 MESES) ==========
-    meses_actividad = []
-
-    for i in range(6):
-        fecha = hoy - datetime.timedelta(days=30 * i)
-        mes_str = fecha.strftime('%Y-%m')
-        nombre_mes = fecha.strftime('%b')
-
-        solicitudes_mes = Solicitud.objects.filter(
-            fecha_solicitud__year=fecha.year,
-            fecha_solicitud__month=fecha.month
-        ).count()
-
-        marcas_mes = MarcaSenal.objects.filter(
-            fecha_inscripcion__year=fecha.year,
-            fecha_inscripcion__month=fecha.month
-        ).count()
-
-        ingresos_mes_valor = (
-            MarcaSenal.objects.filter(
-                fecha_creacion__year=fecha.year,
-                fecha_creacion__month=fecha.month,
-                valor_sellado__isnull=False
-            ).aggregate(total=Sum('valor_sellado'))['total']
-            or 0
-        )
-
-        meses_actividad.append({
-            'mes': mes_str,
-            'nombre': nombre_mes,
-            'solicitudes': solicitudes_mes,
-            'marcas': marcas_mes,
-            'ingresos': float(ingresos_mes_valor)
-        })
-
-    meses_actividad.reverse()
-
     # ========== TOP PRODUCTORES ==========
     top_productores = (
         Productor.objects.annotate(total_marcas=Count('marcas_senales'))
@@ -291,37 +196,43 @@ def home(request):
     )
 
     # ========== CONTEXT ==========
-    context = {
+    return {
         # Básicos
-        'total_productores': total_productores,
-        'total_marcas': total_marcas,
-        'solicitudes_pendientes': solicitudes_pendientes,
-        'total_campos': total_campos,
+        'total_productores': estadisticas['total_productores'],
+        'total_marcas': estadisticas['total_marcas'],
+        'solicitudes_pendientes': estadisticas['solicitudes_pendientes'],
+        'total_campos': estadisticas['total_campos'],
 
         # Finanzas
-        'ingresos_mes': ingresos_mes,
-        'ingresos_mes_anterior': ingresos_mes_anterior,
-        'variacion_ingresos': variacion_ingresos,
-        'tramites_mes': tramites_mes,
+        'ingresos_mes': estadisticas['ingresos_mes'],
+        'ingresos_mes_anterior': estadisticas['ingresos_mes_anterior'],
+        'variacion_ingresos': estadisticas['variacion_ingresos'],
+        'tramites_mes': estadisticas['tramites_mes'],
 
         # Gráficos
-        'productores_por_estado': json.dumps(productores_por_estado),
-        'marcas_por_tipo': json.dumps(marcas_por_tipo),
-        'solicitudes_por_estado': json.dumps(solicitudes_por_estado),
-        'meses_actividad': json.dumps(meses_actividad),
+        'productores_por_estado': json.dumps(estadisticas['productores_por_estado']),
+        'marcas_por_tipo': json.dumps(estadisticas['marcas_por_tipo']),
+        'solicitudes_por_estado': json.dumps(estadisticas['solicitudes_por_estado']),
+        'meses_actividad': json.dumps(estadisticas['meses_actividad']),
 
         # Listados
-        'ultimas_solicitudes': ultimas_solicitudes,
-        'productores_recientes': productores_recientes,
-        'marcas_por_vencer': marcas_por_vencer,
-        'marcas_recientes': marcas_recientes,
-        'top_productores': top_productores,
+        'ultimas_solicitudes': list(ultimas_solicitudes),
+        'productores_recientes': list(productores_recientes),
+        'marcas_por_vencer': list(marcas_por_vencer),
+        'marcas_recientes': list(marcas_recientes),
+        'top_productores': list(top_productores),
 
         # Badges / listas
-        'productores_estados_list': productores_por_estado,
-        'marcas_tipos_list': marcas_por_tipo,
+        'productores_estados_list': estadisticas['productores_por_estado'],
+        'marcas_tipos_list': estadisticas['marcas_por_tipo'],
     }
 
+
+@login_required
+def home(request):
+    """Vista principal del dashboard"""
+    from app_sigrams.estadisticas import contexto_cacheado
+    context = contexto_cacheado('home', _contexto_home)
     return render(request, 'app_sigrams/index.html', context)
 
 
@@ -330,40 +241,31 @@ from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import timedelta
 
-@login_required
-def dashboard_admin(request):
-    user_profile = UserProfile.objects.get(user=request.user)
-    if user_profile.rol != 'admin':
-        messages.error(request, 'No tiene permisos para acceder.')
-        return redirect('home')
-
+def _contexto_dashboard_admin():
     # Usuarios
     total_usuarios = User.objects.count()
     admins = UserProfile.objects.filter(rol='admin').count()
     empleados = UserProfile.objects.filter(rol='empleado').count()
 
-    # Solicitudes
-    total_solicitudes = Solicitud.objects.count()
-    solicitudes_pendientes = Solicitud.objects.filter(estado='PENDIENTE').count()
-    solicitudes_en_revision = Solicitud.objects.filter(estado='EN_REVISION').count()
-    solicitudes_aprobadas = Solicitud.objects.filter(estado='APROBADO').count()
-    solicitudes_rechazadas = Solicitud.objects.filter(estado='RECHAZADO').count()
+    # Solicitudes (desde la tabla pre-agregada)
+    from app_sigrams.estadisticas import ingresos_por_mes as ingresos_mensuales, totales_por
+    por_estado = {f['estado']: f['total'] for f in totales_por('solicitud', 'estado')}
+    total_solicitudes = sum(por_estado.values())
+    solicitudes_pendientes = por_estado.get('PENDIENTE', 0)
+    solicitudes_en_revision = por_estado.get('EN_REVISION', 0)
+    solicitudes_aprobadas = por_estado.get('APROBADO', 0)
+    solicitudes_rechazadas = por_estado.get('RECHAZADO', 0)
 
     # Productores y Marcas
     total_productores = Productor.objects.count()
-    total_marcas = MarcaSenal.objects.count()
+    total_marcas = sum(f['total'] for f in totales_por('marca', 'estado'))
 
     # Ingresos (últimos 12 meses)
-    hoy = timezone.now()
+    hoy = timezone.localdate()
     doce_meses = hoy - timedelta(days=365)
-    ingresos_por_mes = (
-        MarcaSenal.objects
-        .filter(fecha_creacion__gte=doce_meses, valor_sellado__isnull=False)
-        .annotate(mes=TruncMonth('fecha_creacion'))
-        .values('mes')
-        .annotate(total=Sum('valor_sellado'))
-        .order_by('mes')
-    )
+    ingresos_por_mes = [
+        {'mes': f['mes'], 'total': f['total']} for f in ingresos_mensuales(desde=doce_meses)
+    ]
 
     # Logs recientes (últimos 20)
     logs_recientes = ChangeLog.objects.select_related('user').order_by('-timestamp')[:20]
@@ -371,7 +273,7 @@ def dashboard_admin(request):
     # Últimas solicitudes
     ultimas_solicitudes = Solicitud.objects.select_related('productor', 'solicitante').order_by('-fecha_solicitud')[:10]
 
-    context = {
+    return {
         'total_usuarios': total_usuarios,
         'admins': admins,
         'empleados': empleados,
@@ -382,10 +284,21 @@ def dashboard_admin(request):
         'solicitudes_rechazadas': solicitudes_rechazadas,
         'total_productores': total_productores,
         'total_marcas': total_marcas,
-        'ingresos_por_mes': list(ingresos_por_mes),
-        'logs_recientes': logs_recientes,
-        'ultimas_solicitudes': ultimas_solicitudes,
+        'ingresos_por_mes': ingresos_por_mes,
+        'logs_recientes': list(logs_recientes),
+        'ultimas_solicitudes': list(ultimas_solicitudes),
     }
+
+
+@login_required
+def dashboard_admin(request):
+    user_profile = UserProfile.objects.get(user=request.user)
+    if user_profile.rol != 'admin':
+        messages.error(request, 'No tiene permisos para acceder.')
+        return redirect('home')
+
+    from app_sigrams.estadisticas import contexto_cacheado
+    context = contexto_cacheado('dashboard_admin', _contexto_dashboard_admin)
     return render(request, 'app_sigrams/admin/dashboard.html', context)
 
 
@@ -507,25 +420,13 @@ def lista_productores(request):
     localidad = request.GET.get('localidad', '')
     departamento = request.GET.get('departamento', '')
     
-    if query:
-        productores = productores.filter(
-            Q(nombre__icontains=query) | 
-            Q(apellido__icontains=query) |
-            Q(dni__icontains=query) |
-            Q(campo__icontains=query)
-        )
-    
-    if estado:
-        productores = productores.filter(estado=estado)
-    
-    if localidad:
-        productores = productores.filter(localidad__icontains=localidad)
-    
-    if departamento:
-        productores = productores.filter(departamento__icontains=departamento)
+    productores = filtrar_productores(productores, request.GET)
+    orden = ORDEN_RANGO if query else ('apellido', 'nombre', 'id')
     
+    pagina = KeysetPaginator(productores, orden).pagina(request.GET.get('cursor'))
+
     context = {
-        'productores': productores,
+        'productores': pagina,
         'query': query,
         'estado_filtro': estado,
         'localidad_filtro': localidad,
@@ -638,6 +539,7 @@ class ListaProductoresView(LoginRequiredMixin, ListView):
     template_name = 'productores/lista.html'
     context_object_name = 'productores'
     paginate_by = 20
+    paginator_class = ConteoAproximadoPaginator
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -647,20 +549,20 @@ class ListaProductoresView(LoginRequiredMixin, ListView):
         localidad = self.request.GET.get('localidad')
         estado = self.request.GET.get('estado')
         
-        if nombre:
-            queryset = queryset.filter(Q(nombre__icontains=nombre) | Q(apellido__icontains=nombre))
         if dni:
-            queryset = queryset.filter(dni__icontains=dni)
+            queryset = queryset.filter(dni__startswith=re.sub(r'\D', '', dni))
         if localidad:
             queryset = queryset.filter(localidad__icontains=localidad)
         if estado:
             queryset = queryset.filter(estado=estado)
+        if nombre:
+            return buscar_productores(queryset, nombre).order_by(*ORDEN_RANGO)
         
         return queryset.order_by('apellido', 'nombre')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_productores'] = Productor.objects.count()
+        context['total_productores'] = contar(Productor.objects.all())[0]
         context['estados'] = Productor.ESTADO_CHOICES
         return context
 
@@ -708,60 +610,7 @@ class EliminarProductorView(LoginRequiredMixin, UserPassesTestMixin, DeleteView)
 
 class ReporteProductoresPDFView(LoginRequiredMixin, View):
     def get(self, request):
-        # Crear respuesta HTTP con contenido PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="reporte_productores.pdf"'
-        
-        # Crear documento PDF
-        doc = SimpleDocTemplate(response, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        
-        # Título
-        title = Paragraph("Reporte de Productores - SIGRAMS", styles['Title'])
-        elements.append(title)
-        
-        # Fecha
-        fecha = Paragraph(f"Generado: {timezone.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal'])
-        elements.append(fecha)
-        
-        elements.append(Paragraph("<br/><br/>", styles['Normal']))
-        
-        # Datos
-        productores = Productor.objects.all().order_by('apellido', 'nombre')
-        
-        # Tabla
-        data = [['Nombre', 'DNI', 'Localidad', 'Estado', 'Fecha Registro']]
-        
-        for p in productores:
-            data.append([
-                f"{p.apellido}, {p.nombre}",
-                p.dni,
-                p.localidad,
-                p.get_estado_display(),
-                p.fecha_registro.strftime('%d/%m/%Y')
-            ])
-        
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0A2E5A')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        elements.append(table)
-        
-        # Generar PDF
-        doc.build(elements)
-        
-        return response
+        return _pedir_reporte(request, 'productores', 'pdf')
 
 # ============================================================================
 # VISTAS PARA MARCAS Y SEÑALES
@@ -859,7 +708,7 @@ def nueva_marca(request):
     return render(request, 'app_sigrams/marcas/form.html', {
         'form': form,
         'titulo': 'Nueva Marca y Señal',
-        'imagenes_predefinidas': ImagenMarcaPredefinida.objects.filter(activa=True)
+        'imagenes_predefinidas': imagenes_activas()
     })
 
 
@@ -916,7 +765,7 @@ def editar_marca(request, pk):
     return render(request, 'app_sigrams/marcas/form.html', {
         'form': form,
         'titulo': f'Editar Marca #{marca.numero_orden}',
-        'imagenes_predefinidas': ImagenMarcaPredefinida.objects.filter(activa=True),
+        'imagenes_predefinidas': imagenes_activas(),
         'marca': marca
     })
 
@@ -926,7 +775,20 @@ class ListaMarcasView(ListView):
     model = MarcaSenal
     template_name = 'app_sigrams/marcas/lista.html'
     context_object_name = 'marcas'
-    paginate_by = 20
+
+    def get_queryset(self):
+        return filtrar_marcas(MarcaSenal.objects.select_related('productor'), self.request.GET)
+
+    def get_context_data(self, **kwargs):
+        pagina = KeysetPaginator(self.object_list, ('-fecha_inscripcion', '-id')).pagina(
+            self.request.GET.get('cursor')
+        )
+        context = super().get_context_data(object_list=pagina, **kwargs)
+        context['pagina'] = pagina
+        context['query'] = self.request.GET.get('q', '')
+        context['estado_filtro'] = self.request.GET.get('estado', '')
+        context['tipo_tramite_filtro'] = self.request.GET.get('tipo_tramite', '')
+        return context
 
 class NuevaMarcaView(CreateView):
     model = MarcaSenal
@@ -937,7 +799,7 @@ class NuevaMarcaView(CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['titulo'] = 'Nueva Marca y Señal'
-        context['imagenes_predefinidas'] = ImagenMarcaPredefinida.objects.filter(activa=True)
+        context['imagenes_predefinidas'] = imagenes_activas()
         return context
 
 class EditarMarcaView(UpdateView):
@@ -949,7 +811,7 @@ class EditarMarcaView(UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['titulo'] = f'Editar Marca y Señal #{self.object.numero_orden}'
-        context['imagenes_predefinidas'] = ImagenMarcaPredefinida.objects.filter(activa=True)
+        context['imagenes_predefinidas'] = imagenes_activas()
         return context
 
 class DetalleMarcaView(DetailView):
@@ -971,7 +833,6 @@ def cargar_campos(request):
 # VISTAS PARA SOLICITUDES
 # ============================================================================
 
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q, Count, Case, When, IntegerField
 from django.utils import timezone
 from datetime import timedelta
@@ -983,16 +844,18 @@ def lista_solicitudes(request):
     # Obtener todas las solicitudes
     solicitudes = Solicitud.objects.select_related(
         'productor', 'marca_senal', 'solicitante', 'revisor', 'aprobador'
-    ).all().order_by('-fecha_solicitud')
-    
-    # Estadísticas
-    total_solicitudes = solicitudes.count()
-    solicitudes_pendientes = solicitudes.filter(estado='PENDIENTE').count()
-    solicitudes_en_revision = solicitudes.filter(estado='EN_REVISION').count()
-    solicitudes_vencidas = solicitudes.filter(
-        Q(fecha_vencimiento__lt=timezone.now()) & 
-        ~Q(estado__in=['APROBADO', 'RECHAZADO'])
-    ).count()
+    ).all()
+    
+    # Estadísticas (un solo recorrido con agregados condicionales)
+    estadisticas = Solicitud.objects.aggregate(
+        total=Count('id'),
+        pendientes=Count('id', filter=Q(estado='PENDIENTE')),
+        en_revision=Count('id', filter=Q(estado='EN_REVISION')),
+        vencidas=Count('id', filter=(
+            Q(fecha_vencimiento__lt=timezone.now()) &
+            ~Q(estado__in=['APROBADO', 'RECHAZADO'])
+        )),
+    )
     
     # Filtros
     estado = request.GET.get('estado', '')
@@ -1002,48 +865,29 @@ def lista_solicitudes(request):
     fecha_inicio = request.GET.get('fecha_inicio', '')
     fecha_fin = request.GET.get('fecha_fin', '')
     
-    if estado:
-        solicitudes = solicitudes.filter(estado=estado)
-    
-    if tipo_tramite:
-        solicitudes = solicitudes.filter(tipo_tramite=tipo_tramite)
+    solicitudes = filtrar_solicitudes(solicitudes, request.GET)
     
-    if prioridad:
-        solicitudes = solicitudes.filter(prioridad=prioridad)
-    
-    if productor_id:
-        solicitudes = solicitudes.filter(productor_id=productor_id)
-    
-    if fecha_inicio:
-        solicitudes = solicitudes.filter(fecha_solicitud__gte=fecha_inicio)
-    
-    if fecha_fin:
-        solicitudes = solicitudes.filter(fecha_solicitud__lte=fecha_fin)
-    
-    # Paginación
-    page = request.GET.get('page', 1)
-    paginator = Paginator(solicitudes, 20)  # 20 items por página
-    
-    try:
-        solicitudes_pagina = paginator.page(page)
-    except PageNotAnInteger:
-        solicitudes_pagina = paginator.page(1)
-    except EmptyPage:
-        solicitudes_pagina = paginator.page(paginator.num_pages)
+    # Paginación por clave: no cuenta filas ni usa OFFSET
+    solicitudes_pagina = KeysetPaginator(solicitudes, ('-fecha_solicitud', '-id')).pagina(
+        request.GET.get('cursor')
+    )
     
     context = {
         'solicitudes': solicitudes_pagina,
-        'total_solicitudes': total_solicitudes,
-        'solicitudes_pendientes': solicitudes_pendientes,
-        'solicitudes_en_revision': solicitudes_en_revision,
-        'solicitudes_vencidas': solicitudes_vencidas,
+        'total_solicitudes': estadisticas['total'],
+        'solicitudes_pendientes': estadisticas['pendientes'],
+        'solicitudes_en_revision': estadisticas['en_revision'],
+        'solicitudes_vencidas': estadisticas['vencidas'],
         'estado_filtro': estado,
         'tipo_tramite_filtro': tipo_tramite,
         'prioridad_filtro': prioridad,
         'productor_filtro': productor_id,
         'fecha_inicio_filtro': fecha_inicio,
         'fecha_fin_filtro': fecha_fin,
-        'productores': Productor.objects.all(),
+        # Solo el productor filtrado; los demás se buscan al escribir
+        'productor_seleccionado': (
+            Productor.objects.filter(pk=productor_id).first() if productor_id.isdigit() else None
+        ),
     }
     return render(request, 'app_sigrams/solicitudes/lista.html', context)
 
@@ -1155,7 +999,6 @@ def nueva_solicitud(request):
     context = {
         'form': form,
         'titulo': 'Nueva Solicitud',
-        'productores': Productor.objects.all(),
     }
     return render(request, 'app_sigrams/solicitudes/form.html', context)
 
@@ -1368,26 +1211,23 @@ def mis_solicitudes(request):
     }
     return render(request, 'app_sigrams/solicitudes/mis_solicitudes.html', context)
 
-@login_required
-def dashboard_solicitudes(request):
-    """Dashboard con estadísticas de solicitudes"""
-    from django.db.models import Count, Q
+def _contexto_dashboard_solicitudes():
+    from django.db.models import Q
     
-    # Estadísticas generales
-    total_solicitudes = Solicitud.objects.count()
-    solicitudes_pendientes = Solicitud.objects.filter(estado='PENDIENTE').count()
-    solicitudes_en_revision = Solicitud.objects.filter(estado='EN_REVISION').count()
-    solicitudes_aprobadas = Solicitud.objects.filter(estado='APROBADO').count()
+    from app_sigrams.estadisticas import totales_por
+
+    # Estadísticas generales (desde la tabla pre-agregada)
+    por_estado = {f['estado']: f['total'] for f in totales_por('solicitud', 'estado')}
+    total_solicitudes = sum(por_estado.values())
+    solicitudes_pendientes = por_estado.get('PENDIENTE', 0)
+    solicitudes_en_revision = por_estado.get('EN_REVISION', 0)
+    solicitudes_aprobadas = por_estado.get('APROBADO', 0)
     
     # Solicitudes por tipo de trámite
-    solicitudes_por_tipo = Solicitud.objects.values('tipo_tramite').annotate(
-        total=Count('id')
-    ).order_by('tipo_tramite')
+    solicitudes_por_tipo = totales_por('solicitud', 'tipo_tramite')
     
     # Solicitudes por prioridad
-    solicitudes_por_prioridad = Solicitud.objects.values('prioridad').annotate(
-        total=Count('id')
-    ).order_by('prioridad')
+    solicitudes_por_prioridad = totales_por('solicitud', 'prioridad')
     
     # Solicitudes vencidas
     solicitudes_vencidas = Solicitud.objects.filter(
@@ -1398,7 +1238,7 @@ def dashboard_solicitudes(request):
     # Últimas solicitudes
     ultimas_solicitudes = Solicitud.objects.select_related('productor', 'solicitante').order_by('-fecha_solicitud')[:10]
     
-    context = {
+    return {
         'total_solicitudes': total_solicitudes,
         'solicitudes_pendientes': solicitudes_pendientes,
         'solicitudes_en_revision': solicitudes_en_revision,
@@ -1406,8 +1246,15 @@ def dashboard_solicitudes(request):
         'solicitudes_vencidas': solicitudes_vencidas,
         'solicitudes_por_tipo': list(solicitudes_por_tipo),
         'solicitudes_por_prioridad': list(solicitudes_por_prioridad),
-        'ultimas_solicitudes': ultimas_solicitudes,
+        'ultimas_solicitudes': list(ultimas_solicitudes),
     }
+
+
+@login_required
+def dashboard_solicitudes(request):
+    """Dashboard con estadísticas de solicitudes"""
+    from app_sigrams.estadisticas import contexto_cacheado
+    context = contexto_cacheado('dashboard_solicitudes', _contexto_dashboard_solicitudes)
     return render(request, 'app_sigrams/solicitudes/dashboard.html', context)
 
 
@@ -1519,33 +1366,28 @@ def reporte_ingresos(request):
     año = request.GET.get('año', datetime.datetime.now().year)
     mes = request.GET.get('mes', '')
 
-    ingresos_qs = MarcaSenal.objects.filter(valor_sellado__isnull=False)
-
-    if año:
-        ingresos_qs = ingresos_qs.filter(fecha_creacion__year=año)
-    if mes:
-        ingresos_qs = ingresos_qs.filter(fecha_creacion__month=mes)
+    filtros = {'año': año, 'mes': mes}
+    ingresos_qs = filtrar_ingresos(MarcaSenal.objects.all(), filtros)
 
     # 🔥 SI ES EXPORTACIÓN
-    if export == 'pdf':
-        return exportar_ingresos_pdf(ingresos_qs)
-    elif export == 'excel':
-        return exportar_ingresos_excel(ingresos_qs)
+    formato = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv'}.get(export)
+    if formato:
+        return _pedir_reporte(request, 'ingresos', formato, filtros)
 
     # --- Vista HTML normal ---
-    ingresos_por_mes = ingresos_qs.annotate(
-        mes=TruncMonth('fecha_creacion')
-    ).values('mes').annotate(
-        total=Sum('valor_sellado'),
-        cantidad=Count('id')
-    ).order_by('-mes')
+    # Los totales salen de la tabla pre-agregada; solo el detalle lee las marcas.
+    # Coinciden mientras EstadisticaDiaria esté al día: tras una carga masiva
+    # hay que correr reconstruir_estadisticas (ver app_sigrams.estadisticas).
+    from app_sigrams.estadisticas import ingresos_por_mes as ingresos_mensuales
+    from app_sigrams.models import EstadisticaDiaria
+    ingresos_por_mes = ingresos_mensuales(año=año, mes=mes)[::-1]
 
     ingresos_detalle = ingresos_qs.select_related('productor').order_by('-fecha_creacion')[:100]
 
-    total_general = ingresos_qs.aggregate(total=Sum('valor_sellado'))['total'] or 0
-    cantidad_total = ingresos_qs.count()
+    total_general = sum(f['total'] for f in ingresos_por_mes)
+    cantidad_total = sum(f['cantidad'] for f in ingresos_por_mes)
 
-    años_disponibles = MarcaSenal.objects.dates('fecha_creacion', 'year')
+    años_disponibles = EstadisticaDiaria.objects.filter(tabla='marca').dates('fecha', 'year')
 
     context = {
         'ingresos_por_mes': ingresos_por_mes,
@@ -1560,101 +1402,6 @@ def reporte_ingresos(request):
     return render(request, 'app_sigrams/reportes/ingresos.html', context)
 
 
-def exportar_ingresos_pdf(queryset):
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="ingresos.pdf"'
-
-    doc = SimpleDocTemplate(response, pagesize=landscape(A4))
-    elements = []
-    styles = getSampleStyleSheet()
-
-    elements.append(Paragraph("Reporte de Ingresos - SIGRAMS", styles['Title']))
-    elements.append(Spacer(1, 12))
-    elements.append(
-        Paragraph(
-            f"Generado: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}",
-            styles['Normal']
-        )
-    )
-    elements.append(Spacer(1, 24))
-
-    datos = queryset.select_related('productor').order_by('-fecha_creacion')[:500]
-
-    data = [['Fecha', 'N° Orden', 'Productor', 'Tipo Trámite', 'Valor']]
-
-    for m in datos:
-        data.append([
-            m.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-            str(m.numero_orden),
-            m.productor.nombre_completo[:40],
-            m.get_tipo_tramite_display(),
-            f"${m.valor_sellado}"
-        ])
-
-    table = Table(data)
-
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0A2E5A')),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 10),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('FONTSIZE', (0,1), (-1,-1), 8),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
-
-    return response
-
-
-def exportar_ingresos_excel(queryset):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Ingresos"
-
-    headers = ['Fecha', 'N° Orden', 'Productor', 'Tipo Trámite', 'Valor']
-    ws.append(headers)
-
-    for col in range(1, len(headers)+1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="0A2E5A", end_color="0A2E5A", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-
-    datos = queryset.select_related('productor').order_by('-fecha_creacion')[:500]
-
-    for m in datos:
-        ws.append([
-            m.fecha_creacion.strftime('%d/%m/%Y %H:%M'),
-            m.numero_orden,
-            m.productor.nombre_completo,
-            m.get_tipo_tramite_display(),
-            float(m.valor_sellado) if m.valor_sellado else 0
-        ])
-
-    # Ajustar ancho columnas
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[col_letter].width = min(max_length + 2, 50)
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="ingresos.xlsx"'
-
-    wb.save(response)
-    return response
-
-
 def test_marcas_view(request):
     """Vista temporal para testear la obtención de marcas"""
     from app_registros.models import Productor, MarcaSenal
@@ -1704,256 +1451,140 @@ def eliminar_documento(request, documento_id):
 
 
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-
 # ============================================
-# EXPORTACIONES PDF
+# REPORTES PDF / EXCEL (EN SEGUNDO PLANO)
 # ============================================
 
+def _pedir_reporte(request, reporte, formato, datos=None):
+    """Encola el reporte (o reutiliza uno vigente) y lleva a la página de espera."""
+    datos = request.GET if datos is None else datos
+    trabajo = solicitar(request.user, reporte, formato, parametros_de(reporte, datos))
+    return redirect('estado_reporte', pk=trabajo.pk)
+
+
 @login_required
 def reporte_productores_pdf(request):
-    # (Ya lo tienes implementado como ReporteProductoresPDFView)
-    # Si quieres, puedes convertir esa clase en función o mantenerla.
-    # Por simplicidad, usaré la clase existente:
-    return ReporteProductoresPDFView.as_view()(request)
+    return _pedir_reporte(request, 'productores', 'pdf')
 
 @login_required
 def reporte_marcas_pdf(request):
-    from reportlab.lib.pagesizes import landscape, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    import datetime
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="marcas.pdf"'
-    
-    doc = SimpleDocTemplate(response, pagesize=landscape(A4))
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    title = Paragraph("Reporte de Marcas y Señales - SIGRAMS", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"Generado: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-    elements.append(Spacer(1, 24))
-    
-    marcas = MarcaSenal.objects.select_related('productor').all().order_by('-fecha_inscripcion')[:500]
-    data = [['N° Orden', 'Productor', 'Tipo Trámite', 'Estado', 'Fecha Inscripción', 'Total Ganado']]
-    for m in marcas:
-        data.append([
-            str(m.numero_orden),
-            m.productor.nombre_completo,
-            m.get_tipo_tramite_display(),
-            m.get_estado_display(),
-            m.fecha_inscripcion.strftime('%d/%m/%Y'),
-            str(m.total_ganado)
-        ])
-    
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0A2E5A')),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 10),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('BACKGROUND', (0,1), (-1,-1), colors.white),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('FONTSIZE', (0,1), (-1,-1), 8),
-    ]))
-    elements.append(table)
-    
-    doc.build(elements)
-    return response
+    return _pedir_reporte(request, 'marcas', 'pdf')
 
 @login_required
 def reporte_solicitudes_pdf(request):
-    from reportlab.lib.pagesizes import landscape, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    import datetime
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="solicitudes.pdf"'
-    
-    doc = SimpleDocTemplate(response, pagesize=landscape(A4))
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    title = Paragraph("Reporte de Solicitudes - SIGRAMS", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"Generado: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-    elements.append(Spacer(1, 24))
-    
-    solicitudes = Solicitud.objects.select_related('productor', 'solicitante').all().order_by('-fecha_solicitud')[:500]
-    data = [['ID', 'Productor', 'Tipo Trámite', 'Estado', 'Prioridad', 'Fecha Solicitud']]
-    for s in solicitudes:
-        data.append([
-            str(s.id),
-            s.productor.nombre_completo,
-            s.get_tipo_tramite_display(),
-            s.get_estado_display(),
-            s.get_prioridad_display(),
-            s.fecha_solicitud.strftime('%d/%m/%Y')
-        ])
-    
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0A2E5A')),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 10),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('BACKGROUND', (0,1), (-1,-1), colors.white),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('FONTSIZE', (0,1), (-1,-1), 8),
-    ]))
-    elements.append(table)
-    
-    doc.build(elements)
-    return response
-
-# ============================================
-# EXPORTACIONES EXCEL
-# ============================================
+    return _pedir_reporte(request, 'solicitudes', 'pdf')
 
 @login_required
 def reporte_productores_excel(request):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Productores"
-    
-    headers = ['Apellido', 'Nombre', 'DNI', 'CUIT', 'Localidad', 'Departamento', 'Estado', 'Fecha Registro']
-    ws.append(headers)
-    
-    for col in range(1, len(headers)+1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="0A2E5A", end_color="0A2E5A", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    productores = Productor.objects.all().order_by('apellido', 'nombre')
-    for p in productores:
-        ws.append([
-            p.apellido,
-            p.nombre,
-            p.dni,
-            p.cuit or '',
-            p.localidad or '',
-            p.departamento or '',
-            p.get_estado_display(),
-            p.fecha_registro.strftime('%d/%m/%Y')
-        ])
-    
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[col_letter].width = adjusted_width
-    
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="productores.xlsx"'
-    wb.save(response)
-    return response
+    return _pedir_reporte(request, 'productores', 'xlsx')
 
 @login_required
 def reporte_marcas_excel(request):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Marcas"
-    
-    headers = ['N° Orden', 'Productor', 'Tipo Trámite', 'Estado', 'Fecha Inscripción', 'Total Ganado']
-    ws.append(headers)
-    
-    for col in range(1, len(headers)+1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="0A2E5A", end_color="0A2E5A", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    marcas = MarcaSenal.objects.select_related('productor').all().order_by('-fecha_inscripcion')
-    for m in marcas:
-        ws.append([
-            m.numero_orden,
-            m.productor.nombre_completo,
-            m.get_tipo_tramite_display(),
-            m.get_estado_display(),
-            m.fecha_inscripcion.strftime('%d/%m/%Y'),
-            m.total_ganado
-        ])
-    
-    # Ajustar ancho
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[col_letter].width = adjusted_width
-    
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="marcas.xlsx"'
-    wb.save(response)
-    return response
+    return _pedir_reporte(request, 'marcas', 'xlsx')
 
 @login_required
 def reporte_solicitudes_excel(request):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Solicitudes"
-    
-    headers = ['ID', 'Productor', 'Tipo Trámite', 'Estado', 'Prioridad', 'Fecha Solicitud']
-    ws.append(headers)
-    
-    for col in range(1, len(headers)+1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="0A2E5A", end_color="0A2E5A", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    solicitudes = Solicitud.objects.select_related('productor').all().order_by('-fecha_solicitud')
-    for s in solicitudes:
-        ws.append([
-            s.id,
-            s.productor.nombre_completo,
-            s.get_tipo_tramite_display(),
-            s.get_estado_display(),
-            s.get_prioridad_display(),
-            s.fecha_solicitud.strftime('%d/%m/%Y')
-        ])
-    
-    # Ajustar ancho
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[col_letter].width = adjusted_width
-    
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="solicitudes.xlsx"'
-    wb.save(response)
-    return response
+    return _pedir_reporte(request, 'solicitudes', 'xlsx')
+
+
+@login_required
+def estado_reporte(request, pk):
+    """Página de espera del reporte; con ?json=1 devuelve el estado para el polling."""
+    trabajo = get_object_or_404(TrabajoReporte, pk=pk, usuario=request.user)
+    if request.GET.get('json'):
+        return JsonResponse({
+            'estado': trabajo.estado,
+            'estado_display': trabajo.get_estado_display(),
+            'url': reverse('descargar_reporte', args=[pk]) if trabajo.estado == 'LISTO' else None,
+        })
+    return render(request, 'app_sigrams/reportes/trabajo.html', {
+        'trabajo': trabajo,
+        'titulo': titulo_de(trabajo),
+    })
+
+
+@login_required
+def descargar_reporte(request, pk):
+    trabajo = get_object_or_404(TrabajoReporte, pk=pk, usuario=request.user, estado='LISTO')
+    try:
+        archivo = trabajo.archivo.open('rb')
+    except FileNotFoundError:
+        raise Http404("El archivo del reporte ya no existe")
+    nombre = f'{trabajo.reporte}_{timezone.localtime(trabajo.fecha_fin):%Y%m%d_%H%M%S}.{trabajo.formato}'
+    return FileResponse(archivo, as_attachment=True, filename=nombre)
+
+# ============================================
+# EXPORTACIONES CSV / NDJSON
+# ============================================
+
+# nombre -> (modelo, filtro, orden, columnas, solo administradores)
+TABLAS_EXPORTABLES = {
+    'productores': (
+        Productor, filtrar_productores, ('apellido', 'nombre', 'id'),
+        (
+            'id', 'apellido', 'nombre', 'dni', 'cuit', 'calle', 'campo', 'localidad', 'municipio',
+            'departamento', 'provincia', 'telefono', 'email', 'latitud', 'longitud',
+            'area_hectareas', 'estado', 'fecha_registro', 'observaciones',
+        ),
+        False,
+    ),
+    'campos': (
+        Campo, filtrar_campos, ('productor_id', 'nombre', 'id'),
+        (
+            'id', 'productor_id', 'nombre', 'area_hectareas', 'distrito', 'departamento',
+            'latitud', 'longitud', 'observaciones',
+        ),
+        False,
+    ),
+    'marcas': (
+        MarcaSenal, filtrar_marcas, ('-fecha_inscripcion', '-id'),
+        (
+            'id', 'numero_orden', 'productor_id', 'campo_id', 'tipo_tramite', 'estado',
+            'fecha_inscripcion', 'fecha_vencimiento', 'descripcion_marca', 'tipo_senal_id',
+            'descripcion_senal', 'vacuno', 'caballar', 'mular', 'asnal', 'ovino', 'cabrio',
+            'valor_sellado', 'observaciones', 'fecha_creacion', 'ultima_modificacion',
+        ),
+        False,
+    ),
+    'solicitudes': (
+        Solicitud, filtrar_solicitudes, ('-fecha_solicitud', '-id'),
+        (
+            'id', 'numero_expediente', 'productor_id', 'tipo_tramite', 'estado', 'prioridad',
+            'fecha_solicitud', 'tipo_ganado', 'cantidad_animales', 'solicitante_nombre',
+            'solicitante_dni', 'marca_senal_id', 'fecha_recepcion', 'fecha_revision',
+            'fecha_resolucion', 'fecha_vencimiento', 'motivo', 'observaciones',
+        ),
+        False,
+    ),
+    'cambios': (
+        ChangeLog, filtrar_cambios, ('-timestamp', '-id'),
+        ('id', 'timestamp', 'user__username', 'modelo', 'objeto_id', 'accion', 'snapshot'),
+        True,
+    ),
+}
+
+
+@login_required
+def exportar_tabla(request, tabla, formato):
+    """
+    Exporta ``tabla`` en CSV o NDJSON con los mismos filtros GET del listado.
+    Las filas se leen con un cursor del servidor y se envían a medida que
+    salen; con ``?gzip=1`` se comprimen al vuelo.
+    """
+    if tabla not in TABLAS_EXPORTABLES or formato not in CONTENT_TYPES_STREAMING:
+        raise Http404("Exportación inexistente")
+    modelo, filtrar, orden, columnas, solo_admin = TABLAS_EXPORTABLES[tabla]
+    if solo_admin and not request.user.is_superuser:
+        perfil = UserProfile.objects.filter(user=request.user).first()
+        if not perfil or perfil.rol != 'admin':
+            messages.error(request, 'No tiene permisos.')
+            return redirect('home')
+
+    queryset = filtrar(modelo.objects.all(), request.GET).order_by(*orden)
+    return respuesta_streaming(
+        tabla, formato, columnas, filas_de(queryset, *columnas),
+        comprimir=request.GET.get('gzip') == '1',
+    )
 
 
 @login_required
@@ -1964,54 +1595,7 @@ def reporte_usuarios_pdf(request):
         messages.error(request, 'No tiene permisos.')
         return redirect('home')
 
-    from reportlab.lib.pagesizes import landscape, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    import datetime
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="usuarios.pdf"'
-    doc = SimpleDocTemplate(response, pagesize=landscape(A4))
-    elements = []
-    styles = getSampleStyleSheet()
-
-    title = Paragraph("Reporte de Usuarios - SIGRAMS", styles['Title'])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"Generado: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-    elements.append(Spacer(1, 24))
-
-    usuarios = User.objects.select_related('userprofile').all().order_by('username')
-    data = [['Usuario', 'Email', 'Rol', 'Fecha registro', 'Último acceso']]
-    for u in usuarios:
-        try:
-            rol = u.userprofile.get_rol_display()
-        except:
-            rol = 'Sin perfil'
-        data.append([
-            u.username,
-            u.email or '',
-            rol,
-            u.date_joined.strftime('%d/%m/%Y'),
-            u.last_login.strftime('%d/%m/%Y %H:%M') if u.last_login else ''
-        ])
-
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0A2E5A')),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 10),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('BACKGROUND', (0,1), (-1,-1), colors.white),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('FONTSIZE', (0,1), (-1,-1), 8),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    return response
+    return REPORTES['usuarios'].respuesta('pdf', {})
 
 @login_required
 def reporte_usuarios_excel(request):
@@ -2020,51 +1604,7 @@ def reporte_usuarios_excel(request):
         messages.error(request, 'No tiene permisos.')
         return redirect('home')
 
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Usuarios"
-
-    headers = ['Usuario', 'Email', 'Rol', 'Fecha registro', 'Último acceso']
-    ws.append(headers)
-
-    for col in range(1, len(headers)+1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="0A2E5A", end_color="0A2E5A", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-
-    usuarios = User.objects.select_related('userprofile').all().order_by('username')
-    for u in usuarios:
-        try:
-            rol = u.userprofile.get_rol_display()
-        except:
-            rol = 'Sin perfil'
-        ws.append([
-            u.username,
-            u.email or '',
-            rol,
-            u.date_joined.strftime('%d/%m/%Y'),
-            u.last_login.strftime('%d/%m/%Y %H:%M') if u.last_login else ''
-        ])
-
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[col_letter].width = adjusted_width
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="usuarios.xlsx"'
-    wb.save(response)
-    return response
+    return REPORTES['usuarios'].respuesta('xlsx', {})
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -2077,7 +1617,9 @@ def buscar_imagen_similar(request):
         return render(request, 'app_sigrams/marcas/buscar_imagen.html')
 
     try:
-        from app_registros.image_similarity import calcular_hash_desde_bytes, buscar_en_todo
+        from app_registros.image_similarity import (
+            calcular_hash_desde_bytes, buscar_en_todo, huellas_consulta,
+        )
     except ImportError as e:
         return JsonResponse({'ok': False, 'error': f'Módulo no disponible: {e}'}, status=500)
 
@@ -2095,7 +1637,7 @@ def buscar_imagen_similar(request):
         return JsonResponse({'ok': False, 'error': 'No se pudo calcular el hash de la imagen.'}, status=422)
 
     try:
-        resultados = buscar_en_todo(hash_nuevo)
+        resultados = buscar_en_todo(hash_nuevo, huellas=huellas_consulta(img_bytes))
     except Exception as e:
         return JsonResponse({'ok': False, 'error': f'Error en la búsqueda: {e}'}, status=500)
 
@@ -2116,7 +1658,9 @@ def verificar_imagen_ajax(request):
         return JsonResponse({'ok': False, 'error': 'Método no permitido.'}, status=405)
 
     try:
-        from app_registros.image_similarity import calcular_hash_desde_bytes, buscar_en_todo
+        from app_registros.image_similarity import (
+            calcular_hash_desde_bytes, buscar_en_todo, huellas_consulta,
+        )
     except ImportError as e:
         return JsonResponse({'ok': False, 'error': f'Módulo no disponible: {e}'}, status=500)
 
@@ -2140,7 +1684,9 @@ def verificar_imagen_ajax(request):
         return JsonResponse({'ok': False, 'error': 'No se pudo procesar la imagen.'}, status=422)
 
     try:
-        resultados = buscar_en_todo(hash_nuevo, excluir_marca_id=excluir_id)
+        resultados = buscar_en_todo(
+            hash_nuevo, excluir_marca_id=excluir_id, huellas=huellas_consulta(img_bytes),
+        )
     except Exception as e:
         return JsonResponse({'ok': False, 'error': f'Error en la búsqueda: {e}'}, status=500)
 
@@ -2155,10 +1701,117 @@ def verificar_imagen_ajax(request):
     elif resultados['predefinidas']:
         mejor = resultados['predefinidas'][0]
         mensaje = f'⚠️ Esta imagen ya existe como predefinida: "{mejor["nombre"]}".'
+    elif resultados['pendientes']:
+        mensaje = (f'Hay {resultados["pendientes"]} imágenes recién cargadas que todavía '
+                   f'no se pudieron comparar.')
 
     return JsonResponse({'ok': True, 'es_duplicada': es_duplicada, 'mensaje': mensaje, 'duplicados': resultados})
 
 
+# Límites del lote: cantidad de imágenes y bytes descomprimidos en total
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+MAX_BYTES_LOTE = 200 * 1024 * 1024
+
+
+def _imagenes_del_lote(archivos, maximo):
+    """
+    Junta ``[(nombre, bytes), ...]`` de los archivos subidos; los ZIP se
+    abren y se toman las imágenes que tengan adentro. Lanza ValueError si
+    el lote pasa los límites.
+    """
+    imagenes = []
+    total = 0
+
+    def agregar(nombre, tamanio, leer):
+        nonlocal total
+        if len(imagenes) >= maximo:
+            raise ValueError(f'El lote no puede tener más de {maximo} imágenes.')
+        total += tamanio
+        if total > MAX_BYTES_LOTE:
+            raise ValueError('El lote es demasiado grande.')
+        imagenes.append((nombre, leer()))
+
+    for archivo in archivos:
+        if archivo.name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(archivo) as zf:
+                    for info in zf.infolist():
+                        nombre = info.filename
+                        if (info.is_dir() or nombre.startswith('__MACOSX/')
+                                or not nombre.lower().endswith(EXTENSIONES_IMAGEN)):
+                            continue
+                        agregar(nombre, info.file_size, lambda: zf.read(info))
+            except zipfile.BadZipFile:
+                raise ValueError(f'"{archivo.name}" no es un ZIP válido.')
+        else:
+            agregar(archivo.name, archivo.size, archivo.read)
+    return imagenes
+
+
+@login_required
+def verificar_imagenes_lote(request):
+    """
+    POST /ajax/verificar-imagenes-lote/ con varias ``imagenes`` (o ZIPs).
+    Verifica todo el lote en una sola pasada por el índice y también marca
+    las imágenes repetidas dentro del mismo lote.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'ok': False, 'error': 'Método no permitido.'}, status=405)
+
+    try:
+        from app_registros.image_similarity import verificar_lote
+    except ImportError as e:
+        return JsonResponse({'ok': False, 'error': f'Módulo no disponible: {e}'}, status=500)
+
+    archivos = request.FILES.getlist('imagenes')
+    if not archivos:
+        return JsonResponse({'ok': False, 'error': 'No se recibieron imágenes.'}, status=400)
+
+    excluir_id = request.POST.get('excluir_id')
+    try:
+        excluir_id = int(excluir_id) if excluir_id else None
+    except (ValueError, TypeError):
+        excluir_id = None
+
+    try:
+        imagenes = _imagenes_del_lote(archivos, getattr(settings, 'SIMILITUD_MAX_LOTE', 200))
+    except ValueError as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    if not imagenes:
+        return JsonResponse({'ok': False, 'error': 'El lote no tiene imágenes.'}, status=400)
+
+    try:
+        resultados = verificar_lote(imagenes, excluir_marca_id=excluir_id)
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': f'Error en la búsqueda: {e}'}, status=500)
+
+    for fila in resultados:
+        for marca in fila.get('marcas', []):
+            marca['url_detalle'] = reverse('detalle_marca', kwargs={'pk': marca['id']})
+
+    resumen = {
+        'total': len(resultados),
+        'con_error': sum(1 for f in resultados if not f['hash']),
+        'duplicadas': sum(1 for f in resultados if f.get('marcas') or f.get('predefinidas')),
+        'repetidas_en_lote': sum(1 for f in resultados if f.get('en_lote')),
+    }
+    return JsonResponse({'ok': True, 'resumen': resumen, 'resultados': resultados})
+
+
+@login_required
+def autocompletar_productores(request):
+    """
+    GET /ajax/productores/autocompletar/?q=texto&limite=10
+    Productores cuyo apellido, nombre o DNI empiezan con el texto.
+    """
+    try:
+        limite = int(request.GET.get('limite', 10))
+    except ValueError:
+        limite = 10
+    resultados = sugerir_productores(request.GET.get('q', ''), limite)
+    return JsonResponse({'ok': True, 'resultados': resultados})
+
+
 @login_required
 def buscar_marca_por_nombre(request):
     """
@@ -2169,11 +1822,9 @@ def buscar_marca_por_nombre(request):
     if len(q) < 2:
         return JsonResponse({'ok': False, 'error': 'Ingresá al menos 2 caracteres.'})
 
-    # Buscar en MarcaSenal por descripcion_marca
-    marcas_qs = MarcaSenal.objects.filter(
-        Q(descripcion_marca__icontains=q) |
-        Q(imagenes_predefinidas__nombre__icontains=q)
-    ).select_related('productor').distinct()[:20]
+    # Buscar en MarcaSenal por descripción o nombre de sus componentes
+    # (texto_busqueda, con índice de trigramas: sin JOIN al M2M ni DISTINCT)
+    marcas_qs = buscar_marcas(MarcaSenal.objects.select_related('productor'), q)[:20]
 
     marcas = []
     for m in marcas_qs:
@@ -2192,9 +1843,8 @@ def buscar_marca_por_nombre(request):
         })
 
     # Buscar en ImagenMarcaPredefinida por nombre
-    predefinidas_qs = ImagenMarcaPredefinida.objects.filter(
-        nombre__icontains=q, activa=True
-    )[:10]
+    q_normal = normalizar(q)
+    predefinidas_qs = [p for p in imagenes_activas() if q_normal in normalizar(p.nombre)][:10]
 
     predefinidas = [{
         'id': p.pk,
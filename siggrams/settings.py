@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'app_registros',
     'app_sigrams',
@@ -151,3 +152,43 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'login'
 
+
+# Búsqueda de imágenes similares: 'memoria' usa el índice en memoria de cada
+# proceso; 'postgres' resuelve las marcas con una consulta SQL (PostgreSQL 14+).
+SIMILITUD_MOTOR = os.getenv('SIMILITUD_MOTOR', 'memoria')
+
+# Si es True, el hash perceptual de las imágenes nuevas se calcula en segundo
+# plano con `manage.py procesar_hashes --continuo` en lugar de dentro del save().
+SIMILITUD_HASH_ASINCRONO = os.getenv('SIMILITUD_HASH_ASINCRONO', 'False') == 'True'
+
+# Lado mínimo (px) al que se decodifican las imágenes para el hash perceptual.
+# 0 (por defecto) las decodifica a tamaño completo: hashes idénticos a los ya
+# guardados. Un valor como 256 es una aproximación opcional: el hash se
+# calcula unas 10 veces más rápido pero puede diferir hasta 4 bits
+# (DERIVA_DECODIFICACION_REDUCIDA) del de tamaño completo, que se descuentan
+# del umbral de similitud. Activarlo solo junto con
+# `manage.py recalcular_hashes --forzar`.
+SIMILITUD_LADO_DECODIFICACION = int(os.getenv('SIMILITUD_LADO_DECODIFICACION', '0'))
+
+# Máximo de imágenes por pedido en la verificación por lote (/ajax/verificar-imagenes-lote/).
+SIMILITUD_MAX_LOTE = int(os.getenv('SIMILITUD_MAX_LOTE', '200'))
+
+# Segundos que se reutilizan los números de los dashboards (home, admin y
+# solicitudes) si no cambió ningún dato. 0 desactiva la caché.
+DASHBOARD_CACHE_SEGUNDOS = int(os.getenv('DASHBOARD_CACHE_SEGUNDOS', '300'))
+
+# Listados y admin: por encima de esta cantidad estimada de filas se muestra
+# la estimación de PostgreSQL en lugar de hacer COUNT(*).
+CONTEO_EXACTO_HASTA = int(os.getenv('CONTEO_EXACTO_HASTA', '10000'))
+
+# Reportes PDF/Excel en segundo plano: hilos por proceso que los generan
+# (0 los genera dentro del request), minutos en que un pedido igual reutiliza
+# el archivo y días que se conservan (`manage.py procesar_reportes`).
+REPORTES_WORKERS = int(os.getenv('REPORTES_WORKERS', '2'))
+REPORTES_VIGENCIA_MINUTOS = int(os.getenv('REPORTES_VIGENCIA_MINUTOS', '10'))
+REPORTES_CONSERVAR_DIAS = int(os.getenv('REPORTES_CONSERVAR_DIAS', '7'))
+
+# Directorio de los reportes generados. Tienen datos personales: debe quedar
+# fuera de MEDIA_ROOT y no servirse nunca como estático (ni /media/reportes/,
+# donde se guardaban antes); se descargan solo con la vista descargar_reporte.
+REPORTES_ROOT = os.getenv('REPORTES_ROOT', os.path.join(BASE_DIR, 'reportes_generados'))
@@ -0,0 +1,53 @@
+// Autocompletado para los <select data-autocompletar="url">.
+// El select llega solo con la opción elegida; al escribir en el buscador se
+// piden las coincidencias al servidor y se reemplazan las demás opciones.
+(function () {
+    const MIN_CARACTERES = 2;
+    const ESPERA_MS = 250;
+
+    function prepararSelect(select) {
+        const url = select.dataset.autocompletar;
+        const buscador = document.createElement('input');
+        buscador.type = 'search';
+        buscador.className = 'form-control form-control-sm mb-1';
+        buscador.placeholder = 'Buscar por apellido, nombre o DNI...';
+        buscador.setAttribute('autocomplete', 'off');
+        select.parentNode.insertBefore(buscador, select);
+
+        let temporizador = null;
+        let pedido = 0;
+
+        buscador.addEventListener('input', function () {
+            clearTimeout(temporizador);
+            const texto = buscador.value.trim();
+            if (texto.length < MIN_CARACTERES) return;
+            temporizador = setTimeout(function () {
+                const numero = ++pedido;
+                fetch(`${url}?q=${encodeURIComponent(texto)}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        // Descartar respuestas de búsquedas ya reemplazadas
+                        if (numero !== pedido || !data.ok) return;
+                        cargarOpciones(select, data.resultados);
+                    })
+                    .catch(error => console.error('Error al buscar productores:', error));
+            }, ESPERA_MS);
+        });
+    }
+
+    function cargarOpciones(select, resultados) {
+        const elegido = select.value;
+        // Se conservan la opción vacía y la elegida
+        Array.from(select.options).forEach(opcion => {
+            if (opcion.value && opcion.value !== elegido) opcion.remove();
+        });
+        resultados.forEach(r => {
+            if (String(r.id) === elegido) return;
+            select.add(new Option(`${r.texto} (${r.dni})`, r.id));
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocompletar]').forEach(prepararSelect);
+    });
+})();